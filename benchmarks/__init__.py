@@ -0,0 +1,5 @@
+"""Benchmark jalur ingest dan alat uji beban.
+
+Jalankan dari root repo, misalnya:
+    python3 -m benchmarks.bench_ingest --messages 2000 --gsm 30 --lte 20 --output hasil.json
+"""
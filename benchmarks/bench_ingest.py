@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import psycopg2.extensions
+from database_config import db_connection
+import partitions
+import wsReceivedata
+from observation_log import observation_log
+from benchmarks.messages import MessageFactory, cell_count
+
+# Benchmark wsReceivedata.process_message terhadap PostgreSQL lokal (DB_* dari .env).
+#
+# Membuat campaign sementara, mengirim pesan hasil MessageFactory lewat process_message dari
+# beberapa thread (seperti worker IngestPipeline), lalu melaporkan pesan/detik, sel/detik,
+# latensi p50/p99 per pesan dan round trip DB per pesan. Hasil disimpan sebagai JSON;
+# --compare hasil_lama.json menampilkan selisihnya untuk mendeteksi regresi antar commit.
+# --observation-log menyalakan buffer riwayat (observation_log) dan rollup sinyal di transaksi ingest
+# seperti di produksi; default mengikuti OBSERVATION_LOG / SIGNAL_ROLLUPS dari .env.
+#
+#   python3 -m benchmarks.bench_ingest --messages 2000 --devices 20 --gsm 30 --lte 20 \
+#       --duplicate-rate 0.1 --empty-mcc-rate 0.05 --output bench-ingest.json
+
+
+class StatementCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = 0
+
+    def add(self, n=1):
+        with self._lock:
+            self.statements += n
+
+
+counter = StatementCounter()
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor yang menghitung setiap statement yang dikirim ke server."""
+
+    def execute(self, query, vars=None):
+        counter.add()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        vars_list = list(vars_list)
+        counter.add(len(vars_list))
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        counter.add()
+        return super().copy_expert(sql, file, size)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def create_campaign(name):
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT nextval(pg_get_serial_sequence('campaign', 'id'))")
+            campaign_id = cur.fetchone()[0]
+        partitions.create_campaign_partitions(conn, campaign_id)
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO campaign (id, name, status, time_start) VALUES (%s, %s, 'active', CURRENT_TIMESTAMP)",
+                (campaign_id, name)
+            )
+        conn.commit()
+    return campaign_id
+
+
+OBSERVATION_MODES = {
+    "off": (False, False),
+    "raw": (True, False),
+    "rollups": (False, True),
+    "both": (True, True),
+}
+
+
+def default_observation_mode():
+    for mode, flags in OBSERVATION_MODES.items():
+        if flags == (observation_log.raw, observation_log.rollups):
+            return mode
+
+
+def cleanup(campaign_id, serial_prefix, observations=False):
+    # Data gsm/lte ikut terhapus (ON DELETE CASCADE), lalu device benchmark
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            if observations:
+                for table in ("bts_observations", "signal_rollup_1m", "signal_rollup_1h"):
+                    cur.execute(f"DELETE FROM {table} WHERE campaign_id = %s", (campaign_id,))
+            cur.execute("DELETE FROM campaign WHERE id = %s", (campaign_id,))
+            cur.execute("DELETE FROM devices WHERE serial_number LIKE %s", (f"{serial_prefix}-%",))
+            for table in partitions.BTS_TABLES:
+                name = partitions.partition_name(table, campaign_id)
+                cur.execute(f"DROP TABLE IF EXISTS {name}")
+        conn.commit()
+
+
+def run(args):
+    serial_prefix = f"BENCH{os.getpid()}"
+    campaign_id = create_campaign(f"bench-ingest-{int(time.time())}")
+    factory = MessageFactory(
+        devices=args.devices, gsm_cells=args.gsm, lte_cells=args.lte,
+        duplicate_rate=args.duplicate_rate, empty_mcc_rate=args.empty_mcc_rate,
+        campaign_id=campaign_id, seed=args.seed, serial_prefix=serial_prefix,
+    )
+    # Pesan dibuat di depan supaya waktu JSON encode tidak ikut terukur
+    warmup = list(factory.stream(args.warmup))
+    messages = list(factory.stream(args.messages))
+    cells = sum(cell_count(m) for m in messages)
+
+    local = threading.local()
+    writers = []
+    writers_lock = threading.Lock()
+
+    def handle(message):
+        writer = getattr(local, "writer", None)
+        if writer is None:
+            writer = local.writer = wsReceivedata.IngestWriter(
+                cursor_factory=CountingCursor, rollups=observation_log.rollups
+            )
+            with writers_lock:
+                writers.append(writer)
+        started = time.perf_counter()
+        ok = wsReceivedata.process_message(message, writer=writer)
+        return ok, time.perf_counter() - started
+
+    observation_log.raw, observation_log.rollups = OBSERVATION_MODES[args.observation_log]
+    if observation_log.enabled:
+        observation_log.start()
+    observation_flush_s = 0.0
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            list(executor.map(handle, warmup))
+            counter.statements = 0
+            started = time.perf_counter()
+            results = list(executor.map(handle, messages))
+            elapsed = time.perf_counter() - started
+            statements = counter.statements
+        # Sisa buffer ditulis di luar waktu terukur, durasinya dilaporkan terpisah
+        flush_started = time.perf_counter()
+        observation_log.stop()
+        observation_flush_s = time.perf_counter() - flush_started
+    finally:
+        observation_log.stop()
+        for writer in writers:
+            writer.close()
+        if not args.keep:
+            cleanup(campaign_id, serial_prefix, observations=observation_log.enabled)
+
+    latencies = [latency for _, latency in results]
+    succeeded = sum(1 for ok, _ in results if ok)
+    # Setiap pesan = statement yang dihitung + satu COMMIT
+    round_trips = statements + succeeded
+    return {
+        "messages": len(messages),
+        "succeeded": succeeded,
+        "failed": len(messages) - succeeded,
+        "cells": cells,
+        "elapsed_s": elapsed,
+        "messages_per_s": len(messages) / elapsed if elapsed else 0.0,
+        "cells_per_s": cells / elapsed if elapsed else 0.0,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "latency_max_ms": max(latencies) * 1000 if latencies else 0.0,
+        "statements_per_message": statements / len(messages) if messages else 0.0,
+        "round_trips_per_message": round_trips / len(messages) if messages else 0.0,
+        "observation_log": dict(observation_log.stats(), final_flush_s=observation_flush_s),
+    }
+
+
+COMPARE_KEYS = ("messages_per_s", "cells_per_s", "latency_p50_ms", "latency_p99_ms", "round_trips_per_message")
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"Dibandingkan dengan {baseline_path} (commit {baseline.get('git_commit')}):")
+    for key in COMPARE_KEYS:
+        old = baseline["results"].get(key)
+        new = current["results"][key]
+        if not old:
+            print(f"  {key:<26} {new:10.2f}")
+            continue
+        print(f"  {key:<26} {old:10.2f} -> {new:10.2f}  ({(new - old) / old * 100:+.1f}%)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark jalur ingest pesan device")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--gsm", type=int, default=20, help="entri gsm_data per pesan")
+    parser.add_argument("--lte", type=int, default=20, help="entri lte_data per pesan")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--empty-mcc-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=wsReceivedata.INGEST_WORKERS)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="simpan hasil sebagai JSON")
+    parser.add_argument("--compare", help="file JSON hasil sebelumnya")
+    parser.add_argument("--keep", action="store_true", help="jangan hapus campaign/device benchmark")
+    parser.add_argument("--observation-log", choices=tuple(OBSERVATION_MODES), default=default_observation_mode(),
+                        help="riwayat mentah / rollup sinyal yang ikut ditulis selama benchmark")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "keep")}
+    results = run(args)
+    report = {
+        "benchmark": "ingest",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "params": params,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+    return 0 if results["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import json
+import random
+
+# Generator pesan device seperti yang dikirim ws://{ip}:8003/ws:
+#   {"campaign": {...}, "device": {...}, "gsm_data": [...], "lte_data": [...]}
+# Setiap device punya kumpulan sel tetap (laporan berikutnya meng-upsert sel yang sama,
+# seperti device asli yang diam di satu lokasi), nilai sinyal berubah sedikit tiap laporan.
+
+# (mcc, mnc, operator) yang dipakai generator
+OPERATORS = (
+    (510, 10, "Telkomsel"),
+    (510, 1, "Indosat Ooredoo"),
+    (510, 11, "XL Axiata"),
+    (510, 89, "3"),
+    (510, 9, "Smartfren"),
+)
+GSM_ARFCNS = (1, 17, 62, 85, 520, 566, 601, 700, 812)
+LTE_BANDS = ((1, 275), (3, 1850), (8, 3650), (40, 38950))
+
+
+class MessageFactory:
+    """Pembuat pesan device yang dapat diulang (seed tetap)."""
+
+    def __init__(self, devices=10, gsm_cells=20, lte_cells=20, duplicate_rate=0.0,
+                 empty_mcc_rate=0.0, campaign_id=1, campaign_name="bench", seed=1,
+                 serial_prefix="BENCH", ip_for=None):
+        self.devices = devices
+        self.gsm_cells = gsm_cells
+        self.lte_cells = lte_cells
+        # Porsi entri yang dikirim dua kali dalam satu pesan / yang mcc-mnc nya kosong
+        self.duplicate_rate = duplicate_rate
+        self.empty_mcc_rate = empty_mcc_rate
+        self.campaign_id = campaign_id
+        self.campaign_name = campaign_name
+        self.serial_prefix = serial_prefix
+        self.ip_for = ip_for or (lambda index: f"10.99.{index // 250}.{index % 250 + 1}")
+        self.random = random.Random(seed)
+        self._cells = {}
+
+    def serial_number(self, device_index):
+        return f"{self.serial_prefix}-{device_index:05d}"
+
+    def device(self, device_index, is_connected=True):
+        return {
+            "serial_number": self.serial_number(device_index),
+            "ip": self.ip_for(device_index),
+            "is_connected": is_connected,
+        }
+
+    def _device_cells(self, device_index):
+        cells = self._cells.get(device_index)
+        if cells is None:
+            rnd = random.Random(f"{self.serial_prefix}-{device_index}")
+            gsm = []
+            for _ in range(self.gsm_cells):
+                mcc, mnc, operator = rnd.choice(OPERATORS)
+                gsm.append({
+                    "mcc": mcc, "mnc": mnc, "operator": operator,
+                    "local_area_code": rnd.randint(1000, 65000),
+                    "arfcn": rnd.choice(GSM_ARFCNS),
+                    "cell_identity": rnd.randint(1, 65535),
+                    "rxlev_base": rnd.randint(10, 55),
+                })
+            lte = []
+            for _ in range(self.lte_cells):
+                mcc, mnc, operator = rnd.choice(OPERATORS)
+                band, earfcn = rnd.choice(LTE_BANDS)
+                lte.append({
+                    "mcc": mcc, "mnc": mnc, "operator": operator,
+                    "tracking_area_code": rnd.randint(1000, 65000),
+                    "arfcn": earfcn,
+                    "frequency_band_indicator": band,
+                    "cell_identity": rnd.randint(1, 268435455),
+                    "signal_level_base": rnd.randint(-115, -70),
+                })
+            cells = self._cells[device_index] = (gsm, lte)
+        return cells
+
+    def _maybe_empty(self, entry):
+        if self.empty_mcc_rate and self.random.random() < self.empty_mcc_rate:
+            entry["mcc"] = ""
+            entry["mnc"] = ""
+        return entry
+
+    def _with_duplicates(self, entries):
+        if not self.duplicate_rate:
+            return entries
+        extra = [dict(entry) for entry in entries if self.random.random() < self.duplicate_rate]
+        return entries + extra
+
+    def gsm_entries(self, device_index):
+        rnd = self.random
+        entries = []
+        for cell in self._device_cells(device_index)[0]:
+            rxlev = max(0, min(63, cell["rxlev_base"] + rnd.randint(-3, 3)))
+            entries.append(self._maybe_empty({
+                "mcc": str(cell["mcc"]),
+                "mnc": str(cell["mnc"]),
+                "operator": cell["operator"],
+                "local_area_code": str(cell["local_area_code"]),
+                "arfcn": str(cell["arfcn"]),
+                "cell_identity": str(cell["cell_identity"]),
+                "rxlev": str(rxlev),
+                "rxlev_access_min": "-110",
+                "status": rnd.random() > 0.02,
+                "rssi": str(rxlev - 110),
+            }))
+        return self._with_duplicates(entries)
+
+    def lte_entries(self, device_index):
+        rnd = self.random
+        entries = []
+        for cell in self._device_cells(device_index)[1]:
+            level = cell["signal_level_base"] + rnd.randint(-4, 4)
+            entries.append(self._maybe_empty({
+                "mcc": str(cell["mcc"]),
+                "mnc": str(cell["mnc"]),
+                "operator": cell["operator"],
+                "arfcn": str(cell["arfcn"]),
+                "cell_identity": str(cell["cell_identity"]),
+                "tracking_area_code": str(cell["tracking_area_code"]),
+                "frequency_band_indicator": str(cell["frequency_band_indicator"]),
+                "signal_level": str(level),
+                "snr": str(rnd.randint(-5, 25)),
+                "rx_lev_min": "-124",
+                "status": rnd.random() > 0.02,
+                "rssi": str(level + 20),
+            }))
+        return self._with_duplicates(entries)
+
+    def message(self, device_index):
+        """Satu laporan scan sebagai dict."""
+        return {
+            "campaign": {"id": self.campaign_id, "name": self.campaign_name},
+            "device": self.device(device_index),
+            "gsm_data": self.gsm_entries(device_index),
+            "lte_data": self.lte_entries(device_index),
+        }
+
+    def encode(self, device_index):
+        return json.dumps(self.message(device_index))
+
+    def stream(self, count):
+        """count pesan JSON bergiliran dari semua device."""
+        for i in range(count):
+            yield self.encode(i % self.devices)
+
+
+def cell_count(message):
+    data = json.loads(message) if isinstance(message, str) else message
+    return len(data.get("gsm_data", [])) + len(data.get("lte_data", []))
@@ -1,32 +1,209 @@
-from typing import List,Tuple
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Set
 from fastapi import WebSocket, WebSocketDisconnect
+from data_queries import get_campaign_for_ws
+import metrics
+
+# Interval pengiriman snapshot campaign ke klien (detik)
+WS_PUSH_INTERVAL = float(os.environ.get("WS_PUSH_INTERVAL", 5))
+# Jeda setelah NOTIFY sebelum membangun snapshot, supaya burst insert digabung jadi satu tick
+WS_NOTIFY_DEBOUNCE = float(os.environ.get("WS_NOTIFY_DEBOUNCE", 0.2))
+# Batas waktu kirim ke satu klien, supaya klien lambat tidak menahan klien lain
+WS_SEND_TIMEOUT = float(os.environ.get("WS_SEND_TIMEOUT", 10))
+
+STOPPED_STATUSES = ("stop", "stopped")
+
+# Mode protokol:
+#   "full"  -> kirim seluruh data campaign tiap tick (perilaku lama)
+#   "delta" -> kirim {"message": "snapshot", "seq": n, "data": ...} sekali, lalu
+#              {"message": "delta", "seq": n, "base_seq": n-1, ...} berisi perubahan saja.
+#              Delta dengan seq <= seq milik klien boleh diabaikan. Jika base_seq tidak sama
+#              dengan seq terakhir klien, kirim {"action": "resync"} untuk snapshot baru.
+MODE_FULL = "full"
+MODE_DELTA = "delta"
+
+COUNTER_KEYS = ("total_count", "gsm_total", "lte_total", "threat_bts_count", "real_bts_count")
+ROW_SECTIONS = ("gsm_data", "lte_data", "devices")
+
+
+def index_rows(rows):
+    return {row.get("id"): row for row in rows}
+
+
+def diff_rows(old_index, new_index):
+    upserted = [row for key, row in new_index.items() if old_index.get(key) != row]
+    removed = [key for key in old_index if key not in new_index]
+    return upserted, removed
+
+
+class CampaignFeed:
+    """State satu campaign yang ditonton: snapshot terakhir dan nomor urut perubahan."""
+
+    def __init__(self, campaign_id: int):
+        self.campaign_id = campaign_id
+        self.seq = 0
+        self.snapshot = None
+        self.index = {section: {} for section in ROW_SECTIONS}
+        # Frame "full" terakhir untuk klien mode lama
+        self.last_full_frame = None
+        # Di-set oleh LISTEN/NOTIFY supaya producer tidak menunggu interval polling
+        self.wakeup = asyncio.Event()
+
+    def apply(self, campaign_data: dict):
+        """Simpan snapshot baru dan kembalikan delta terhadap snapshot sebelumnya.
+
+        Mengembalikan None untuk snapshot pertama atau jika tidak ada perubahan.
+        """
+        new_index = {section: index_rows(campaign_data.get(section, [])) for section in ROW_SECTIONS}
+        first = self.snapshot is None
+        delta = {"message": "delta", "base_seq": self.seq}
+        changed = first
+
+        for section in ROW_SECTIONS:
+            upserted, removed = diff_rows(self.index[section], new_index[section])
+            if upserted or removed:
+                changed = True
+                delta[section] = {"upserted": upserted, "removed": removed}
+
+        if first or campaign_data.get("campaign") != self.snapshot.get("campaign"):
+            changed = True
+            delta["campaign"] = campaign_data.get("campaign")
+
+        self.snapshot = campaign_data
+        self.index = new_index
+        if not changed:
+            return None
+
+        self.seq += 1
+        delta["seq"] = self.seq
+        for key in COUNTER_KEYS:
+            delta[key] = campaign_data.get(key)
+        return None if first else delta
+
+    def snapshot_frame(self):
+        return {"message": "snapshot", "seq": self.seq, "data": self.snapshot}
+
+
+def encode_frame(payload: dict) -> str:
+    # sent_at (epoch detik) dipakai klien/uji beban untuk mengukur jeda pengiriman
+    return json.dumps({**payload, "sent_at": time.time()}, default=str)
+
 
 class WebSocketManager:
     def __init__(self):
-        # Simpan tuple (campaign_id, websocket)
-        self.active_connections: List[Tuple[int, WebSocket]] = []
+        # Simpan websocket per campaign_id
+        self.active_connections: Dict[int, Set[WebSocket]] = {}
+        # Mode protokol per websocket
+        self.modes: Dict[WebSocket, str] = {}
+        # Satu task producer per campaign yang sedang ditonton
+        self.producers: Dict[int, asyncio.Task] = {}
+        self.feeds: Dict[int, CampaignFeed] = {}
 
-    async def connect(self, campaign_id: int, websocket: WebSocket):
+    async def connect(self, campaign_id: int, websocket: WebSocket, mode: str = MODE_FULL):
         await websocket.accept()
-        self.active_connections.append((campaign_id, websocket))
-        print(f"New connection for campaign {campaign_id}. Total: {len(self.active_connections)}")
+        self.active_connections.setdefault(campaign_id, set()).add(websocket)
+        self.modes[websocket] = mode
+        total = sum(len(conns) for conns in self.active_connections.values())
+        print(f"New connection for campaign {campaign_id} ({mode}). Total: {total}")
+
+        # Klien baru langsung dapat data terakhir tanpa menunggu tick berikutnya
+        feed = self.feeds.get(campaign_id)
+        if feed is not None and feed.snapshot is not None:
+            if mode == MODE_DELTA:
+                await self._send(websocket, encode_frame(feed.snapshot_frame()))
+            elif feed.last_full_frame is not None:
+                await self._send(websocket, feed.last_full_frame)
+        self._ensure_producer(campaign_id)
 
     def disconnect(self, websocket: WebSocket):
-        # Hapus tuple dengan websocket yang sama
-        self.active_connections = [
-            (cid, ws) for cid, ws in self.active_connections if ws != websocket
-        ]
-
-    async def broadcast(self, campaign_id: int, message: str):
-        for cid, connection in self.active_connections:
-            if cid == campaign_id:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    print(f"Error broadcasting message for campaign {campaign_id}: {e}")
+        # Hapus websocket dari semua campaign
+        self.modes.pop(websocket, None)
+        for campaign_id in list(self.active_connections):
+            conns = self.active_connections[campaign_id]
+            conns.discard(websocket)
+            if not conns:
+                del self.active_connections[campaign_id]
+
+    def subscriber_count(self, campaign_id: int) -> int:
+        return len(self.active_connections.get(campaign_id, ()))
+
+    def _subscribers(self, campaign_id: int, mode: str = None):
+        conns = self.active_connections.get(campaign_id, ())
+        if mode is None:
+            return list(conns)
+        return [ws for ws in conns if self.modes.get(ws, MODE_FULL) == mode]
+
+    def notify(self, campaign_id: int):
+        feed = self.feeds.get(campaign_id)
+        if feed is not None:
+            feed.wakeup.set()
+
+    def handle_campaign_event(self, channel: str, payload: str):
+        # Callback PgListener untuk channel campaign_events
+        try:
+            campaign_id = int(json.loads(payload)["campaign_id"])
+        except (ValueError, KeyError, TypeError):
+            print(f"Payload notifikasi tidak valid: {payload}")
+            return
+        self.notify(campaign_id)
+
+    async def _wait_next_tick(self, feed: CampaignFeed):
+        # Polling tetap jalan sebagai fallback jika notifikasi tidak datang
+        try:
+            await asyncio.wait_for(feed.wakeup.wait(), timeout=WS_PUSH_INTERVAL)
+            await asyncio.sleep(WS_NOTIFY_DEBOUNCE)
+        except asyncio.TimeoutError:
+            pass
+        feed.wakeup.clear()
+
+    async def handle_client_message(self, campaign_id: int, websocket: WebSocket, message: str):
+        # Klien yang ketinggalan seq bisa minta snapshot penuh: {"action": "resync"}
+        try:
+            action = json.loads(message).get("action")
+        except (ValueError, AttributeError):
+            action = message.strip()
+        if action != "resync":
+            return
+        feed = self.feeds.get(campaign_id)
+        if feed is None or feed.snapshot is None:
+            # Belum ada snapshot; klien akan menerimanya pada tick pertama
+            return
+        await self._send(websocket, encode_frame(feed.snapshot_frame()))
+
+    async def _send(self, websocket: WebSocket, message: str) -> bool:
+        try:
+            await asyncio.wait_for(websocket.send_text(message), timeout=WS_SEND_TIMEOUT)
+            return True
+        except Exception as e:
+            print(f"Error sending message to websocket: {e}")
+            return False
+
+    async def _send_many(self, campaign_id: int, targets, message: str):
+        if not targets:
+            return
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._send(ws, message) for ws in targets))
+        metrics.WS_BROADCAST_DURATION.observe(time.perf_counter() - started)
+        for ws, ok in zip(targets, results):
+            if not ok:
+                metrics.WS_SEND_FAILURES.inc()
+                print(f"Error broadcasting message for campaign {campaign_id}, menutup koneksi")
+                self.disconnect(ws)
+
+    async def broadcast(self, campaign_id: int, message: str, mode: str = None):
+        await self._send_many(campaign_id, self._subscribers(campaign_id, mode), message)
+
+    async def broadcast_json(self, campaign_id: int, payload: dict, mode: str = None):
+        # Serialisasi sekali untuk semua subscriber
+        message = encode_frame(payload)
+        await self.broadcast(campaign_id, message, mode)
+        return message
 
     async def close_campaign_connections(self, campaign_id: int):
-        to_close = [ws for cid, ws in self.active_connections if cid == campaign_id]
+        to_close = self._subscribers(campaign_id)
         for ws in to_close:
             try:
                 await ws.close()
@@ -34,5 +211,67 @@ class WebSocketManager:
                 print(f"Error closing connection: {e}")
             self.disconnect(ws)
 
+    def _ensure_producer(self, campaign_id: int):
+        task = self.producers.get(campaign_id)
+        if task is None or task.done():
+            self.producers[campaign_id] = asyncio.create_task(self._produce(campaign_id))
+
+    async def _publish(self, campaign_id: int, feed: CampaignFeed, campaign_data: dict):
+        status = campaign_data["campaign"]["status"]
+        first = feed.snapshot is None
+        delta = feed.apply(campaign_data)
+
+        if self._subscribers(campaign_id, MODE_FULL):
+            if status == "paused":
+                payload = {"message": "Campaign is paused.", "data": campaign_data}
+            else:
+                payload = {"message": "send data campaign.", "data": campaign_data}
+            feed.last_full_frame = await self.broadcast_json(campaign_id, payload, MODE_FULL)
+        else:
+            feed.last_full_frame = None
+
+        if first:
+            await self.broadcast_json(campaign_id, feed.snapshot_frame(), MODE_DELTA)
+        elif delta is not None:
+            await self.broadcast_json(campaign_id, delta, MODE_DELTA)
+
+    async def _produce(self, campaign_id: int):
+        # Snapshot dibangun sekali per tick lalu dikirim ke semua subscriber campaign ini
+        print(f"Producer campaign {campaign_id} dimulai")
+        feed = self.feeds.setdefault(campaign_id, CampaignFeed(campaign_id))
+        cancelled = False
+        try:
+            while self.subscriber_count(campaign_id):
+                campaign_data = await asyncio.to_thread(get_campaign_for_ws, campaign_id)
+                status = campaign_data["campaign"]["status"] if campaign_data else None
+                if not campaign_data or status in STOPPED_STATUSES:
+                    print(f"Campaign {campaign_id} telah dihentikan. Menutup koneksi WebSocket.")
+                    await self.broadcast_json(campaign_id, {"message": "Campaign has been stopped."})
+                    await self.close_campaign_connections(campaign_id)
+                    break
+
+                await self._publish(campaign_id, feed, campaign_data)
+                await self._wait_next_tick(feed)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+        except Exception as e:
+            print(f"Error pada producer campaign {campaign_id}: {e}")
+            # Klien diputus supaya reconnect dan memulai producer baru
+            await self.close_campaign_connections(campaign_id)
+        finally:
+            self.producers.pop(campaign_id, None)
+            self.feeds.pop(campaign_id, None)
+            print(f"Producer campaign {campaign_id} berhenti")
+            # Klien yang masuk saat producer sedang berhenti tetap dilayani
+            if not cancelled and self.subscriber_count(campaign_id):
+                self._ensure_producer(campaign_id)
+
+    async def shutdown(self):
+        for task in list(self.producers.values()):
+            task.cancel()
+        await asyncio.gather(*self.producers.values(), return_exceptions=True)
+        self.producers.clear()
+
 # Instansiasi objek WebSocketManager yang akan digunakan di seluruh aplikasi
 manager = WebSocketManager()
@@ -0,0 +1,92 @@
+import re
+
+# Pencarian BTS dalam satu campaign yang dilayani index:
+#   - ekspresi SEARCH_KEY_SQL (teks gabungan mcc, mnc, "mcc-mnc", operator, LAC/TAC,
+#     cell_identity, arfcn/band) dengan index trigram GIN pada ekspresi yang sama untuk
+#     pencarian substring; tidak ada kolom tersimpan, jadi tabel tidak perlu ditulis ulang
+#   - query angka: baris yang sama persis di salah satu EXACT_COLUMNS (index btree) tampil
+#     lebih dulu, disusul baris lain yang cocok sebagai substring. Angka yang sama bisa berarti
+#     MCC, MNC, LAC/TAC atau CI, jadi jalur exact tidak pernah menyembunyikan hasil substring.
+#   - pasangan "mcc-mnc": exact pada (mcc, mnc)
+# Index dibuat oleh migrasi v0004 (v0007 untuk deployment yang masih punya kolom search_key)
+
+# Ekspresi harus sama persis dengan index trigram agar planner memakainya; mengubahnya
+# berarti migrasi baru yang membangun ulang index. Semua fungsi di sini immutable.
+SEARCH_KEY_SQL = {
+    "gsm": (
+        "lower(coalesce(mcc::text, '') || ' ' || coalesce(mnc::text, '') || ' ' || "
+        "coalesce(mcc::text, '') || '-' || coalesce(mnc::text, '') || ' ' || "
+        "coalesce(operator, '') || ' ' || coalesce(local_area_code::text, '') || ' ' || "
+        "coalesce(cell_identity::text, '') || ' ' || coalesce(arfcn::text, ''))"
+    ),
+    "lte": (
+        "lower(coalesce(mcc::text, '') || ' ' || coalesce(mnc::text, '') || ' ' || "
+        "coalesce(mcc::text, '') || '-' || coalesce(mnc::text, '') || ' ' || "
+        "coalesce(operator, '') || ' ' || coalesce(tracking_area_code::text, '') || ' ' || "
+        "coalesce(cell_identity::text, '') || ' ' || coalesce(frequency_band_indicator::text, '') || ' ' || "
+        "coalesce(arfcn::text, ''))"
+    ),
+}
+
+# Kolom yang dicek pada jalur exact untuk query angka
+EXACT_COLUMNS = {
+    "gsm": ("cell_identity", "local_area_code", "mcc", "mnc"),
+    "lte": ("cell_identity", "tracking_area_code", "mcc", "mnc"),
+}
+# Batas nilai kolom INTEGER; angka lebih besar langsung dicari sebagai teks
+MAX_INT = 2147483647
+
+MCC_MNC_PATTERN = re.compile(r"^\s*(\d{3})\s*[-/ ]\s*(\d{1,3})\s*$")
+NUMERIC_PATTERN = re.compile(r"^\s*(\d+)\s*$")
+
+# Mode pencarian yang dikembalikan ke pemanggil
+MODE_MCC_MNC = "mcc_mnc"
+MODE_EXACT = "exact"
+MODE_TEXT = "text"
+
+
+def build_filters(query: str):
+    """Terjemahkan query pengguna menjadi kondisi WHERE per tipe untuk fetch_unified_page.
+
+    Mengembalikan (mode, groups, params). groups adalah daftar kondisi per tipe
+    ({"gsm": "...", "lte": "..."}) berurutan prioritas: baris grup pertama tampil lebih dulu.
+    "510-10" -> pasangan mcc-mnc, angka -> exact lalu substring, selain itu -> substring
+    lewat index trigram.
+    """
+    query = (query or "").strip()
+
+    if MCC_MNC_PATTERN.match(query):
+        mcc, mnc = MCC_MNC_PATTERN.match(query).groups()
+        # Literal teks di-cast otomatis ke tipe kolom (INTEGER atau TEXT); mnc "01" disimpan sebagai 1
+        params = {"search_mcc": str(int(mcc)), "search_mnc": str(int(mnc))}
+        condition = "mcc = %(search_mcc)s AND mnc = %(search_mnc)s"
+        return MODE_MCC_MNC, [{"gsm": condition, "lte": condition}], params
+
+    # Karakter wildcard dari pengguna dicari apa adanya
+    escaped = query.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    params = {"search_pattern": f"%{escaped}%"}
+    text_condition = {tech: f"{SEARCH_KEY_SQL[tech]} LIKE %(search_pattern)s" for tech in SEARCH_KEY_SQL}
+
+    if NUMERIC_PATTERN.match(query) and int(query) <= MAX_INT:
+        params["search_number"] = str(int(query))
+        exact = {
+            tech: "(" + " OR ".join(f"{column} = %(search_number)s" for column in columns) + ")"
+            for tech, columns in EXACT_COLUMNS.items()
+        }
+        # Grup kedua tanpa hit exact supaya baris tidak muncul dua kali;
+        # COALESCE karena kolom NULL membuat NOT (...) bernilai NULL
+        rest = {
+            tech: f"{text_condition[tech]} AND NOT COALESCE({condition}, FALSE)"
+            for tech, condition in exact.items()
+        }
+        return MODE_EXACT, [exact, rest], params
+
+    return MODE_TEXT, [text_condition], params
+
+
+def combined(groups):
+    """Kondisi gabungan semua grup per tipe, mis. untuk COUNT hasil pencarian."""
+    return {
+        tech: " OR ".join(f"({group[tech]})" for group in groups)
+        for tech in groups[0]
+    }
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import psycopg2
+import psycopg2.extensions
+from database_config import get_db_connection
+
+# Channel PostgreSQL untuk event campaign (data BTS masuk, perubahan status campaign)
+CAMPAIGN_EVENTS_CHANNEL = "campaign_events"
+# Channel untuk perubahan daftar device (tambah/ubah/hapus)
+DEVICE_EVENTS_CHANNEL = "device_events"
+
+# Interval cek koneksi LISTEN masih hidup (detik)
+LISTEN_KEEPALIVE = float(os.environ.get("LISTEN_KEEPALIVE", 30))
+LISTEN_RECONNECT_DELAY = float(os.environ.get("LISTEN_RECONNECT_DELAY", 5))
+
+
+def notify_campaign_event(cur, campaign_id, event: str, **extra):
+    # NOTIFY ikut transaksi: baru terkirim ke listener setelah commit
+    payload = {"campaign_id": campaign_id, "event": event}
+    payload.update(extra)
+    cur.execute("SELECT pg_notify(%s, %s)", (CAMPAIGN_EVENTS_CHANNEL, json.dumps(payload)))
+
+
+def notify_device_event(cur, event: str, **extra):
+    payload = {"event": event}
+    payload.update(extra)
+    cur.execute("SELECT pg_notify(%s, %s)", (DEVICE_EVENTS_CHANNEL, json.dumps(payload)))
+
+
+class PgListener:
+    """LISTEN pada koneksi khusus yang dipantau event loop asyncio (tanpa polling)."""
+
+    def __init__(self, channels, callback):
+        self.channels = list(channels)
+        # callback(channel, payload) dipanggil di thread event loop
+        self.callback = callback
+        self.connected = False
+
+    def _dispatch(self, conn):
+        while conn.notifies:
+            notify = conn.notifies.pop(0)
+            try:
+                self.callback(notify.channel, notify.payload)
+            except Exception as e:
+                print(f"Error handling notification {notify.channel}: {e}")
+
+    async def _listen_once(self):
+        loop = asyncio.get_running_loop()
+        conn = await asyncio.to_thread(get_db_connection)
+        if conn is None:
+            return
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        lost = asyncio.Event()
+
+        def on_readable():
+            try:
+                conn.poll()
+            except psycopg2.Error as e:
+                print(f"Koneksi LISTEN terputus: {e}")
+                lost.set()
+                return
+            self._dispatch(conn)
+
+        fd = conn.fileno()
+        try:
+            with conn.cursor() as cur:
+                for channel in self.channels:
+                    cur.execute(f"LISTEN {channel}")
+            loop.add_reader(fd, on_readable)
+            self.connected = True
+            print(f"LISTEN aktif pada channel: {', '.join(self.channels)}")
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), timeout=LISTEN_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Query ringan untuk mendeteksi koneksi yang mati diam-diam
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute("SELECT 1")
+                        self._dispatch(conn)
+                    except psycopg2.Error as e:
+                        print(f"Koneksi LISTEN terputus: {e}")
+                        lost.set()
+        finally:
+            self.connected = False
+            loop.remove_reader(fd)
+            conn.close()
+
+    async def run(self):
+        while True:
+            try:
+                await self._listen_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error pada listener {', '.join(self.channels)}: {e}")
+            await asyncio.sleep(LISTEN_RECONNECT_DELAY)
@@ -0,0 +1,325 @@
+import sys
+import psycopg2.extras
+from database_config import db_connection
+
+# Statistik BTS per campaign yang dijaga incremental oleh jalur ingest (wsReceivedata).
+# Endpoint membaca counter dari sini (O(1)) alih-alih COUNT(*) atas gsm_data/lte_data.
+# Tabel dibuat oleh migrasi v0003. Backfill / perbaikan: python3 campaign_stats.py rebuild [campaign_id ...]
+
+# Kolom kunci unik (sesuai ON CONFLICT di wsReceivedata) dan posisi status/operator di tuple baris
+BTS_TABLES = {
+    "gsm": {
+        "table": "gsm_data",
+        "key_columns": ("mcc", "mnc", "local_area_code", "cell_identity"),
+        "key_indexes": (2, 3, 5, 7),
+        "operator_index": 4,
+        "status_index": 10,
+    },
+    "lte": {
+        "table": "lte_data",
+        "key_columns": ("mcc", "mnc", "tracking_area_code", "cell_identity"),
+        "key_indexes": (2, 3, 7, 6),
+        "operator_index": 4,
+        "status_index": 12,
+    },
+}
+
+STATS_UPSERT_QUERY = """
+    INSERT INTO campaign_stats (
+        campaign_id, gsm_total, lte_total, gsm_threat_count, gsm_real_count,
+        lte_threat_count, lte_real_count, last_seen_at, updated_at
+    )
+    VALUES (%s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT (campaign_id) DO UPDATE SET
+        gsm_total = campaign_stats.gsm_total + EXCLUDED.gsm_total,
+        lte_total = campaign_stats.lte_total + EXCLUDED.lte_total,
+        gsm_threat_count = campaign_stats.gsm_threat_count + EXCLUDED.gsm_threat_count,
+        gsm_real_count = campaign_stats.gsm_real_count + EXCLUDED.gsm_real_count,
+        lte_threat_count = campaign_stats.lte_threat_count + EXCLUDED.lte_threat_count,
+        lte_real_count = campaign_stats.lte_real_count + EXCLUDED.lte_real_count,
+        last_seen_at = CURRENT_TIMESTAMP,
+        updated_at = CURRENT_TIMESTAMP;
+"""
+
+OPERATOR_UPSERT_QUERY = """
+    INSERT INTO campaign_operator_stats (campaign_id, tech, operator, total, threat_count, real_count)
+    VALUES %s
+    ON CONFLICT (campaign_id, tech, operator) DO UPDATE SET
+        total = campaign_operator_stats.total + EXCLUDED.total,
+        threat_count = campaign_operator_stats.threat_count + EXCLUDED.threat_count,
+        real_count = campaign_operator_stats.real_count + EXCLUDED.real_count;
+"""
+
+
+# Counter dikurangi saat data device dihapus; last_seen_at tidak berubah
+STATS_SUBTRACT_QUERY = """
+    UPDATE campaign_stats SET
+        gsm_total = gsm_total - %s,
+        lte_total = lte_total - %s,
+        gsm_threat_count = gsm_threat_count - %s,
+        gsm_real_count = gsm_real_count - %s,
+        lte_threat_count = lte_threat_count - %s,
+        lte_real_count = lte_real_count - %s,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE campaign_id = %s
+"""
+
+# Hapus baris satu device di satu campaign (hanya partisi campaign itu) dan kembalikan
+# jumlah yang terhapus per operator
+DEVICE_DELETE_QUERY = """
+    WITH deleted AS (
+        DELETE FROM {table}
+        WHERE campaign_id = %s AND device_id = %s
+        RETURNING operator, status
+    )
+    SELECT COALESCE(operator, ''), COUNT(*),
+           COUNT(*) FILTER (WHERE status = FALSE),
+           COUNT(*) FILTER (WHERE status = TRUE)
+    FROM deleted
+    GROUP BY 1
+"""
+
+
+def _key(row, key_indexes):
+    # Dibandingkan sebagai teks supaya sama untuk kolom INTEGER maupun TEXT
+    return tuple(str(row[i]) for i in key_indexes)
+
+
+class StatsDelta:
+    """Perubahan counter satu laporan device, dihitung dari baris sebelum dan sesudah upsert."""
+
+    def __init__(self, campaign_id, device_id):
+        self.campaign_id = campaign_id
+        self.device_id = device_id
+        self.existing = {"gsm": {}, "lte": {}}
+        self.totals = {}
+        self.operators = {}
+
+    def lock(self, cur):
+        # Laporan dari device yang sama untuk campaign yang sama diproses berurutan,
+        # supaya baris baru tidak terhitung dua kali oleh dua worker sekaligus
+        cur.execute("SELECT pg_advisory_xact_lock(%s, %s)", (self.campaign_id, self.device_id))
+
+    def snapshot(self, cur, tech, rows):
+        """Ambil status/operator lama untuk baris yang akan di-upsert (panggil sebelum upsert)."""
+        spec = BTS_TABLES[tech]
+        keys = [row for row in rows if all(row[i] is not None for i in spec["key_indexes"])]
+        if not keys:
+            return
+        columns = ", ".join(spec["key_columns"])
+        placeholder = "(" + ", ".join(["%s"] * len(spec["key_columns"])) + ")"
+        params = [self.campaign_id, self.device_id]
+        for row in keys:
+            # Literal teks di-cast otomatis ke tipe kolom, baik INTEGER maupun TEXT
+            params.extend(str(row[i]) for i in spec["key_indexes"])
+        cur.execute(f"""
+            SELECT {columns}, status, operator
+            FROM {spec['table']}
+            WHERE campaign_id = %s AND device_id = %s
+              AND ({columns}) IN ({", ".join([placeholder] * len(keys))})
+            FOR UPDATE
+        """, params)
+        n = len(spec["key_columns"])
+        for existing in cur.fetchall():
+            values = list(existing.values()) if isinstance(existing, dict) else list(existing)
+            self.existing[tech][tuple(str(v) for v in values[:n])] = (values[n], values[n + 1])
+
+    def _add(self, tech, operator, status, sign):
+        totals = self.totals.setdefault(tech, [0, 0, 0])
+        counters = self.operators.setdefault((tech, operator or ""), [0, 0, 0])
+        for target in (totals, counters):
+            target[0] += sign
+            if status is False:
+                target[1] += sign
+            elif status is True:
+                target[2] += sign
+
+    def count(self, tech, rows):
+        """Hitung perubahan counter dari baris yang baru saja di-upsert."""
+        spec = BTS_TABLES[tech]
+        for row in rows:
+            status = row[spec["status_index"]]
+            operator = row[spec["operator_index"]]
+            old = self.existing[tech].get(_key(row, spec["key_indexes"]))
+            if old is not None:
+                # Baris lama di-update: pindahkan hitungan dari status/operator lama ke yang baru
+                old_status, old_operator = old
+                self._add(tech, old_operator, old_status, -1)
+            self._add(tech, operator, status, 1)
+
+    def apply(self, cur):
+        if not self.totals:
+            return
+        gsm = self.totals.get("gsm", [0, 0, 0])
+        lte = self.totals.get("lte", [0, 0, 0])
+        cur.execute(STATS_UPSERT_QUERY, (
+            self.campaign_id, gsm[0], lte[0], gsm[1], gsm[2], lte[1], lte[2]
+        ))
+        operator_rows = [
+            (self.campaign_id, tech, operator, total, threat, real)
+            for (tech, operator), (total, threat, real) in self.operators.items()
+            if total or threat or real
+        ]
+        if operator_rows:
+            psycopg2.extras.execute_values(cur, OPERATOR_UPSERT_QUERY, operator_rows)
+
+
+def delete_device_rows(cur, device_id, campaign_ids):
+    """Hapus data BTS satu device di campaign tertentu dan kurangi counter campaign tersebut.
+
+    Memakai kunci advisory (campaign, device) yang sama dengan StatsDelta, jadi hanya ingest
+    device ini yang menunggu; writer campaign/device lain tetap berjalan. Cursor biasa (tuple).
+    """
+    deleted = 0
+    # Urutan tetap supaya dua penghapusan bersamaan tidak saling mengunci
+    for campaign_id in sorted(set(campaign_ids)):
+        delta = StatsDelta(campaign_id, device_id)
+        delta.lock(cur)
+        totals = {"gsm": [0, 0, 0], "lte": [0, 0, 0]}
+        operator_rows = []
+        for tech, spec in BTS_TABLES.items():
+            cur.execute(DEVICE_DELETE_QUERY.format(table=spec["table"]), (campaign_id, device_id))
+            for operator, total, threat, real in cur.fetchall():
+                totals[tech][0] += total
+                totals[tech][1] += threat
+                totals[tech][2] += real
+                operator_rows.append((campaign_id, tech, operator, -total, -threat, -real))
+                deleted += total
+        if not operator_rows:
+            continue
+        gsm, lte = totals["gsm"], totals["lte"]
+        cur.execute(STATS_SUBTRACT_QUERY, (gsm[0], lte[0], gsm[1], gsm[2], lte[1], lte[2], campaign_id))
+        psycopg2.extras.execute_values(cur, OPERATOR_UPSERT_QUERY, operator_rows)
+    return deleted
+
+
+def clear(cur, campaign_id):
+    """Nolkan counter campaign yang seluruh data BTS-nya dihapus (retensi partisi)."""
+    cur.execute("DELETE FROM campaign_operator_stats WHERE campaign_id = %s", (campaign_id,))
+    cur.execute("""
+        UPDATE campaign_stats SET
+            gsm_total = 0, lte_total = 0,
+            gsm_threat_count = 0, gsm_real_count = 0,
+            lte_threat_count = 0, lte_real_count = 0,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE campaign_id = %s
+    """, (campaign_id,))
+
+
+def rebuild(cur, campaign_ids=None):
+    """Hitung ulang statistik dari gsm_data/lte_data (semua campaign atau campaign tertentu).
+
+    Mengunci tabel statistik selama hitung ulang; hanya untuk backfill / perbaikan lewat CLI,
+    bukan jalur request.
+    """
+    # Writer ingest menunggu sampai rebuild selesai, sehingga delta mereka diterapkan di atas hasil rebuild
+    cur.execute("LOCK TABLE campaign_stats, campaign_operator_stats IN EXCLUSIVE MODE")
+    campaign_filter = "" if campaign_ids is None else "WHERE campaign_id = ANY(%(ids)s)"
+    params = {"ids": list(campaign_ids or [])}
+
+    if campaign_ids is None:
+        cur.execute("DELETE FROM campaign_operator_stats")
+        cur.execute("DELETE FROM campaign_stats")
+    else:
+        cur.execute(f"DELETE FROM campaign_operator_stats {campaign_filter}", params)
+        cur.execute(f"DELETE FROM campaign_stats {campaign_filter}", params)
+
+    cur.execute(f"""
+        INSERT INTO campaign_operator_stats (campaign_id, tech, operator, total, threat_count, real_count)
+        SELECT campaign_id, tech, operator, COUNT(*),
+               COUNT(*) FILTER (WHERE status = FALSE),
+               COUNT(*) FILTER (WHERE status = TRUE)
+        FROM (
+            SELECT campaign_id, 'gsm' AS tech, COALESCE(operator, '') AS operator, status
+            FROM gsm_data {campaign_filter}
+            UNION ALL
+            SELECT campaign_id, 'lte' AS tech, COALESCE(operator, '') AS operator, status
+            FROM lte_data {campaign_filter}
+        ) bts
+        GROUP BY campaign_id, tech, operator
+    """, params)
+
+    cur.execute(f"""
+        INSERT INTO campaign_stats (
+            campaign_id, gsm_total, lte_total, gsm_threat_count, gsm_real_count,
+            lte_threat_count, lte_real_count, last_seen_at, updated_at
+        )
+        SELECT
+            c.id,
+            COALESCE(SUM(o.total) FILTER (WHERE o.tech = 'gsm'), 0),
+            COALESCE(SUM(o.total) FILTER (WHERE o.tech = 'lte'), 0),
+            COALESCE(SUM(o.threat_count) FILTER (WHERE o.tech = 'gsm'), 0),
+            COALESCE(SUM(o.real_count) FILTER (WHERE o.tech = 'gsm'), 0),
+            COALESCE(SUM(o.threat_count) FILTER (WHERE o.tech = 'lte'), 0),
+            COALESCE(SUM(o.real_count) FILTER (WHERE o.tech = 'lte'), 0),
+            GREATEST(
+                (SELECT MAX(created_at) FROM gsm_data g WHERE g.campaign_id = c.id),
+                (SELECT MAX(created_at) FROM lte_data l WHERE l.campaign_id = c.id)
+            ),
+            CURRENT_TIMESTAMP
+        FROM campaign c
+        LEFT JOIN campaign_operator_stats o ON o.campaign_id = c.id
+        {"" if campaign_ids is None else "WHERE c.id = ANY(%(ids)s)"}
+        GROUP BY c.id
+    """, params)
+
+
+def stats_columns(alias="cs"):
+    # Potongan SELECT untuk endpoint yang membutuhkan counter campaign (LEFT JOIN campaign_stats)
+    return f"""
+        COALESCE({alias}.gsm_total, 0) AS gsm_total,
+        COALESCE({alias}.lte_total, 0) AS lte_total,
+        COALESCE({alias}.gsm_threat_count + {alias}.lte_threat_count, 0) AS threat_bts_count,
+        COALESCE({alias}.gsm_real_count + {alias}.lte_real_count, 0) AS real_bts_count,
+        {alias}.last_seen_at
+    """
+
+
+def get_campaign_stats(campaign_id: int):
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(f"""
+                SELECT c.id AS campaign_id, {stats_columns()}
+                FROM campaign c
+                LEFT JOIN campaign_stats cs ON cs.campaign_id = c.id
+                WHERE c.id = %s
+            """, (campaign_id,))
+            stats = cursor.fetchone()
+            if not stats:
+                return None
+            cursor.execute("""
+                SELECT tech, operator, total, threat_count, real_count
+                FROM campaign_operator_stats
+                WHERE campaign_id = %s AND total > 0
+                ORDER BY tech, total DESC
+            """, (campaign_id,))
+            operators = cursor.fetchall()
+            cursor.close()
+
+        stats["total_count"] = stats["gsm_total"] + stats["lte_total"]
+        stats["operators"] = [
+            {**row, "operator": row["operator"] or None} for row in operators
+        ]
+        return {"status": "success", "stats": stats}
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] != "rebuild":
+        print("Penggunaan: python3 campaign_stats.py rebuild [campaign_id ...]")
+        return 1
+    campaign_ids = [int(x) for x in argv[2:]] or None
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            rebuild(cur, campaign_ids)
+        conn.commit()
+    print("campaign_stats rebuild selesai" + (f" untuk campaign {campaign_ids}" if campaign_ids else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,193 +1,168 @@
 # data_queries.py
 import psycopg2
 import psycopg2.extras
-from database_config import get_db_connection  
+from database_config import db_connection
+from campaign_stats import stats_columns
+import bts_search
+import partitions
+from metrics import timed_query
+from query_log import TimedCursor, TimedRealDictCursor
 from auth import encrypt_password, fernet
 from fastapi import HTTPException
+import base64
+import binascii
 import datetime
+import json
+import os
+import threading
+import time
 
 
+@timed_query
 def create_campaign(campaign_name: str, user_id: int, device_ids: list) -> int:
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    try:
-        created_at = datetime.datetime.utcnow()
-        insert_query = """
-            INSERT INTO campaign (name, status, time_start, user_id)
-            VALUES (%s, %s, %s, %s)
-            RETURNING id
-        """
-        cursor.execute(insert_query, (campaign_name, 'active', created_at, user_id))
-        campaign_id = cursor.fetchone()[0]
-        for device_id in device_ids:
-            cursor.execute("INSERT INTO campaign_devices (campaign_id, device_id) VALUES (%s, %s)",
-                           (campaign_id, device_id))
-        connection.commit()
-        return campaign_id
-    except Exception as e:
-        connection.rollback()
-        raise e
-    finally:
-        cursor.close()
-        connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor(cursor_factory=TimedCursor)
+        try:
+            created_at = datetime.datetime.utcnow()
+            # Id dipesan dulu supaya partisi bisa dibuat di transaksi pendek sebelum insert campaign
+            cursor.execute("SELECT nextval(pg_get_serial_sequence('campaign', 'id'))")
+            campaign_id = cursor.fetchone()[0]
+            partitions.create_campaign_partitions(connection, campaign_id)
+            insert_query = """
+                INSERT INTO campaign (id, name, status, time_start, user_id)
+                VALUES (%s, %s, %s, %s, %s)
+            """
+            cursor.execute(insert_query, (campaign_id, campaign_name, 'active', created_at, user_id))
+            psycopg2.extras.execute_values(
+                cursor,
+                "INSERT INTO campaign_devices (campaign_id, device_id) VALUES %s",
+                [(campaign_id, device_id) for device_id in device_ids]
+            )
+            connection.commit()
+            return campaign_id
+        except Exception as e:
+            connection.rollback()
+            raise e
+        finally:
+            cursor.close()
 
 
+@timed_query
 def get_latest_campaign_with_data():
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
         
-        # Ambil campaign terbaru; gunakan kolom time_start sebagai timestamp
-        cursor.execute("SELECT id, time_start AS timestamp FROM campaign ORDER BY id DESC LIMIT 1")
-        latest_campaign = cursor.fetchone()
+            # Ambil campaign terbaru; gunakan kolom time_start sebagai timestamp
+            cursor.execute("SELECT id, time_start AS timestamp FROM campaign ORDER BY id DESC LIMIT 1")
+            latest_campaign = cursor.fetchone()
         
-        if not latest_campaign:
-            return None
-        id_campaign = latest_campaign['id']
-        id_device = latest_campaign['id_device']
+            if not latest_campaign:
+                return None
+            id_campaign = latest_campaign['id']
+            id_device = latest_campaign['id_device']
         
-        # Ambil data GSM
-        cursor.execute("SELECT * FROM gsm_data WHERE id_campaign = %s", (id_campaign,))
-        gsm_data = cursor.fetchall()
+            # Ambil data GSM
+            cursor.execute("SELECT * FROM gsm_data WHERE id_campaign = %s", (id_campaign,))
+            gsm_data = cursor.fetchall()
         
-        # Ambil data LTE
-        cursor.execute("SELECT * FROM lte_data WHERE id_campaign = %s", (id_campaign,))
-        lte_data = cursor.fetchall()
-
-        cursor.execute("""
-            SELECT d.*, dg.group_name 
-            FROM devices d 
-            JOIN device_group dg ON d.group_id = dg.id 
-            WHERE d.id = %s
-        """, (id_device,))
-        device_data = cursor.fetchone()
-
-        gsm_count = len(gsm_data)
-        lte_count = len(lte_data)
-        total = gsm_count + lte_count
+            # Ambil data LTE
+            cursor.execute("SELECT * FROM lte_data WHERE id_campaign = %s", (id_campaign,))
+            lte_data = cursor.fetchall()
+
+            cursor.execute("""
+                SELECT d.*, dg.group_name 
+                FROM devices d 
+                JOIN device_group dg ON d.group_id = dg.id 
+                WHERE d.id = %s
+            """, (id_device,))
+            device_data = cursor.fetchone()
+
+            gsm_count = len(gsm_data)
+            lte_count = len(lte_data)
+            total = gsm_count + lte_count
         
-        return {
-            "status": "success",
-            "id_campaign": latest_campaign['id'],
-            "device": device_data,
-            "timestamp": latest_campaign['timestamp'],
-            "gsm_data": gsm_data,
-            "lte_data": lte_data,
-            "gsm_count": gsm_count, 
-            "lte_count": lte_count,
-            "total_count": total 
-        }
+            return {
+                "status": "success",
+                "id_campaign": latest_campaign['id'],
+                "device": device_data,
+                "timestamp": latest_campaign['timestamp'],
+                "gsm_data": gsm_data,
+                "lte_data": lte_data,
+                "gsm_count": gsm_count, 
+                "lte_count": lte_count,
+                "total_count": total 
+            }
         
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
+@timed_query
 def get_campaign_data_by_id(id_campaign):
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
         
-        # Ambil informasi campaign; gunakan time_start sebagai timestamp
-        cursor.execute("SELECT id, time_start AS timestamp FROM campaign WHERE id = %s", (id_campaign,))
-        campaign = cursor.fetchone()
+            # Ambil informasi campaign; gunakan time_start sebagai timestamp
+            cursor.execute("SELECT id, time_start AS timestamp FROM campaign WHERE id = %s", (id_campaign,))
+            campaign = cursor.fetchone()
         
-        if not campaign:
-            return None
+            if not campaign:
+                return None
         
-        # Ambil data GSM
-        cursor.execute("SELECT * FROM gsm_data WHERE id_campaign = %s", (id_campaign,))
-        gsm_data = cursor.fetchall()
+            # Ambil data GSM
+            cursor.execute("SELECT * FROM gsm_data WHERE id_campaign = %s", (id_campaign,))
+            gsm_data = cursor.fetchall()
         
-        # Ambil data LTE
-        cursor.execute("SELECT * FROM lte_data WHERE id_campaign = %s", (id_campaign,))
-        lte_data = cursor.fetchall()
+            # Ambil data LTE
+            cursor.execute("SELECT * FROM lte_data WHERE id_campaign = %s", (id_campaign,))
+            lte_data = cursor.fetchall()
 
-        gsm_count = len(gsm_data)
-        lte_count = len(lte_data)
-        total = gsm_count + lte_count
+            gsm_count = len(gsm_data)
+            lte_count = len(lte_data)
+            total = gsm_count + lte_count
         
-        return {
-            "status": "success",
-            "id_campaign": campaign['id'],
-            "timestamp": campaign['timestamp'],
-            "gsm_data": gsm_data,
-            "lte_data": lte_data,
-            "gsm_count": gsm_count, 
-            "lte_count": lte_count,
-            "total_count": total 
-        }
+            return {
+                "status": "success",
+                "id_campaign": campaign['id'],
+                "timestamp": campaign['timestamp'],
+                "gsm_data": gsm_data,
+                "lte_data": lte_data,
+                "gsm_count": gsm_count, 
+                "lte_count": lte_count,
+                "total_count": total 
+            }
         
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
-def get_all_campaigns_data():
+@timed_query
+def get_all_campaigns_data(limit: int = None, after_id: int = None):
+    # Satu query untuk seluruh halaman: hitungan BTS dari campaign_stats, device lewat LEFT JOIN,
+    # lalu baris dikelompokkan per campaign di Python (pola yang sama dengan devicegroup).
+    # Keyset pagination opsional: limit + after_id (id campaign terakhir dari halaman sebelumnya).
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        # Ambil data campaign
-        cursor.execute("""
-            SELECT id, name, status, time_start, time_stop 
-            FROM campaign 
-            ORDER BY id DESC
-        """)
-        campaigns = cursor.fetchall()
-        
-        result = {
-            "status": "success",
-            "campaigns": []
-        }
-        
-        for campaign in campaigns:
-            campaign_id = campaign['id']
-
-            count_cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            count_cursor.execute(
-                "SELECT COUNT(*) as cnt FROM gsm_data WHERE campaign_id = %s AND status = FALSE",
-                (campaign_id,)
-            )
-            threat_gsm = count_cursor.fetchone()['cnt']
-            count_cursor.execute(
-                "SELECT COUNT(*) as cnt FROM lte_data WHERE campaign_id = %s AND status = FALSE",
-                (campaign_id,)
-            )
-            threat_lte = count_cursor.fetchone()['cnt']
-            threat_bts_count = threat_gsm + threat_lte
-
-            count_cursor.execute(
-                "SELECT COUNT(*) as cnt FROM gsm_data WHERE campaign_id = %s AND status = TRUE",
-                (campaign_id,)
-            )
-            real_gsm = count_cursor.fetchone()['cnt']
-            count_cursor.execute(
-                "SELECT COUNT(*) as cnt FROM lte_data WHERE campaign_id = %s AND status = TRUE",
-                (campaign_id,)
-            )
-            real_lte = count_cursor.fetchone()['cnt']
-            real_bts_count = real_gsm + real_lte
-            
-            # Query untuk mengambil device yang terkait dengan campaign melalui tabel campaign_devices.
-            count_cursor.execute("""
-                SELECT 
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
+            cursor.execute("""
+                WITH page AS (
+                    SELECT id, name, status, time_start, time_stop
+                    FROM campaign
+                    WHERE %(after_id)s::int IS NULL OR id < %(after_id)s
+                    ORDER BY id DESC
+                    LIMIT %(limit)s
+                )
+                SELECT
+                    p.id,
+                    p.name,
+                    p.status,
+                    p.time_start,
+                    p.time_stop,
+                    COALESCE(cs.gsm_threat_count + cs.lte_threat_count, 0) AS threat_bts_count,
+                    COALESCE(cs.gsm_real_count + cs.lte_real_count, 0) AS real_bts_count,
                     d.id AS device_id,
                     d.serial_number,
                     d.ip,
@@ -198,337 +173,407 @@ def get_all_campaigns_data():
                     dg.group_name,
                     dg.description,
                     dg.created_at AS group_created_at
-                FROM campaign_devices cd
-                JOIN devices d ON cd.device_id = d.id
-                LEFT JOIN device_group dg ON d.group_id = dg.id
-                WHERE cd.campaign_id = %s
-                ORDER BY d.id
-            """, (campaign_id,))
-            devices = count_cursor.fetchall()
+                FROM page p
+                LEFT JOIN campaign_stats cs ON cs.campaign_id = p.id
+                LEFT JOIN (
+                    campaign_devices cd
+                    JOIN devices d ON cd.device_id = d.id
+                    LEFT JOIN device_group dg ON d.group_id = dg.id
+                ) ON cd.campaign_id = p.id
+                ORDER BY p.id DESC, d.id
+            """, {"limit": limit, "after_id": after_id}, name="campaigns_data.page")
+            rows = cursor.fetchall()
+            cursor.close()
 
-            device_list = []
-            for row in devices:
-                device_info = {
-                    "id": row["device_id"],
-                    "serial_number": row["serial_number"],
-                    "ip": row["ip"],
-                    "is_connected": row["is_connected"],
-                    "is_running": row["is_running"],
-                    "created_at": row["device_created_at"]
+        campaigns = {}
+        for row in rows:
+            campaign_id = row["id"]
+            if campaign_id not in campaigns:
+                campaigns[campaign_id] = {
+                    "id_campaign": campaign_id,
+                    "name": row.get('name', ''),
+                    "status": row['status'],
+                    "time_start": row['time_start'],
+                    "time_stop": row['time_stop'],
+                    "threat_bts_count": row["threat_bts_count"],
+                    "real_bts_count": row["real_bts_count"],
+                    "devices": []  # Sertakan informasi device dan group
                 }
-                if row["group_id"] is not None:
-                    device_info["group"] = {
-                        "id": row["group_id"],
-                        "group_name": row["group_name"],
-                        "description": row["description"],
-                        "created_at": row["group_created_at"]
-                    }
-                else:
-                    device_info["group"] = None
-                device_list.append(device_info)
-            
-            campaign_data = {
-                "id_campaign": campaign_id,
-                "name": campaign.get('name', ''),
-                "status": campaign['status'],
-                "time_start": campaign['time_start'],
-                "time_stop": campaign['time_stop'],
-                "threat_bts_count": threat_bts_count,
-                "real_bts_count": real_bts_count,
-                "devices": device_list  # Sertakan informasi device dan group
+            if row["device_id"] is None:
+                continue
+            device_info = {
+                "id": row["device_id"],
+                "serial_number": row["serial_number"],
+                "ip": row["ip"],
+                "is_connected": row["is_connected"],
+                "is_running": row["is_running"],
+                "created_at": row["device_created_at"]
             }
-            result["campaigns"].append(campaign_data)
-            count_cursor.close()
-        
+            if row["group_id"] is not None:
+                device_info["group"] = {
+                    "id": row["group_id"],
+                    "group_name": row["group_name"],
+                    "description": row["description"],
+                    "created_at": row["group_created_at"]
+                }
+            else:
+                device_info["group"] = None
+            campaigns[campaign_id]["devices"].append(device_info)
+
+        result = {
+            "status": "success",
+            "campaigns": list(campaigns.values())
+        }
+        if limit is not None:
+            # Halaman penuh berarti mungkin masih ada data; kirim after_id untuk halaman berikutnya
+            result["next_cursor"] = result["campaigns"][-1]["id_campaign"] if len(campaigns) == limit else None
         return result
-        
+
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
-def get_latest_campaign_with_unified_data(page: int = 1, limit: int = 10):
+# Urutan gabungan GSM+LTE: semua GSM lalu semua LTE, masing-masing urut id (sama seperti
+# hasil gsm_data + lte_data sebelumnya). Halaman dipotong di database, lalu baris lengkap
+# hanya diambil untuk id di halaman tersebut.
+UNIFIED_TABLES = ((0, "gsm", "gsm_data"), (1, "lte", "lte_data"))
+
+
+def unified_segments(groups=None):
+    """Segmen urutan halaman gabungan: (rank, tech, table, kondisi) per grup filter lalu per tipe.
+
+    Tanpa grup: rank sama dengan type_rank UNIFIED_TABLES. Dengan beberapa grup (mis. hasil
+    exact lalu substring dari bts_search), grup berikutnya mendapat rank setelah grup sebelumnya,
+    sehingga keyset (rank, id) tetap berlaku tanpa mengubah bentuk cursor.
+    """
+    return [
+        (index * len(UNIFIED_TABLES) + type_rank, tech, table, group.get(tech))
+        for index, group in enumerate(groups or [{}])
+        for type_rank, tech, table in UNIFIED_TABLES
+    ]
+
+
+def encode_page_cursor(type_rank, row_id, direction):
+    raw = json.dumps({"r": type_rank, "i": row_id, "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_page_cursor(token):
+    if not token:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        page_cursor = (int(data["r"]), int(data["i"]), data["d"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if page_cursor[2] not in ("next", "prev"):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return page_cursor
+
+
+def fetch_unified_page(cursor, campaign_id, page=1, limit=10, page_cursor=None, filters=None, params=None):
+    """Ambil satu halaman data gabungan GSM+LTE sebuah campaign.
+
+    page_cursor (hasil decode_page_cursor) didahulukan dari page. filters berisi daftar grup
+    kondisi WHERE per tipe ([{"gsm": "...", "lte": "..."}, ...]) dengan parameter bernama;
+    baris grup pertama tampil lebih dulu (lihat unified_segments).
+    Mengembalikan (gsm_rows, lte_rows, next_cursor, prev_cursor).
+    """
+    segments = unified_segments(filters)
+    query_params = dict(params or {}, campaign_id=campaign_id, limit=limit + 1,
+                        offset=max(page - 1, 0) * limit)
+    anchor_rank, direction = None, "next"
+    if page_cursor is not None:
+        anchor_rank, query_params["anchor_id"], direction = page_cursor
+
+    branches = []
+    for rank, tech, table, extra in segments:
+        condition = "campaign_id = %(campaign_id)s"
+        if extra:
+            condition += f" AND ({extra})"
+        if anchor_rank is not None:
+            # Batas keyset (rank, id) diterjemahkan per segmen supaya bisa memakai index
+            if (direction == "next" and rank < anchor_rank) or (direction == "prev" and rank > anchor_rank):
+                continue
+            if rank == anchor_rank:
+                condition += " AND id > %(anchor_id)s" if direction == "next" else " AND id < %(anchor_id)s"
+        branches.append(f"SELECT {rank} AS type_rank, id FROM {table} WHERE {condition}")
+
+    keys = []
+    if branches:
+        order = "ASC" if direction == "next" else "DESC"
+        sql = "\nUNION ALL\n".join(branches) + f"\nORDER BY type_rank {order}, id {order}\nLIMIT %(limit)s"
+        if page_cursor is None:
+            sql += " OFFSET %(offset)s"
+        cursor.execute(sql, query_params, name="unified_page.keys")
+        keys = [(row["type_rank"], row["id"]) for row in cursor.fetchall()]
+
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+    if direction == "prev":
+        keys.reverse()
+
+    next_cursor = prev_cursor = None
+    if keys:
+        first, last = keys[0], keys[-1]
+        if direction == "next":
+            if has_more:
+                next_cursor = encode_page_cursor(last[0], last[1], "next")
+            if page_cursor is not None or page > 1:
+                prev_cursor = encode_page_cursor(first[0], first[1], "prev")
+        else:
+            if has_more:
+                prev_cursor = encode_page_cursor(first[0], first[1], "prev")
+            next_cursor = encode_page_cursor(last[0], last[1], "next")
+
+    table_of = {rank: table for rank, tech, table, extra in segments}
+    rows_by_key = {}
+    for type_rank, tech, table in UNIFIED_TABLES:
+        ids = [row_id for rank, row_id in keys if table_of.get(rank) == table]
+        if not ids:
+            continue
+        # campaign_id ikut disaring supaya query dipangkas ke partisi campaign ini
+        # dan memakai index (campaign_id, id); id saja tidak punya index di tabel terpartisi
+        cursor.execute(
+            f"SELECT * FROM {table} WHERE campaign_id = %s AND id = ANY(%s)",
+            (campaign_id, ids), name=f"unified_page.{tech}_rows"
+        )
+        for row in cursor.fetchall():
+            row["type"] = tech
+            rows_by_key[(table, row["id"])] = row
+
+    ordered = [rows_by_key[(table_of[rank], row_id)] for rank, row_id in keys
+               if (table_of.get(rank), row_id) in rows_by_key]
+    gsm_rows = [row for row in ordered if row["type"] == "gsm"]
+    lte_rows = [row for row in ordered if row["type"] == "lte"]
+    return gsm_rows, lte_rows, next_cursor, prev_cursor
+
+
+@timed_query
+def get_latest_campaign_with_unified_data(page: int = 1, limit: int = 10, cursor: str = None):
     """
     Menggabungkan data GSM dan LTE dari campaign terbaru, melakukan pagination terpadu,
     dan mengembalikan:
       - Data campaign (id, name, status, time_start, time_stop)
       - List data GSM dan LTE (masing-masing sudah diberi tanda 'type')
       - Jumlah BTS total, threat BTS (status False), dan real BTS (status True)
-      - Informasi paging: page dan limit
+      - Informasi paging: page dan limit, serta next_cursor/prev_cursor untuk keyset paging
     """
+    page_cursor = decode_page_cursor(cursor)
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Ambil campaign terbaru beserta kolom time_start dan time_stop
-        cursor.execute("""
-            SELECT id, name, status, time_start, time_stop 
-            FROM campaign 
-            ORDER BY id DESC 
-            LIMIT 1
-        """)
-        latest_campaign = cursor.fetchone()
-        if not latest_campaign:
-            return None
-
-        id_campaign = latest_campaign['id']
-        
-        # Ambil data GSM dan tandai dengan tipe 'gsm'
-        cursor.execute("SELECT * FROM gsm_data WHERE campaign_id = %s", (id_campaign,))
-        gsm_data = cursor.fetchall()
-        for row in gsm_data:
-            row['type'] = 'gsm'
+        with db_connection() as connection:
+            db_cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
         
-        # Ambil data LTE dan tandai dengan tipe 'lte'
-        cursor.execute("SELECT * FROM lte_data WHERE campaign_id = %s", (id_campaign,))
-        lte_data = cursor.fetchall()
-        for row in lte_data:
-            row['type'] = 'lte'
-        
-        # Gabungkan data GSM dan LTE
-        combined_data = gsm_data + lte_data
-        total_count = len(combined_data)
-        # Hitung threat BTS: misalnya, status False dianggap threat
-        threat_bts_count = sum(1 for item in combined_data if not item.get("status"))
-        # Hitung real BTS: status True
-        real_bts_count = sum(1 for item in combined_data if item.get("status"))
-        
-        # Lakukan pagination pada data gabungan
-        start_index = (page - 1) * limit
-        end_index = start_index + limit
-        paginated_data = combined_data[start_index:end_index]
-        
-        gsm_data_paginated = [item for item in paginated_data if item['type'] == 'gsm']
-        lte_data_paginated = [item for item in paginated_data if item['type'] == 'lte']
-        print("ini lte data ",lte_data_paginated)
+            # Ambil campaign terbaru beserta kolom time_start dan time_stop
+            db_cursor.execute(f"""
+                SELECT c.id, c.name, c.status, c.time_start, c.time_stop, {stats_columns()}
+                FROM campaign c
+                LEFT JOIN campaign_stats cs ON cs.campaign_id = c.id
+                ORDER BY c.id DESC 
+                LIMIT 1
+            """, name="latest_unified.campaign")
+            latest_campaign = db_cursor.fetchone()
+            if not latest_campaign:
+                return None
+
+            # Pagination dilakukan di database, hanya baris di halaman ini yang diambil
+            gsm_data_paginated, lte_data_paginated, next_cursor, prev_cursor = fetch_unified_page(
+                db_cursor, latest_campaign['id'], page, limit, page_cursor
+            )
         
-        return {
-            "status": "success",
-            "campaign": {
-                "id_campaign": latest_campaign['id'],
-                "name": latest_campaign.get("name", ""),
-                "status": latest_campaign["status"],
-                "time_start": latest_campaign["time_start"],
-                "time_stop": latest_campaign["time_stop"]
-            },
-            "gsm_data": gsm_data_paginated,
-            "lte_data": lte_data_paginated,
-            "page": page,
-            "limit": limit,
-            "gsm_count": len(gsm_data),
-            "lte_count": len(lte_data),
-            "total_bts": total_count,
-            "threat_bts_count": threat_bts_count,
-            "real_bts_count": real_bts_count
-        }
+            return {
+                "status": "success",
+                "campaign": {
+                    "id_campaign": latest_campaign['id'],
+                    "name": latest_campaign.get("name", ""),
+                    "status": latest_campaign["status"],
+                    "time_start": latest_campaign["time_start"],
+                    "time_stop": latest_campaign["time_stop"]
+                },
+                "gsm_data": gsm_data_paginated,
+                "lte_data": lte_data_paginated,
+                "page": page,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                # Counter dari campaign_stats, tidak dihitung ulang per request
+                "gsm_count": latest_campaign["gsm_total"],
+                "lte_count": latest_campaign["lte_total"],
+                "total_bts": latest_campaign["gsm_total"] + latest_campaign["lte_total"],
+                "threat_bts_count": latest_campaign["threat_bts_count"],
+                "real_bts_count": latest_campaign["real_bts_count"]
+            }
         
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
-def get_campaign_with_unified_data_by_id(campaign_id: int, page: int = 1, limit: int = 10):
+@timed_query
+def get_campaign_with_unified_data_by_id(campaign_id: int, page: int = 1, limit: int = 10, cursor: str = None):
+    page_cursor = decode_page_cursor(cursor)
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Ambil data campaign lengkap (termasuk time_start dan time_stop)
-        cursor.execute(
-            "SELECT id, name, status, time_start, time_stop FROM campaign WHERE id = %s",
-            (campaign_id,)
-        )
-        campaign = cursor.fetchone()
-        if not campaign:
-            return None
-        
-        # Ambil data GSM untuk campaign_id tertentu
-        cursor.execute("SELECT * FROM gsm_data WHERE campaign_id = %s", (campaign_id,))
-        gsm_data = cursor.fetchall()
-        for row in gsm_data:
-            row['type'] = 'gsm'
-        
-        # Ambil data LTE untuk campaign_id tertentu
-        cursor.execute("SELECT * FROM lte_data WHERE campaign_id = %s", (campaign_id,))
-        lte_data = cursor.fetchall()
-        for row in lte_data:
-            row['type'] = 'lte'
+        with db_connection() as connection:
+            db_cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
         
-        # Gabungkan data GSM dan LTE
-        combined_data = gsm_data + lte_data
-        total_count = len(combined_data)
-        # Hitung jumlah threat BTS (status False) dan real BTS (status True)
-        threat_bts_count = sum(1 for item in combined_data if item.get("status") == False)
-        real_bts_count = sum(1 for item in combined_data if item.get("status") == True)
-        
-        # Lakukan pagination pada data gabungan
-        start_index = (page - 1) * limit
-        end_index = start_index + limit
-        paginated_data = combined_data[start_index:end_index]
-        
-        gsm_data_paginated = [item for item in paginated_data if item['type'] == 'gsm']
-        lte_data_paginated = [item for item in paginated_data if item['type'] == 'lte']
+            # Ambil data campaign lengkap (termasuk time_start dan time_stop)
+            db_cursor.execute(f"""
+                SELECT c.id, c.name, c.status, c.time_start, c.time_stop, {stats_columns()}
+                FROM campaign c
+                LEFT JOIN campaign_stats cs ON cs.campaign_id = c.id
+                WHERE c.id = %s
+            """, (campaign_id,), name="unified_by_id.campaign")
+            campaign = db_cursor.fetchone()
+            if not campaign:
+                return None
+
+            # Pagination dilakukan di database, hanya baris di halaman ini yang diambil
+            gsm_data_paginated, lte_data_paginated, next_cursor, prev_cursor = fetch_unified_page(
+                db_cursor, campaign_id, page, limit, page_cursor
+            )
         
-        # --- Bagian Baru: Ambil informasi device terkait campaign ---
-        # Asumsi: relasi campaign dengan device tersimpan di tabel campaign_devices
-        cursor.execute("""
-            SELECT 
-                d.id AS device_id,
-                d.serial_number,
-                d.ip,
-                d.is_connected,
-                d.is_running,
-                d.created_at AS device_created_at
-            FROM campaign_devices cd
-            JOIN devices d ON cd.device_id = d.id
-            WHERE cd.campaign_id = %s
-            ORDER BY d.id
-        """, (campaign_id,))
-        devices = cursor.fetchall()
+            # --- Bagian Baru: Ambil informasi device terkait campaign ---
+            # Asumsi: relasi campaign dengan device tersimpan di tabel campaign_devices
+            db_cursor.execute("""
+                SELECT 
+                    d.id AS device_id,
+                    d.serial_number,
+                    d.ip,
+                    d.is_connected,
+                    d.is_running,
+                    d.created_at AS device_created_at
+                FROM campaign_devices cd
+                JOIN devices d ON cd.device_id = d.id
+                WHERE cd.campaign_id = %s
+                ORDER BY d.id
+            """, (campaign_id,), name="unified_by_id.devices")
+            devices = db_cursor.fetchall()
         
-        return {
-            "status": "success",
-            "campaign": {
-                "id": campaign["id"],
-                "name": campaign.get("name", ""),
-                "status": campaign["status"],
-                "time_start": campaign["time_start"],
-                "time_stop": campaign["time_stop"],
-            },
-            "devices": devices,
-            "gsm_data": gsm_data_paginated,
-            "lte_data": lte_data_paginated, 
-            "page": page,
-            "limit": limit,
-            "total_count": total_count,
-            "gsm_total": len(gsm_data),
-            "lte_total": len(lte_data),
-            "threat_bts_count": threat_bts_count,
-            "real_bts_count": real_bts_count
-        }
+            return {
+                "status": "success",
+                "campaign": {
+                    "id": campaign["id"],
+                    "name": campaign.get("name", ""),
+                    "status": campaign["status"],
+                    "time_start": campaign["time_start"],
+                    "time_stop": campaign["time_stop"],
+                },
+                "devices": devices,
+                "gsm_data": gsm_data_paginated,
+                "lte_data": lte_data_paginated, 
+                "page": page,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                # Counter dari campaign_stats, tidak dihitung ulang per request
+                "total_count": campaign["gsm_total"] + campaign["lte_total"],
+                "gsm_total": campaign["gsm_total"],
+                "lte_total": campaign["lte_total"],
+                "threat_bts_count": campaign["threat_bts_count"],
+                "real_bts_count": campaign["real_bts_count"]
+            }
         
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
 
+@timed_query
 def get_campaign_for_ws(campaign_id: int):
     try:
-        connection = get_db_connection()
-        if connection is None:
-            print("Koneksi database gagal!")
-            return None
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
 
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-
-        # Ambil data campaign lengkap
-        cursor.execute(
-            "SELECT id, name, group_id, status, time_start, time_stop FROM campaign WHERE id = %s",
-            (campaign_id,)
-        )
-        campaign = cursor.fetchone()
+            # Ambil data campaign lengkap
+            cursor.execute(
+                "SELECT id, name, group_id, status, time_start, time_stop FROM campaign WHERE id = %s",
+                (campaign_id,), name="campaign_ws.campaign"
+            )
+            campaign = cursor.fetchone()
 
-        if not campaign:
-            print(f"Campaign dengan ID {campaign_id} tidak ditemukan!")
-            return None
+            if not campaign:
+                print(f"Campaign dengan ID {campaign_id} tidak ditemukan!")
+                return None
 
-        # Konversi datetime ke string ISO 8601
-        campaign["time_start"] = campaign["time_start"].isoformat() if isinstance(campaign["time_start"], datetime.datetime) else None
-        campaign["time_stop"] = campaign["time_stop"].isoformat() if isinstance(campaign["time_stop"], datetime.datetime) else None
-
-        # Ambil data GSM dengan join ke tabel devices untuk mendapatkan info device
-        cursor.execute("""
-            SELECT g.*, d.ip AS device_ip 
-            FROM gsm_data g 
-            JOIN devices d ON g.device_id = d.id 
-            WHERE g.campaign_id = %s
-        """, (campaign_id,))
-        gsm_data = cursor.fetchall()
-
-        # Ambil data LTE dengan join ke tabel devices untuk mendapatkan info device
-        cursor.execute("""
-            SELECT l.*, d.ip AS device_ip 
-            FROM lte_data l 
-            JOIN devices d ON l.device_id = d.id 
-            WHERE l.campaign_id = %s
-        """, (campaign_id,))
-        lte_data = cursor.fetchall()
-
-        # Ambil data devices terkait dengan campaign melalui many-to-many campaign_devices
-        cursor.execute("""
-            SELECT d.* 
-            FROM campaign_devices cd
-            JOIN devices d ON cd.device_id = d.id
-            WHERE cd.campaign_id = %s
-        """, (campaign_id,))
-        devices = cursor.fetchall()
-
-        # Fungsi untuk membersihkan data: mengubah RealDictRow ke dictionary biasa dan konversi datetime ke ISO string
-        def clean_data(row):
-            row_dict = dict(row)
-            # Jika field device_ip ada, tambahkan key 'ip'
-            if "device_ip" in row_dict:
-                row_dict["ip"] = row_dict["device_ip"]
-            return {
-                k: (v.isoformat() if isinstance(v, datetime.datetime) else v)
-                for k, v in row_dict.items()
-            }
+            # Counter BTS dari campaign_stats (dijaga oleh jalur ingest)
+            cursor.execute(f"""
+                SELECT {stats_columns()}
+                FROM (SELECT %s::int AS campaign_id) c
+                LEFT JOIN campaign_stats cs ON cs.campaign_id = c.campaign_id
+            """, (campaign_id,), name="campaign_ws.stats")
+            stats = cursor.fetchone()
 
-        gsm_data_cleaned = [clean_data(row) for row in gsm_data]
-        lte_data_cleaned = [clean_data(row) for row in lte_data]
-        devices_cleaned = [clean_data(row) for row in devices]
+            # Konversi datetime ke string ISO 8601
+            campaign["time_start"] = campaign["time_start"].isoformat() if isinstance(campaign["time_start"], datetime.datetime) else None
+            campaign["time_stop"] = campaign["time_stop"].isoformat() if isinstance(campaign["time_stop"], datetime.datetime) else None
 
-        # Tandai tiap data dengan tipe masing-masing
-        for row in gsm_data_cleaned:
-            row["type"] = "gsm"
-        for row in lte_data_cleaned:
-            row["type"] = "lte"
+            # Ambil data GSM dengan join ke tabel devices untuk mendapatkan info device
+            cursor.execute("""
+                SELECT g.*, d.ip AS device_ip 
+                FROM gsm_data g 
+                JOIN devices d ON g.device_id = d.id 
+                WHERE g.campaign_id = %s
+            """, (campaign_id,), name="campaign_ws.gsm")
+            gsm_data = cursor.fetchall()
+
+            # Ambil data LTE dengan join ke tabel devices untuk mendapatkan info device
+            cursor.execute("""
+                SELECT l.*, d.ip AS device_ip 
+                FROM lte_data l 
+                JOIN devices d ON l.device_id = d.id 
+                WHERE l.campaign_id = %s
+            """, (campaign_id,), name="campaign_ws.lte")
+            lte_data = cursor.fetchall()
+
+            # Ambil data devices terkait dengan campaign melalui many-to-many campaign_devices
+            cursor.execute("""
+                SELECT d.* 
+                FROM campaign_devices cd
+                JOIN devices d ON cd.device_id = d.id
+                WHERE cd.campaign_id = %s
+            """, (campaign_id,), name="campaign_ws.devices")
+            devices = cursor.fetchall()
 
-        # Gabungkan data GSM dan LTE untuk perhitungan statistik (opsional)
-        combined_data = gsm_data_cleaned + lte_data_cleaned
-        total_count = len(combined_data)
-        threat_bts_count = sum(1 for item in combined_data if item.get("status") is False)
-        real_bts_count = sum(1 for item in combined_data if item.get("status") is True)
+            # Fungsi untuk membersihkan data: mengubah RealDictRow ke dictionary biasa dan konversi datetime ke ISO string
+            def clean_data(row):
+                row_dict = dict(row)
+                # Jika field device_ip ada, tambahkan key 'ip'
+                if "device_ip" in row_dict:
+                    row_dict["ip"] = row_dict["device_ip"]
+                return {
+                    k: (v.isoformat() if isinstance(v, datetime.datetime) else v)
+                    for k, v in row_dict.items()
+                }
 
-        result = {
-            "status": "success",
-            "campaign": campaign,
-            "gsm_data": gsm_data_cleaned,
-            "lte_data": lte_data_cleaned,
-            "devices": devices_cleaned,
-            "total_count": total_count,
-            "gsm_total": len(gsm_data_cleaned),
-            "lte_total": len(lte_data_cleaned),
-            "threat_bts_count": threat_bts_count,
-            "real_bts_count": real_bts_count
-        }
-        return result
+            gsm_data_cleaned = [clean_data(row) for row in gsm_data]
+            lte_data_cleaned = [clean_data(row) for row in lte_data]
+            devices_cleaned = [clean_data(row) for row in devices]
+
+            # Tandai tiap data dengan tipe masing-masing
+            for row in gsm_data_cleaned:
+                row["type"] = "gsm"
+            for row in lte_data_cleaned:
+                row["type"] = "lte"
+
+            result = {
+                "status": "success",
+                "campaign": campaign,
+                "gsm_data": gsm_data_cleaned,
+                "lte_data": lte_data_cleaned,
+                "devices": devices_cleaned,
+                "total_count": stats["gsm_total"] + stats["lte_total"],
+                "gsm_total": stats["gsm_total"],
+                "lte_total": stats["lte_total"],
+                "threat_bts_count": stats["threat_bts_count"],
+                "real_bts_count": stats["real_bts_count"]
+            }
+            return result
 
     except Exception as e:
         print(f"Error di get_campaign_for_ws: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
 
@@ -613,612 +658,598 @@ def get_campaign_for_ws(campaign_id: int):
 #             cursor.close()
 #             connection.close()
 
-def search_campaign_data_paginate(id_campaign: int, query: str, page: int = 1, limit: int = 10):
+@timed_query
+def search_campaign_data_paginate(id_campaign: int, query: str, page: int = 1, limit: int = 10, cursor: str = None):
+    page_cursor = decode_page_cursor(cursor)
     try:
-        connection = get_db_connection()
-        if connection is None:
-            print("db tidak connect")
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        like_pattern = f"%{query}%"
-        
-        # Query untuk tabel GSM (casting kolom numeric ke text dan menggunakan ILIKE)
-        gsm_query = """
-            SELECT * FROM gsm_data
-            WHERE campaign_id = %s AND (
-                CAST(mcc AS TEXT) ILIKE %s OR 
-                CAST(mnc AS TEXT) ILIKE %s OR 
-                operator ILIKE %s OR 
-                CAST(local_area_code AS TEXT) ILIKE %s OR 
-                CAST(cell_identity AS TEXT) ILIKE %s
-            )
-        """
-        cursor.execute(gsm_query, (id_campaign, like_pattern, like_pattern, like_pattern, like_pattern, like_pattern))
-        gsm_data = cursor.fetchall()
-        for row in gsm_data:
-            row['type'] = 'gsm'
-        
-        # Query untuk tabel LTE dengan ILIKE
-        lte_query = """
-            SELECT * FROM lte_data
-            WHERE campaign_id = %s AND (
-                mcc ILIKE %s OR 
-                mnc ILIKE %s OR 
-                operator ILIKE %s OR 
-                CAST(cell_identity AS TEXT) ILIKE %s OR 
-                tracking_area_code ILIKE %s OR 
-                frequency_band_indicator ILIKE %s
+        with db_connection() as connection:
+            db_cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
+
+            # Query angka: hit exact (index btree) tampil lebih dulu, lalu substring lewat
+            # index trigram pada ekspresi search key; "mcc-mnc" dicari exact saja
+            mode, filters, params = bts_search.build_filters(query)
+            where = bts_search.combined(filters)
+            db_cursor.execute(f"""
+                SELECT
+                    (SELECT COUNT(*) FROM gsm_data WHERE campaign_id = %(campaign_id)s AND ({where["gsm"]})) AS gsm_total,
+                    (SELECT COUNT(*) FROM lte_data WHERE campaign_id = %(campaign_id)s AND ({where["lte"]})) AS lte_total
+            """, dict(params, campaign_id=id_campaign), name="search.counts")
+            counts = db_cursor.fetchone()
+
+            # Pagination hasil gabungan dilakukan di database
+            gsm_data_paginated, lte_data_paginated, next_cursor, prev_cursor = fetch_unified_page(
+                db_cursor, id_campaign, page, limit, page_cursor, filters=filters, params=params
             )
-        """
-        cursor.execute(lte_query, (id_campaign, like_pattern, like_pattern, like_pattern, like_pattern, like_pattern, like_pattern))
-        lte_data = cursor.fetchall()
-        for row in lte_data:
-            row['type'] = 'lte'
         
-        # Gabungkan hasil pencarian dari kedua tabel
-        combined_data = gsm_data + lte_data
-        total_count = len(combined_data)
-        
-        # Lakukan pagination pada data gabungan
-        start_index = (page - 1) * limit
-        end_index = start_index + limit
-        paginated_data = combined_data[start_index:end_index]
-        
-        # Pisahkan data hasil pagination berdasarkan tipe
-        gsm_data_paginated = [item for item in paginated_data if item['type'] == 'gsm']
-        lte_data_paginated = [item for item in paginated_data if item['type'] == 'lte']
-        
-        return {
-            "status": "success",
-            "id_campaign": id_campaign,
-            "gsm_data": gsm_data_paginated,
-            "lte_data": lte_data_paginated,
-            "page": page,
-            "limit": limit,
-            "total_count": total_count,
-            "gsm_total": len(gsm_data),
-            "lte_total": len(lte_data)
-        }
+            return {
+                "status": "success",
+                "id_campaign": id_campaign,
+                "gsm_data": gsm_data_paginated,
+                "lte_data": lte_data_paginated,
+                "page": page,
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+                "search_mode": mode,
+                "total_count": counts["gsm_total"] + counts["lte_total"],
+                "gsm_total": counts["gsm_total"],
+                "lte_total": counts["lte_total"]
+            }
         
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
 
 
+@timed_query
 def list_devices():
-    connection = get_db_connection()
-    try:
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        query = """
-            SELECT 
-                d.id AS device_id,
-                d.serial_number,
-                d.ip,
-                d.is_connected,
-                d.is_running,
-                d.lat,
-                d.long,
-                d.created_at AS device_created_at,
-                dg.id AS group_id,
-                dg.group_name,
-                dg.description,
-                dg.created_at AS group_created_at
-            FROM devices d
-            LEFT JOIN device_group dg ON d.group_id = dg.id
-            ORDER BY d.id ASC
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
+    with db_connection() as connection:
+        try:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
+            query = """
+                SELECT 
+                    d.id AS device_id,
+                    d.serial_number,
+                    d.ip,
+                    d.is_connected,
+                    d.is_running,
+                    d.lat,
+                    d.long,
+                    d.created_at AS device_created_at,
+                    dg.id AS group_id,
+                    dg.group_name,
+                    dg.description,
+                    dg.created_at AS group_created_at
+                FROM devices d
+                LEFT JOIN device_group dg ON d.group_id = dg.id
+                ORDER BY d.id ASC
+            """
+            cursor.execute(query)
+            rows = cursor.fetchall()
         
-        devices = []
-        for row in rows:
-            device = {
-                "id": row["device_id"],
-                "serial_number": row["serial_number"],
-                "ip": row["ip"],
-                "is_connected": row["is_connected"],
-                "is_running": row["is_running"],
-                "lat":row["lat"],
-                "long":row["long"],
-                "created_at": row["device_created_at"]
-            }
-            # Jika device memiliki group, masukkan detail group ke dalam sub-objek
-            if row["group_id"] is not None:
-                device["group"] = {
-                    "id": row["group_id"],
-                    "group_name": row["group_name"],
-                    "description": row["description"],
-                    "created_at": row["group_created_at"]
+            devices = []
+            for row in rows:
+                device = {
+                    "id": row["device_id"],
+                    "serial_number": row["serial_number"],
+                    "ip": row["ip"],
+                    "is_connected": row["is_connected"],
+                    "is_running": row["is_running"],
+                    "lat":row["lat"],
+                    "long":row["long"],
+                    "created_at": row["device_created_at"]
                 }
-            else:
-                device["group"] = None
-            devices.append(device)
+                # Jika device memiliki group, masukkan detail group ke dalam sub-objek
+                if row["group_id"] is not None:
+                    device["group"] = {
+                        "id": row["group_id"],
+                        "group_name": row["group_name"],
+                        "description": row["description"],
+                        "created_at": row["group_created_at"]
+                    }
+                else:
+                    device["group"] = None
+                devices.append(device)
             
-        return {"status": "success", "devices": devices}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        cursor.close()
-        connection.close()
+            return {"status": "success", "devices": devices}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        finally:
+            cursor.close()
 
 
-def device_information():
-    connection = get_db_connection()
-    try:
-        cursor = connection.cursor()
-        
-        # Inactive count: device yang tidak terhubung (is_connected = FALSE)
-        cursor.execute("SELECT COUNT(*) FROM devices WHERE is_connected = FALSE")
-        inactive_count = cursor.fetchone()[0]
-
-        # Available count: device yang terhubung tapi tidak running (is_connected = TRUE AND is_running = FALSE)
-        cursor.execute("SELECT COUNT(*) FROM devices WHERE is_connected = TRUE AND is_running = FALSE")
-        available_count = cursor.fetchone()[0]
-
-        # Running count: device yang sedang running (is_running = TRUE)
-        cursor.execute("SELECT COUNT(*) FROM devices WHERE is_running = TRUE")
-        running_count = cursor.fetchone()[0]
-
-        # Threat BTS: jumlah data GSM dan LTE dengan status FALSE
-        cursor.execute("SELECT COUNT(*) FROM gsm_data WHERE status = FALSE")
-        threat_gsm = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM lte_data WHERE status = FALSE")
-        threat_lte = cursor.fetchone()[0]
-        threat_bts = threat_gsm + threat_lte
-
-        # Total BTS: total data dari gsm_data dan lte_data
-        cursor.execute("SELECT COUNT(*) FROM gsm_data")
-        total_gsm = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM lte_data")
-        total_lte = cursor.fetchone()[0]
-        total_bts = total_gsm + total_lte
-
-        # Count per generation:
-        # Asumsikan semua data GSM merupakan 2G.
-        count_2g = total_gsm
-        count_4g = total_lte
+# Ringkasan dashboard disimpan sebentar; penulisan device/campaign memanggil invalidate_fleet_summary()
+FLEET_SUMMARY_TTL = float(os.environ.get("FLEET_SUMMARY_TTL", 5))
+_fleet_summary_lock = threading.Lock()
+_fleet_summary = {"value": None, "expires_at": 0.0}
 
-        return {
-            "inactive": inactive_count,
-            "available": available_count,
-            "running": running_count,
-            "threat_bts": threat_bts,
-            "total_bts": total_bts,
-            "total_4G": count_4g,
-            "total_2G": count_2g
-        }
-    except Exception as e:
-        print(f"Error retrieving status counts: {e}")
-        return None
-    finally:
-        cursor.close()
-        connection.close()
 
+def invalidate_fleet_summary():
+    with _fleet_summary_lock:
+        _fleet_summary["value"] = None
+
+
+@timed_query
+def device_information(use_cache: bool = True):
+    # Status device dihitung dengan satu query agregat bersyarat; total BTS diambil dari
+    # counter campaign_stats (satu baris per campaign) sehingga tidak ikut melambat saat
+    # gsm_data/lte_data membesar.
+    if use_cache:
+        with _fleet_summary_lock:
+            if _fleet_summary["value"] is not None and _fleet_summary["expires_at"] > time.monotonic():
+                return dict(_fleet_summary["value"])
+
+    with db_connection() as connection:
+        try:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
+            cursor.execute("""
+                WITH device_counts AS (
+                    SELECT
+                        COUNT(*) FILTER (WHERE is_connected = FALSE) AS inactive,
+                        COUNT(*) FILTER (WHERE is_connected = TRUE AND is_running = FALSE) AS available,
+                        COUNT(*) FILTER (WHERE is_running = TRUE) AS running
+                    FROM devices
+                ),
+                bts_counts AS (
+                    SELECT
+                        COALESCE(SUM(gsm_threat_count + lte_threat_count), 0)::bigint AS threat_bts,
+                        COALESCE(SUM(gsm_total), 0)::bigint AS total_gsm,
+                        COALESCE(SUM(lte_total), 0)::bigint AS total_lte
+                    FROM campaign_stats
+                )
+                SELECT * FROM device_counts, bts_counts
+            """, name="device_information.summary")
+            row = cursor.fetchone()
+
+            # Count per generation:
+            # Asumsikan semua data GSM merupakan 2G.
+            summary = {
+                "inactive": row["inactive"],
+                "available": row["available"],
+                "running": row["running"],
+                "threat_bts": row["threat_bts"],
+                "total_bts": row["total_gsm"] + row["total_lte"],
+                "total_4G": row["total_lte"],
+                "total_2G": row["total_gsm"]
+            }
+        except Exception as e:
+            print(f"Error retrieving status counts: {e}")
+            return None
+        finally:
+            cursor.close()
+
+    with _fleet_summary_lock:
+        _fleet_summary["value"] = summary
+        _fleet_summary["expires_at"] = time.monotonic() + FLEET_SUMMARY_TTL
+    return dict(summary)
+
+@timed_query
 def device_information_detail(id : int):
-    conn= get_db_connection()
-    try:
-        cursor =  conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT * FROM devices WHERE id = %s", (id,))
-        device = cursor.fetchone()
-        return device
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    with db_connection() as conn:
+        try:
+            cursor =  conn.cursor(cursor_factory=TimedRealDictCursor)
+            cursor.execute("SELECT * FROM devices WHERE id = %s", (id,))
+            device = cursor.fetchone()
+            return device
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        finally:
+            cursor.close()
 
+@timed_query
 def devicegroup():
-    conn = get_db_connection()
+    with db_connection() as conn:
+        try:
+            cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+            query = """
+                SELECT 
+                    dg.id AS group_id,
+                    dg.group_name,
+                    dg.description,
+                    dg.created_at AS group_created_at,
+                    dg.user_id,
+                    u.email AS owner_email,
+                    u.username AS owner_username,
+                    u.role AS owner_role,
+                    d.id AS device_id,
+                    d.serial_number,
+                    d.ip,
+                    d.is_connected,
+                    d.is_running,
+                    d.created_at AS device_created_at
+                FROM device_group dg
+                LEFT JOIN users u ON dg.user_id = u.id
+                LEFT JOIN devices d ON dg.id = d.group_id
+                ORDER BY dg.id;
+            """
+            cursor.execute(query)
+            rows = cursor.fetchall()
+
+            groups = {}
+            for row in rows:
+                group_id = row["group_id"]
+                if group_id not in groups:
+                    groups[group_id] = {
+                        "group_id": group_id,
+                        "group_name": row["group_name"],
+                        "description": row["description"],
+                        "created_at": row["group_created_at"],
+                        "group_status": "assigned" if row["user_id"] is not None else "unassigned",
+                        "owner": {
+                            "user_id": row["user_id"],
+                            "email": row["owner_email"],
+                            "username": row["owner_username"],
+                            "role": row["owner_role"]
+                        } if row["user_id"] is not None else None,
+                        "devices": []
+                    }
+                # Jika ada data device (LEFT JOIN dapat menghasilkan nilai NULL untuk device)
+                if row.get("device_id") is not None:
+                    device = {
+                        "device_id": row["device_id"],
+                        "serial_number": row["serial_number"],
+                        "ip": row["ip"],
+                        "is_connected": row["is_connected"],
+                        "is_running": row["is_running"],
+                        "created_at": row["device_created_at"]
+                    }
+                    groups[group_id]["devices"].append(device)
+                
+            return {"status": "success", "device_groups": list(groups.values())}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        finally:
+            cursor.close()
+
+
+@timed_query
+def get_all_campaigns(page: int = 1, limit: int = 10):
+    # Satu query: total, halaman campaign, user, jumlah BTS (campaign_stats) dan device (LEFT JOIN).
+    # Baris total selalu ada walaupun halaman kosong, sehingga total_campaigns tetap terisi.
     try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        query = """
-            SELECT 
-                dg.id AS group_id,
-                dg.group_name,
-                dg.description,
-                dg.created_at AS group_created_at,
-                dg.user_id,
-                u.email AS owner_email,
-                u.username AS owner_username,
-                u.role AS owner_role,
-                d.id AS device_id,
-                d.serial_number,
-                d.ip,
-                d.is_connected,
-                d.is_running,
-                d.created_at AS device_created_at
-            FROM device_group dg
-            LEFT JOIN users u ON dg.user_id = u.id
-            LEFT JOIN devices d ON dg.id = d.group_id
-            ORDER BY dg.id;
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        groups = {}
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=TimedRealDictCursor)
+            offset = (page - 1) * limit
+            cursor.execute("""
+                WITH page AS (
+                    SELECT id, name, status, time_start, time_stop, user_id
+                    FROM campaign
+                    ORDER BY id DESC
+                    LIMIT %s OFFSET %s
+                )
+                SELECT
+                    t.total_campaigns,
+                    p.id,
+                    p.name,
+                    p.status,
+                    p.time_start,
+                    p.time_stop,
+                    u.id AS user_id,
+                    u.username,
+                    u.email,
+                    u.role,
+                    COALESCE(cs.gsm_total + cs.lte_total, 0) AS jumlah_bts,
+                    d.id AS device_id,
+                    d.serial_number,
+                    d.ip,
+                    d.is_connected,
+                    d.created_at AS device_created_at
+                FROM (SELECT COUNT(*) AS total_campaigns FROM campaign) t
+                LEFT JOIN page p ON TRUE
+                LEFT JOIN users u ON u.id = p.user_id
+                LEFT JOIN campaign_stats cs ON cs.campaign_id = p.id
+                LEFT JOIN (
+                    campaign_devices cd
+                    JOIN devices d ON cd.device_id = d.id
+                ) ON cd.campaign_id = p.id
+                ORDER BY p.id DESC, d.id
+            """, (limit, offset), name="all_campaigns.page")
+            rows = cursor.fetchall()
+            cursor.close()
+
+        total_campaigns = rows[0]["total_campaigns"] if rows else 0
+        campaigns = {}
         for row in rows:
-            group_id = row["group_id"]
-            if group_id not in groups:
-                groups[group_id] = {
-                    "group_id": group_id,
-                    "group_name": row["group_name"],
-                    "description": row["description"],
-                    "created_at": row["group_created_at"],
-                    "group_status": "assigned" if row["user_id"] is not None else "unassigned",
-                    "owner": {
-                        "user_id": row["user_id"],
-                        "email": row["owner_email"],
-                        "username": row["owner_username"],
-                        "role": row["owner_role"]
-                    } if row["user_id"] is not None else None,
-                    "devices": []
+            campaign_id = row["id"]
+            if campaign_id is None:
+                # Halaman kosong: hanya baris total
+                continue
+            if campaign_id not in campaigns:
+                user = None
+                if row["user_id"] is not None:
+                    user = {
+                        "id": row["user_id"],
+                        "username": row["username"],
+                        "email": row["email"],
+                        "role": row["role"]
+                    }
+                campaigns[campaign_id] = {
+                    "id_campaign": campaign_id,
+                    "campaign_name": row.get("name", ""),
+                    "status": row["status"],
+                    "time_start": row["time_start"],
+                    "time_stop": row["time_stop"],
+                    "user": user,
+                    "jumlah_device": 0,
+                    "devices": [],
+                    "jumlah_bts": row["jumlah_bts"],
+                    "jumlah_threads": 0
                 }
-            # Jika ada data device (LEFT JOIN dapat menghasilkan nilai NULL untuk device)
-            if row.get("device_id") is not None:
-                device = {
-                    "device_id": row["device_id"],
+            if row["device_id"] is not None:
+                summary = campaigns[campaign_id]
+                summary["devices"].append({
+                    "id": row["device_id"],
                     "serial_number": row["serial_number"],
                     "ip": row["ip"],
                     "is_connected": row["is_connected"],
-                    "is_running": row["is_running"],
                     "created_at": row["device_created_at"]
-                }
-                groups[group_id]["devices"].append(device)
-                
-        return {"status": "success", "device_groups": list(groups.values())}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
-
-
-def get_all_campaigns(page: int = 1, limit: int = 10):
-    try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-
-        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Ambil total jumlah campaign
-        cursor.execute("SELECT COUNT(*) AS total FROM campaign")
-        total_campaigns = cursor.fetchone()["total"]
-        
-        offset = (page - 1) * limit
-        
-        # Ambil data campaign dengan pagination
-        cursor.execute("""
-            SELECT id, name, status, time_start, time_stop, user_id 
-            FROM campaign 
-            ORDER BY id DESC
-            LIMIT %s OFFSET %s
-        """, (limit, offset))
-        campaigns = cursor.fetchall()
-        
-        results = []
-        for camp in campaigns:
-            campaign_id = camp["id"]
-            # Ambil data user (pembuat campaign)
-            cursor.execute("""
-                SELECT id, username, email, role 
-                FROM users 
-                WHERE id = %s
-            """, (camp["user_id"],))
-            user = cursor.fetchone()
-            
-            # Ambil daftar device yang terlibat (JOIN campaign_devices dan devices)
-            cursor.execute("""
-                SELECT d.id, d.serial_number, d.ip, d.is_connected, d.created_at 
-                FROM campaign_devices cd
-                JOIN devices d ON cd.device_id = d.id
-                WHERE cd.campaign_id = %s
-            """, (campaign_id,))
-            devices = cursor.fetchall()
-            device_count = len(devices)
-            
-            # Hitung jumlah BTS dari GSM dan LTE
-            cursor.execute("SELECT COUNT(*) AS count FROM gsm_data WHERE campaign_id = %s", (campaign_id,))
-            gsm_count = cursor.fetchone()["count"]
-            cursor.execute("SELECT COUNT(*) AS count FROM lte_data WHERE campaign_id = %s", (campaign_id,))
-            lte_count = cursor.fetchone()["count"]
-            total_bts = gsm_count + lte_count
-            # Diasumsikan jumlah threads sama dengan jumlah device
-            thread_count = device_count
+                })
+                summary["jumlah_device"] = len(summary["devices"])
+                # Diasumsikan jumlah threads sama dengan jumlah device
+                summary["jumlah_threads"] = summary["jumlah_device"]
 
-            summary = {
-                "id_campaign": campaign_id,
-                "campaign_name": camp.get("name", ""),
-                "status": camp["status"],
-                "time_start": camp["time_start"],
-                "time_stop": camp["time_stop"],
-                "user": user,
-                "jumlah_device": device_count,
-                "devices": devices,
-                "jumlah_bts": total_bts,
-                "jumlah_threads": thread_count
-            }
-            results.append(summary)
-        
         return {
             "status": "success",
             "page": page,
             "limit": limit,
             "total_campaigns": total_campaigns,
-            "campaigns": results
+            "campaigns": list(campaigns.values())
         }
-        
+
     except Exception as e:
         print(f"Error: {e}")
         return None
-    finally:
-        if connection:
-            cursor.close()
-            connection.close()
-
-def remove_device(device_id):
-    conn = get_db_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection error")
-    
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        # Cek apakah device ada
-        cursor.execute("SELECT group_id FROM devices WHERE id = %s", (device_id,))
-        device_row = cursor.fetchone()
-        if not device_row:
-            raise HTTPException(status_code=404, detail="Device not found")
 
-        # Jika device sudah tidak ada group, kembalikan pesan
-        if device_row["group_id"] is None:
-            raise HTTPException(status_code=400, detail="Device does not belong to any group")
 
-        # Update group_id = NULL
-        update_query = "UPDATE devices SET group_id = NULL WHERE id = %s"
-        cursor.execute(update_query, (device_id,))
-        conn.commit()
+@timed_query
+def remove_device(device_id):
+    with db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        try:
+            # Cek apakah device ada
+            cursor.execute("SELECT group_id FROM devices WHERE id = %s", (device_id,))
+            device_row = cursor.fetchone()
+            if not device_row:
+                raise HTTPException(status_code=404, detail="Device not found")
+
+            # Jika device sudah tidak ada group, kembalikan pesan
+            if device_row["group_id"] is None:
+                raise HTTPException(status_code=400, detail="Device does not belong to any group")
+
+            # Update group_id = NULL
+            update_query = "UPDATE devices SET group_id = NULL WHERE id = %s"
+            cursor.execute(update_query, (device_id,))
+            conn.commit()
 
-        return {
-            "status": "success",
-            "message": f"Device {device_id} removed from group successfully."
-        }
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+            return {
+                "status": "success",
+                "message": f"Device {device_id} removed from group successfully."
+            }
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        finally:
+            cursor.close()
 
 
+@timed_query
 def addDeviceToGroup(device_id, group_id):
-    conn = get_db_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection error")
-    
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        # Cek apakah device ada dan belum punya group
-        cursor.execute("SELECT group_id FROM devices WHERE id = %s", (device_id,))
-        device_row = cursor.fetchone()
-        if not device_row:
-            raise HTTPException(status_code=404, detail="Device not found")
-
-        # Jika device sudah punya group, tolak
-        if device_row["group_id"] is not None:
-            raise HTTPException(status_code=400, detail="Device already belongs to a group")
-
-        # Cek apakah group ada
-        cursor.execute("SELECT id FROM device_group WHERE id = %s", (group_id,))
-        group_row = cursor.fetchone()
-        if not group_row:
-            raise HTTPException(status_code=404, detail="Group not found")
-
-        # Update devices: set group_id ke group_id yang diinginkan
-        update_query = "UPDATE devices SET group_id = %s WHERE id = %s"
-        cursor.execute(update_query, (group_id, device_id))
-        conn.commit()
+    with db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        try:
+            # Cek apakah device ada dan belum punya group
+            cursor.execute("SELECT group_id FROM devices WHERE id = %s", (device_id,))
+            device_row = cursor.fetchone()
+            if not device_row:
+                raise HTTPException(status_code=404, detail="Device not found")
+
+            # Jika device sudah punya group, tolak
+            if device_row["group_id"] is not None:
+                raise HTTPException(status_code=400, detail="Device already belongs to a group")
+
+            # Cek apakah group ada
+            cursor.execute("SELECT id FROM device_group WHERE id = %s", (group_id,))
+            group_row = cursor.fetchone()
+            if not group_row:
+                raise HTTPException(status_code=404, detail="Group not found")
+
+            # Update devices: set group_id ke group_id yang diinginkan
+            update_query = "UPDATE devices SET group_id = %s WHERE id = %s"
+            cursor.execute(update_query, (group_id, device_id))
+            conn.commit()
 
-        return {
-            "status": "success",
-            "message": f"Device {device_id} added to group {group_id} successfully."
-        }
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+            return {
+                "status": "success",
+                "message": f"Device {device_id} added to group {group_id} successfully."
+            }
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        finally:
+            cursor.close()
 
+@timed_query
 def deleteuser(user_id):
-    conn = get_db_connection()
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Database connection error")
-
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        # 1. Cek apakah user dengan user_id tersebut ada
-        cursor.execute("SELECT id, email, username FROM users WHERE id = %s", (user_id,))
-        user_row = cursor.fetchone()
-        if not user_row:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        # 2. Cek apakah ada group yang dimiliki user ini, set user_id ke NULL
-        cursor.execute("SELECT id FROM device_group WHERE user_id = %s", (user_id,))
-        groups_owned = cursor.fetchall()
-        if groups_owned:
-            # Set user_id = NULL untuk semua group yang dimiliki user ini
-            cursor.execute("UPDATE device_group SET user_id = NULL WHERE user_id = %s", (user_id,))
+    with db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        try:
+            # 1. Cek apakah user dengan user_id tersebut ada
+            cursor.execute("SELECT id, email, username FROM users WHERE id = %s", (user_id,))
+            user_row = cursor.fetchone()
+            if not user_row:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            # 2. Cek apakah ada group yang dimiliki user ini, set user_id ke NULL
+            cursor.execute("SELECT id FROM device_group WHERE user_id = %s", (user_id,))
+            groups_owned = cursor.fetchall()
+            if groups_owned:
+                # Set user_id = NULL untuk semua group yang dimiliki user ini
+                cursor.execute("UPDATE device_group SET user_id = NULL WHERE user_id = %s", (user_id,))
+
+            # 3. Hapus user dari tabel users
+            cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
 
-        # 3. Hapus user dari tabel users
-        cursor.execute("DELETE FROM users WHERE id = %s", (user_id,))
-
-        conn.commit()
+            conn.commit()
 
-        return {
-            "status": "success",
-            "message": f"User with id={user_id} has been deleted successfully.",
-            "deleted_user": {
-                "id": user_id,
-                "email": user_row["email"],
-                "username": user_row["username"]
+            return {
+                "status": "success",
+                "message": f"User with id={user_id} has been deleted successfully.",
+                "deleted_user": {
+                    "id": user_id,
+                    "email": user_row["email"],
+                    "username": user_row["username"]
+                }
             }
-        }
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {e.pgerror}")
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=f"Error: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=f"Database error: {e.pgerror}")
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=f"Error: {e}")
+        finally:
+            cursor.close()
 
+@timed_query
 def editUser(user_id, username , password, group_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        # Cek apakah user dengan user_id tersebut ada
-        cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
-        user = cursor.fetchone()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+    with db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        try:
+            # Cek apakah user dengan user_id tersebut ada
+            cursor.execute("SELECT id FROM users WHERE id = %s", (user_id,))
+            user = cursor.fetchone()
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
         
-        # Jika email diberikan, cek apakah sudah digunakan oleh user lain
-        if username:
-            cursor.execute("SELECT id FROM users WHERE username = %s AND id <> %s", (username, user_id))
-            if cursor.fetchone():
-                raise HTTPException(status_code=400, detail="username already in use by another user.")
-
-        # Jika group_id diberikan, cek apakah group ada dan valid
-        if group_id is not None:
-            cursor.execute("SELECT user_id FROM device_group WHERE id = %s", (group_id,))
-            group_info = cursor.fetchone()
-            if not group_info:
-                raise HTTPException(status_code=404, detail="Selected group not found.")
-            # Perbolehkan update jika group belum memiliki owner atau jika owner tersebut adalah user yang sedang diedit
-            if group_info["user_id"] is not None and group_info["user_id"] != user_id:
-                raise HTTPException(status_code=400, detail="Selected group already has an owner.")
+            # Jika email diberikan, cek apakah sudah digunakan oleh user lain
+            if username:
+                cursor.execute("SELECT id FROM users WHERE username = %s AND id <> %s", (username, user_id))
+                if cursor.fetchone():
+                    raise HTTPException(status_code=400, detail="username already in use by another user.")
+
+            # Jika group_id diberikan, cek apakah group ada dan valid
+            if group_id is not None:
+                cursor.execute("SELECT user_id FROM device_group WHERE id = %s", (group_id,))
+                group_info = cursor.fetchone()
+                if not group_info:
+                    raise HTTPException(status_code=404, detail="Selected group not found.")
+                # Perbolehkan update jika group belum memiliki owner atau jika owner tersebut adalah user yang sedang diedit
+                if group_info["user_id"] is not None and group_info["user_id"] != user_id:
+                    raise HTTPException(status_code=400, detail="Selected group already has an owner.")
         
-        # Siapkan update query dinamis berdasarkan field yang diupdate
-        update_fields = []
-        update_values = []
-        if username:
-            update_fields.append("username = %s")
-            update_values.append(username)
-        if password:
-            # Gantikan fungsi hashing dengan enkripsi reversible
-            encrypted_pw = encrypt_password(password)
-            update_fields.append("password = %s")
-            update_values.append(encrypted_pw)
+            # Siapkan update query dinamis berdasarkan field yang diupdate
+            update_fields = []
+            update_values = []
+            if username:
+                update_fields.append("username = %s")
+                update_values.append(username)
+            if password:
+                # Gantikan fungsi hashing dengan enkripsi reversible
+                encrypted_pw = encrypt_password(password)
+                update_fields.append("password = %s")
+                update_values.append(encrypted_pw)
         
-        if update_fields:
-            # Tambahkan kondisi WHERE
-            update_values.append(user_id)
-            update_query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
-            cursor.execute(update_query, tuple(update_values))
-            conn.commit()
-
-        # Jika group_id diberikan, update device_group hanya jika nilai group_id berubah
-        if group_id is not None:
-            cursor.execute("UPDATE device_group SET user_id = %s WHERE id = %s", (user_id, group_id))
-            conn.commit()
-
-        # Kembalikan data user terbaru
-        cursor.execute("SELECT id, username, created_at FROM users WHERE id = %s", (user_id,))
-        updated_user = cursor.fetchone()
-        return {
-            "status": "success",
-            "message": "User updated successfully",
-            "user": updated_user
-        }
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Database error: {e.pgerror}")
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+            if update_fields:
+                # Tambahkan kondisi WHERE
+                update_values.append(user_id)
+                update_query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
+                cursor.execute(update_query, tuple(update_values))
+                conn.commit()
+
+            # Jika group_id diberikan, update device_group hanya jika nilai group_id berubah
+            if group_id is not None:
+                cursor.execute("UPDATE device_group SET user_id = %s WHERE id = %s", (user_id, group_id))
+                conn.commit()
+
+            # Kembalikan data user terbaru
+            cursor.execute("SELECT id, username, created_at FROM users WHERE id = %s", (user_id,))
+            updated_user = cursor.fetchone()
+            return {
+                "status": "success",
+                "message": "User updated successfully",
+                "user": updated_user
+            }
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=f"Database error: {e.pgerror}")
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            cursor.close()
 
 
 
+@timed_query
 def listUser():
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        query = """
-            SELECT 
-                u.id,
-                u.email,
-                u.username,
-                u.name,
-                u.role,
-                u.created_at,
-                dg.id AS group_id,
-                dg.group_name,
-                dg.description AS group_description,
-                dg.created_at AS group_created_at
-            FROM users u
-            LEFT JOIN device_group dg ON u.id = dg.user_id
-            ORDER BY u.id;
-        """
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        users = []
-        for row in rows:
-            user = {
-                "id": row["id"],
-                "email": row["email"],
-                "username": row["username"],
-                "name": row["name"],
-                "role": row["role"],
-                "created_at": row["created_at"],
-            }
-            # Jika ada data group, masukkan ke dalam objek group
-            if row["group_id"] is not None:
-                user["group"] = {
-                    "group_id": row["group_id"],
-                    "group_name": row["group_name"],
-                    "group_description": row["group_description"],
-                    "group_created_at": row["group_created_at"],
+    with db_connection() as conn:
+        try:
+            cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+            query = """
+                SELECT 
+                    u.id,
+                    u.email,
+                    u.username,
+                    u.name,
+                    u.role,
+                    u.created_at,
+                    dg.id AS group_id,
+                    dg.group_name,
+                    dg.description AS group_description,
+                    dg.created_at AS group_created_at
+                FROM users u
+                LEFT JOIN device_group dg ON u.id = dg.user_id
+                ORDER BY u.id;
+            """
+            cursor.execute(query)
+            rows = cursor.fetchall()
+
+            users = []
+            for row in rows:
+                user = {
+                    "id": row["id"],
+                    "email": row["email"],
+                    "username": row["username"],
+                    "name": row["name"],
+                    "role": row["role"],
+                    "created_at": row["created_at"],
                 }
-            else:
-                user["group"] = None
-            users.append(user)
+                # Jika ada data group, masukkan ke dalam objek group
+                if row["group_id"] is not None:
+                    user["group"] = {
+                        "group_id": row["group_id"],
+                        "group_name": row["group_name"],
+                        "group_description": row["group_description"],
+                        "group_created_at": row["group_created_at"],
+                    }
+                else:
+                    user["group"] = None
+                users.append(user)
 
-        return {"status": "success", "users": users}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
+            return {"status": "success", "users": users}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            cursor.close()
 
 
+@timed_query
 def getPassword(user_id: str) -> str:
-    conn = get_db_connection()
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        cursor.execute("SELECT password FROM users WHERE id = %s", (user_id,))
-        password_record = cursor.fetchone()
+    with db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=TimedRealDictCursor)
+        try:
+            cursor.execute("SELECT password FROM users WHERE id = %s", (user_id,))
+            password_record = cursor.fetchone()
 
-        if not password_record:
-            raise HTTPException(status_code=404, detail="User tidak ditemukan")
+            if not password_record:
+                raise HTTPException(status_code=404, detail="User tidak ditemukan")
 
-        encrypted_password = password_record["password"]
+            encrypted_password = password_record["password"]
 
-        decrypted_password = fernet.decrypt(encrypted_password.encode()).decode()
+            decrypted_password = fernet.decrypt(encrypted_password.encode()).decode()
 
-        return decrypted_password
+            return decrypted_password
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        cursor.close()
-        conn.close()
\ No newline at end of file
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            cursor.close()
\ No newline at end of file
@@ -1,18 +1,217 @@
 import psycopg2
+import psycopg2.extensions
 import os
+import threading
+import time
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Konfigurasi pool koneksi (bisa diatur lewat .env)
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+# Batas waktu menunggu koneksi kosong dari pool (detik)
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))
+# Koneksi yang menganggur lebih lama dari ini dicek dengan SELECT 1 saat checkout
+DB_POOL_HEALTHCHECK_IDLE = float(os.environ.get("DB_POOL_HEALTHCHECK_IDLE", 30))
+
+
+def _connect_params():
+    return {
+        "host": os.environ.get("DB_HOST"),
+        "dbname": os.environ.get("DB_NAME"),
+        "user": os.environ.get("DB_USER"),
+        "password": os.environ.get("DB_PASS"),
+    }
+
+
 def get_db_connection():
     try:
-        conn = psycopg2.connect(
-            host=os.environ.get("DB_HOST"),
-            dbname=os.environ.get("DB_NAME"),
-            user=os.environ.get("DB_USER"),
-            password=os.environ.get("DB_PASS")
-        )
+        conn = psycopg2.connect(**_connect_params())
         return conn
     except psycopg2.Error as e:
         print(f"Error connecting to the database: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+class ConnectionPool:
+    """Pool koneksi PostgreSQL untuk satu proses, aman dipakai dari banyak thread.
+
+    Koneksi yang dikembalikan disimpan sampai maxconn (bukan ditutup di atas minconn seperti
+    psycopg2.pool), jadi checkout berikutnya tidak membayar connect + auth lagi.
+    minconn koneksi dibuka saat pool pertama kali dipakai.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE):
+        self.minconn = min(minconn, maxconn)
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        # Koneksi menganggur; dipakai LIFO supaya koneksi yang baru dipakai (masih hangat) didahulukan
+        self._idle = []
+        self._warmed = False
+        self._init_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Jumlah koneksi yang dipinjam dibatasi semaphore; yang lain menunggu sampai timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._connects = 0
+        self._checkout_time_total = 0.0
+        self._checkout_time_max = 0.0
+
+    def _connect(self):
+        conn = psycopg2.connect(**_connect_params())
+        with self._stats_lock:
+            self._connects += 1
+        return conn
+
+    def _warm_up(self):
+        if self._warmed:
+            return
+        with self._init_lock:
+            if self._warmed:
+                return
+            self._warmed = True
+            for _ in range(self.minconn):
+                conn = self._connect()
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+
+    def _take_idle(self):
+        with self._init_lock:
+            return self._idle.pop() if self._idle else None
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        with self._stats_lock:
+            self._discarded += 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        with self._stats_lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        with self._stats_lock:
+            self._waiting -= 1
+            if not acquired:
+                self._timeouts += 1
+        if not acquired:
+            raise psycopg2.OperationalError(
+                f"Timeout menunggu koneksi dari pool ({self.maxconn} koneksi terpakai)"
+            )
+
+        try:
+            self._warm_up()
+            conn = self._take_idle()
+            # Koneksi mati (restart DB, idle timeout, dll) dibuang lalu ambil yang lain / buka baru
+            while conn is not None and not self._is_healthy(conn):
+                self._discard(conn)
+                conn = self._take_idle()
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+        elapsed = time.monotonic() - started
+        with self._stats_lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._checkout_time_total += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if not close and not conn.closed:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    # Sama seperti psycopg2.pool: transaksi yang tertinggal dibatalkan
+                    try:
+                        conn.rollback()
+                    except psycopg2.Error:
+                        close = True
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                with self._init_lock:
+                    self._idle.append(conn)
+        finally:
+            with self._stats_lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        with self._init_lock:
+            for conn in self._idle:
+                conn.close()
+            self._idle.clear()
+            self._last_used.clear()
+            self._warmed = False
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts = self._checkouts
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "idle": len(self._idle),
+                "connects": self._connects,
+                "checkout_latency_avg_ms": (self._checkout_time_total / checkouts * 1000) if checkouts else 0.0,
+                "checkout_latency_max_ms": self._checkout_time_max * 1000,
+            }
+
+
+# Pool global untuk seluruh proses
+pool = ConnectionPool()
+
+
+@contextmanager
+def db_connection():
+    """Pinjam koneksi dari pool; transaksi yang belum di-commit otomatis di-rollback saat dikembalikan."""
+    conn = pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+def get_pool_stats():
+    return pool.stats()
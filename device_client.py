@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+import httpx
+import metrics
+
+# Port API kontrol di setiap device (start/stop capture)
+DEVICE_API_PORT = int(os.environ.get("DEVICE_API_PORT", 8003))
+# Batas waktu per device (detik); device yang tidak menjawab tidak menahan device lain
+DEVICE_API_CONNECT_TIMEOUT = float(os.environ.get("DEVICE_API_CONNECT_TIMEOUT", 3))
+DEVICE_API_READ_TIMEOUT = float(os.environ.get("DEVICE_API_READ_TIMEOUT", 10))
+DEVICE_API_MAX_CONNECTIONS = int(os.environ.get("DEVICE_API_MAX_CONNECTIONS", 100))
+
+
+class DeviceClient:
+    """Client HTTP async bersama untuk API kontrol device, koneksi keep-alive dipakai ulang."""
+
+    def __init__(self, port=DEVICE_API_PORT, connect_timeout=DEVICE_API_CONNECT_TIMEOUT,
+                 read_timeout=DEVICE_API_READ_TIMEOUT, max_connections=DEVICE_API_MAX_CONNECTIONS):
+        self.port = port
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_connections)
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    async def _request(self, operation, method, ip, path, **kwargs):
+        # Mengembalikan (ok, response_json); error dibungkus seperti sebelumnya: {"error": "..."}
+        url = f"http://{ip}:{self.port}{path}"
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            resp = await self._get_client().request(method, url, **kwargs)
+            outcome = "ok" if resp.status_code < 400 else "http_error"
+            return True, resp.json()
+        except httpx.TimeoutException as e:
+            outcome = "timeout"
+            return False, {"error": str(e) or e.__class__.__name__}
+        except Exception as e:
+            return False, {"error": str(e) or e.__class__.__name__}
+        finally:
+            metrics.DEVICE_API_DURATION.labels(operation, outcome).observe(time.perf_counter() - started)
+
+    async def start_capture(self, ips, campaign_name, campaign_id):
+        data_payload = {
+            "campaign_name": campaign_name,
+            "campaign_id": campaign_id
+        }
+        results = await asyncio.gather(*(
+            self._request("start_capture", "POST", ip, "/start-capture", data=data_payload) for ip in ips
+        ))
+        return [(ip, ok, resp_json) for ip, (ok, resp_json) in zip(ips, results)]
+
+    async def stop_capture(self, devices, campaign_id):
+        # devices: list (device_id, ip)
+        results = await asyncio.gather(*(
+            self._request("stop_capture", "GET", ip, f"/stop-capture/{campaign_id}") for _, ip in devices
+        ))
+        return [(device_id, ip, ok, resp_json) for (device_id, ip), (ok, resp_json) in zip(devices, results)]
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Client global untuk seluruh aplikasi
+device_client = DeviceClient()
@@ -1,25 +1,37 @@
 import asyncio
-from fastapi import FastAPI, HTTPException, Depends, status, Form, WebSocket
+from fastapi import FastAPI, HTTPException, Depends, status, Form, WebSocket, WebSocketDisconnect, Response
 import threading
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List 
-from data_queries import (
-    get_campaign_for_ws,
-)
 from auth import router as auth_router
 from fastapi.security import OAuth2PasswordBearer
 import jwt
-from database_config import get_db_connection
-import requests
+from database_config import db_connection, get_pool_stats, pool as db_pool
 import datetime
+import psycopg2.errors
 import psycopg2.extras
-from broadcaster import manager
+from broadcaster import manager, MODE_FULL, MODE_DELTA
+from campaign_events import CAMPAIGN_EVENTS_CHANNEL, DEVICE_EVENTS_CHANNEL, PgListener, notify_campaign_event, notify_device_event
+from data_queries import device_information, invalidate_fleet_summary
+from wsReceivedata import IngestionService, fetch_campaign_device_ips
+from device_client import device_client
+import campaign_stats
+import metrics
+import query_log
+import signal_rollups
+import migrations
+import partitions
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# "embedded": ingest data device berjalan di proses API ini (satu supervisor untuk semua campaign)
+# "external": ingest dijalankan terpisah dengan python3 wsReceivedata.py
+INGEST_MODE = os.environ.get("INGEST_MODE", "embedded")
+# Jalankan migrasi skema yang belum tercatat saat startup (0 untuk menjalankan manual: python3 migrate.py)
+DB_AUTO_MIGRATE = os.environ.get("DB_AUTO_MIGRATE", "1") == "1"
 
 app = FastAPI()
 
@@ -30,6 +42,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Paling luar supaya durasi yang tercatat mencakup seluruh middleware lain
+app.add_middleware(metrics.MetricsMiddleware)
 
 # Sertakan router auth di bawah prefix /auth
 app.include_router(auth_router, prefix="/auth")
@@ -56,26 +70,23 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             detail="Token tidak valid2",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    connection = get_db_connection()
-    if connection is None:
-        raise HTTPException(status_code=500, detail="Database connection error")
-    cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    try:
-        query = "SELECT * FROM users WHERE id = %s"
-        cursor.execute(query, (user_id,))
-        user = cursor.fetchone()
-        if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User tidak ditemukan",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return user
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {e}")
-    finally:
-        cursor.close()
-        connection.close()
+    with db_connection() as connection:
+        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            query = "SELECT * FROM users WHERE id = %s"
+            cursor.execute(query, (user_id,))
+            user = cursor.fetchone()
+            if user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User tidak ditemukan",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            return user
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+        finally:
+            cursor.close()
 
 
 def require_role(allowed_roles: list):
@@ -97,15 +108,19 @@ def create_campaign(campaign_id: int, campaign_name: str, device_ids: list, grou
         RETURNING id
     """
     try:
-        with get_db_connection() as connection:
+        with db_connection() as connection:
+            # Partisi gsm/lte disiapkan lebih dulu di transaksi pendeknya sendiri, sebelum device
+            # mulai mengirim data; kunci ATTACH tidak ikut tertahan di transaksi campaign
+            partitions.create_campaign_partitions(connection, campaign_id)
             with connection.cursor() as cursor:
                 cursor.execute(insert_campaign_query, (campaign_id, campaign_name, 'active', group_id, created_at))
                 generated_campaign_id = cursor.fetchone()[0]
-                for device_id in device_ids:
-                    cursor.execute(
-                        "INSERT INTO campaign_devices (campaign_id, device_id) VALUES (%s, %s)",
-                        (generated_campaign_id, device_id)
-                    )
+                # Semua relasi campaign-device dalam satu INSERT multi-row
+                psycopg2.extras.execute_values(
+                    cursor,
+                    "INSERT INTO campaign_devices (campaign_id, device_id) VALUES %s",
+                    [(generated_campaign_id, device_id) for device_id in device_ids]
+                )
             connection.commit()
         return generated_campaign_id
     except Exception as e:
@@ -113,68 +128,95 @@ def create_campaign(campaign_id: int, campaign_name: str, device_ids: list, grou
 
 
 def update_campaign_status(campaign_id, new_status):
-    connection = get_db_connection()
-    cursor = connection.cursor()
-    sql = "UPDATE campaign SET status = %s WHERE id = %s"
-    cursor.execute(sql, (new_status, campaign_id))
-    connection.commit()
-    cursor.close()
-    connection.close()
-
-def stop_campaign_devices(campaign_id: int):
-    conn = get_db_connection()
+    with db_connection() as connection:
+        cursor = connection.cursor()
+        sql = "UPDATE campaign SET status = %s WHERE id = %s"
+        cursor.execute(sql, (new_status, campaign_id))
+        connection.commit()
+        cursor.close()
+
+
+# Fungsi DB sync untuk handler async (start/stop capture), dipanggil lewat asyncio.to_thread
+def ensure_no_active_campaign(group_id: int):
     try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        # Ambil device yang terlibat pada campaign aktif
-        cursor.execute("""
-            SELECT d.id, d.ip 
-            FROM campaign_devices cd
-            JOIN devices d ON cd.device_id = d.id
-            WHERE cd.campaign_id = %s
-        """, (campaign_id,))
-        devices = cursor.fetchall()
+        with db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT 1
+                    FROM campaign
+                    WHERE status = 'active'
+                      AND group_id = %s
+                    LIMIT 1
+                    """,
+                    (group_id,)
+                )
+                if cursor.fetchone():
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Group {group_id} already has an active campaign. Cannot create a new one"
+                    )
+    except HTTPException:
+        # lempar ulang HTTPException agar FastAPI bisa tangani
+        raise
     except Exception as e:
-        raise Exception(f"Error retrieving devices for campaign {campaign_id}: {e}")
-    finally:
-        cursor.close()
-        conn.close()
-
-    # Untuk setiap device, kirim request stop dan update status
-    for device in devices:
-        ip = device.get("ip")
-        if ip:
-            url = f"http://{ip}:8003/stop-capture/{campaign_id}"
-            try:
-                resp = requests.get(url)
-                resp_json = resp.json()
-                # Update status device
-                conn_update = get_db_connection()
-                try:
-                    cursor_update = conn_update.cursor()
-                    update_query = "UPDATE devices SET is_running = FALSE WHERE id = %s"
-                    cursor_update.execute(update_query, (device["id"],))
-                    conn_update.commit()
-                except Exception as ex:
-                    print(f"Error updating is_running for device {device['id']}: {ex}")
-                finally:
-                    cursor_update.close()
-                    conn_update.close()
-            except Exception as e:
-                print(f"Error stopping capture for device {device['id']} at {ip}: {e}")
-
-    # Update campaign status dan time_stop
+        raise HTTPException(status_code=500, detail=f"Error checking active campaign: {e}")
+
+
+def device_ids_by_ip(ips: list) -> dict:
     try:
-        conn_campaign = get_db_connection()
-        cursor_campaign = conn_campaign.cursor()
-        time_stop = datetime.datetime.utcnow()
-        update_query_campaign = "UPDATE campaign SET status = %s, time_stop = %s WHERE id = %s"
-        cursor_campaign.execute(update_query_campaign, ('stopped', time_stop, campaign_id))
-        conn_campaign.commit()
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("SELECT id, ip FROM devices WHERE ip = ANY(%s)", (ips,))
+                return {row["ip"]: row["id"] for row in cursor.fetchall()}
     except Exception as e:
-        raise Exception(f"Error updating campaign status: {e}")
-    finally:
-        cursor_campaign.close()
-        conn_campaign.close()
+        raise HTTPException(status_code=500, detail=f"Error converting IP ke device_id: {e}")
+
+
+def mark_devices_started(started_ips: list, campaign_id: int):
+    try:
+        with db_connection() as conn_update:
+            with conn_update.cursor() as cursor_update:
+                update_device_query = "UPDATE devices SET is_running = TRUE WHERE ip = ANY(%s)"
+                cursor_update.execute(update_device_query, (started_ips,))
+                update_campaign_query = "UPDATE campaign SET status = 'active' WHERE id = %s"
+                cursor_update.execute(update_campaign_query, (campaign_id,))
+            conn_update.commit()
+        invalidate_fleet_summary()
+    except Exception as ex:
+        print(f"Error updating device untuk IP {', '.join(started_ips)}: {ex}")
+
+
+def fetch_campaign_devices(campaign_id: int):
+    try:
+        with db_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT cd.device_id, d.ip
+                    FROM campaign_devices cd
+                    LEFT JOIN devices d ON d.id = cd.device_id
+                    WHERE cd.campaign_id = %s
+                """, (campaign_id,))
+                return cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving campaign devices: {e}")
+
+
+def mark_campaign_stopped(campaign_id: int, stopped_ids: list):
+    try:
+        with db_connection() as conn_campaign:
+            with conn_campaign.cursor() as cursor_campaign:
+                if stopped_ids:
+                    update_query = "UPDATE devices SET is_running = FALSE WHERE id = ANY(%s)"
+                    cursor_campaign.execute(update_query, (stopped_ids,))
+                time_stop = datetime.datetime.utcnow()
+                update_query_campaign = "UPDATE campaign SET status = 'stop', time_stop = %s WHERE id = %s"
+                cursor_campaign.execute(update_query_campaign, (time_stop, campaign_id))
+                notify_campaign_event(cursor_campaign, campaign_id, "status", status="stop")
+            conn_campaign.commit()
+    except Exception as e:
+        print(f"Error updating campaign status: {e}")
+    invalidate_fleet_summary()
 
 
 stop_event = threading.Event()
@@ -284,32 +326,10 @@ async def start_capture(
     device_ips: str = Form(...), 
     group_id: int = Form(...)
 ):
+    # Semua akses DB di handler ini lewat asyncio.to_thread: checkout pool bisa menunggu
+    # sampai DB_POOL_TIMEOUT dan tidak boleh menahan event loop
     # === 1. Cek campaign aktif berdasarkan status ENUM 'active' ===
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                SELECT 1
-                FROM campaign
-                WHERE status = 'active'
-                  AND group_id = %s
-                LIMIT 1
-                """,
-                (group_id,)
-            )
-            if cursor.fetchone():
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Group {group_id} already has an active campaign. Cannot create a new one"
-                )
-    except HTTPException:
-        # lempar ulang HTTPException agar FastAPI bisa tangani
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error checking active campaign: {e}")
-    finally:
-        conn.close()
+    await asyncio.to_thread(ensure_no_active_campaign, group_id)
 
     # === 2. Parse device_ips menjadi list of IP string ===
     try:
@@ -317,65 +337,37 @@ async def start_capture(
     except Exception as e:
         raise HTTPException(status_code=400, detail="Invalid device_ips format")
     
-    # === 3. Konversi IP menjadi device_id dengan query ke database ===
-    device_ids = []
-    for ip in original_device_ips:
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute("SELECT id FROM devices WHERE ip = %s", (ip,))
-            result = cursor.fetchone()
-            if result and result.get("id"):
-                device_ids.append(result["id"])
-            else:
-                raise HTTPException(status_code=404, detail=f"Device dengan IP {ip} tidak ditemukan di database")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error converting IP ke device_id: {e}")
-        finally:
-            cursor.close()
-            conn.close()
+    # === 3. Konversi semua IP menjadi device_id dengan satu query ke database ===
+    ip_to_id = await asyncio.to_thread(device_ids_by_ip, original_device_ips)
+
+    missing_ips = [ip for ip in original_device_ips if ip not in ip_to_id]
+    if missing_ips:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Device dengan IP {', '.join(missing_ips)} tidak ditemukan di database"
+        )
+    # Urutan mengikuti input; IP yang sama hanya dihitung sekali
+    device_ids = list(dict.fromkeys(ip_to_id[ip] for ip in original_device_ips))
 
     # === 4. Buat campaign baru dan broadcast info campaign ===
     try:
-        new_campaign_id = create_campaign(campaign_id, campaign_name, device_ids, group_id)
+        new_campaign_id = await asyncio.to_thread(create_campaign, campaign_id, campaign_name, device_ids, group_id)
         await manager.broadcast(new_campaign_id, f"Campaign '{campaign_name}' (ID: {new_campaign_id}) telah dimulai")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating campaign: {e}")
     
-    # Jalankan listener WS secara asynchronous setelah 10 detik
-    async def run_ws_listener():
-        await asyncio.sleep(10)
-        process = await asyncio.create_subprocess_exec("python3", "wsReceivedata.py")
-    asyncio.create_task(run_ws_listener())
-
-    responses = []
-    # === 5. Untuk setiap device berdasarkan IP, kirim request ke device dan update status berdasarkan IP ===
-    for ip in original_device_ips:
-        url = f"http://{ip}:8003/start-capture"
-        data_payload = {
-            "campaign_name": campaign_name,
-            "campaign_id": new_campaign_id
-        }
-        try:
-            resp = requests.post(url, data=data_payload)
-            resp_json = resp.json()
-            # Update status device di database berdasarkan IP
-            conn_update = get_db_connection()
-            try:
-                cursor_update = conn_update.cursor()
-                update_device_query = "UPDATE devices SET is_running = TRUE WHERE ip = %s"
-                cursor_update.execute(update_device_query, (ip,))
-                update_campaign_query = "UPDATE campaign SET status = 'active' WHERE id = %s"
-                cursor_update.execute(update_campaign_query, (new_campaign_id,))
-                conn_update.commit()
-            except Exception as ex:
-                print(f"Error updating device untuk IP {ip}: {ex}")
-            finally:
-                cursor_update.close()
-                conn_update.close()
-        except Exception as e:
-            resp_json = {"error": str(e)}
-        responses.append({"ip": ip, "response": resp_json})
+    # Daftarkan campaign ke supervisor ingest; koneksi ke device dibuka (dengan retry)
+    # tanpa membuat proses listener baru per campaign
+    ingestion.register_campaign(new_campaign_id)
+
+    # === 5. Kirim request start ke semua device secara bersamaan ===
+    results = await device_client.start_capture(original_device_ips, campaign_name, new_campaign_id)
+    responses = [{"ip": ip, "response": resp_json} for ip, ok, resp_json in results]
+
+    # === 6. Update status semua device yang merespon dalam satu statement ===
+    started_ips = [ip for ip, ok, _ in results if ok]
+    if started_ips:
+        await asyncio.to_thread(mark_devices_started, started_ips, new_campaign_id)
     
     return {
         "message": "Live capture started successfully",
@@ -386,39 +378,20 @@ async def start_capture(
 
 
 @app.websocket("/ws/{campaign_id}")
-async def websocket_endpoint(websocket: WebSocket, campaign_id: int):
-    # await manager.connect(websocket)
-    await manager.connect(campaign_id, websocket)
+async def websocket_endpoint(websocket: WebSocket, campaign_id: int, mode: str = MODE_FULL):
+    # Data campaign dikirim oleh satu producer per campaign di broadcaster.manager,
+    # handler ini hanya menjaga koneksi klien dan meneruskan permintaan resync.
+    # ?mode=delta -> snapshot + delta bernomor urut, default tetap data penuh tiap tick
+    if mode not in (MODE_FULL, MODE_DELTA):
+        mode = MODE_FULL
+    await manager.connect(campaign_id, websocket, mode)
     print(f" Klien WebSocket terhubung untuk campaign {campaign_id}")
     try:
         while True:
-            conn = get_db_connection()
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute("SELECT status FROM campaign WHERE id = %s", (campaign_id,))
-            campaign = cursor.fetchone()
-            campaign_data = get_campaign_for_ws(campaign_id)
-            if not campaign_data or campaign["status"] == "stopped":
-                print(f"Campaign {campaign_id} telah dihentikan. Menutup koneksi WebSocket.")
-                await websocket.send_json({
-                    "message": "Campaign has been stopped.",
-                })
-                
-                # Tutup koneksi WebSocket
-                await websocket.close()
-                break
-
-            if campaign["status"] == "paused":
-                await websocket.send_json({
-                    "message": "Campaign is paused.",
-                    "data": campaign_data
-                    })
-            else:
-                await websocket.send_json({
-                    "message": "send data campaign.",
-                    "data": campaign_data
-                })
-
-            await asyncio.sleep(5)
+            message = await websocket.receive_text()
+            await manager.handle_client_message(campaign_id, websocket, message)
+    except WebSocketDisconnect:
+        print(f"Klien terputus dari campaign {campaign_id}")
     except Exception as e:
         print(f"Klien terputus dari campaign {campaign_id}: {e}")
     finally:
@@ -427,52 +400,52 @@ async def websocket_endpoint(websocket: WebSocket, campaign_id: int):
 
 
 @app.post("/pause-capture")
-async def pause_capture(
+def pause_capture(
     campaign_id: int = Form(...),
     current_user: dict = Depends(require_role(["admin", "superadmin"]))
 ):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT status FROM campaign WHERE id = %s", (campaign_id,))
-        campaign = cursor.fetchone()
-        if not campaign:
-            raise HTTPException(status_code=404, detail="Campaign not found.")
-        # if campaign["status"] != "active":
-        #     raise HTTPException(status_code=400, detail="Campaign is not active; cannot pause.")
-        # Update status menjadi 'paused'
-        cursor.execute("UPDATE campaign SET status = 'paused' WHERE id = %s", (campaign_id,))
-        conn.commit()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error pausing campaign: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    with db_connection() as conn:
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute("SELECT status FROM campaign WHERE id = %s", (campaign_id,))
+            campaign = cursor.fetchone()
+            if not campaign:
+                raise HTTPException(status_code=404, detail="Campaign not found.")
+            # if campaign["status"] != "active":
+            #     raise HTTPException(status_code=400, detail="Campaign is not active; cannot pause.")
+            # Update status menjadi 'paused'
+            cursor.execute("UPDATE campaign SET status = 'paused' WHERE id = %s", (campaign_id,))
+            notify_campaign_event(cursor, campaign_id, "status", status="paused")
+            conn.commit()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error pausing campaign: {e}")
+        finally:
+            cursor.close()
     return {
         "message": f"Campaign {campaign_id} paused successfully."
         }
 
 @app.post("/resume-capture")
-async def resume_capture(
+def resume_capture(
     campaign_id: int = Form(...)
 ):
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT status FROM campaign WHERE id = %s", (campaign_id,))
-        campaign = cursor.fetchone()
-        if not campaign:
-            raise HTTPException(status_code=404, detail="Campaign not found.")
-        if campaign["status"] != "paused":
-            raise HTTPException(status_code=400, detail="Campaign is not paused; cannot resume.")
-        # Update status menjadi 'active'
-        cursor.execute("UPDATE campaign SET status = 'active' WHERE id = %s", (campaign_id,))
-        conn.commit()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error resuming campaign: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    with db_connection() as conn:
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute("SELECT status FROM campaign WHERE id = %s", (campaign_id,))
+            campaign = cursor.fetchone()
+            if not campaign:
+                raise HTTPException(status_code=404, detail="Campaign not found.")
+            if campaign["status"] != "paused":
+                raise HTTPException(status_code=400, detail="Campaign is not paused; cannot resume.")
+            # Update status menjadi 'active'
+            cursor.execute("UPDATE campaign SET status = 'active' WHERE id = %s", (campaign_id,))
+            notify_campaign_event(cursor, campaign_id, "status", status="active")
+            conn.commit()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error resuming campaign: {e}")
+        finally:
+            cursor.close()
     return {"message": f"Campaign {campaign_id} resumed successfully."}
 
 
@@ -480,74 +453,26 @@ async def resume_capture(
 async def stop_capture(
     campaign_id: int = Form(...)
 ):
-    import datetime
-    # Ambil daftar device_id yang terkait dengan campaign dari tabel campaign_devices
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT device_id FROM campaign_devices WHERE campaign_id = %s", (campaign_id,))
-        campaign_devices = cursor.fetchall()
-        device_ids_list = [row["device_id"] for row in campaign_devices]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving campaign devices: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+    # Ambil device_id dan IP yang terkait dengan campaign dalam satu query (di luar event loop)
+    campaign_devices = await asyncio.to_thread(fetch_campaign_devices, campaign_id)
     
-    if not device_ids_list:
+    if not campaign_devices:
         raise HTTPException(status_code=400, detail="No devices associated with this campaign.")
 
-    responses = []
-    # Untuk setiap device yang terkait, ambil IP dari tabel devices dan kirim request stop-capture ke device
-    for device_id in device_ids_list:
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            cursor.execute("SELECT ip FROM devices WHERE id = %s", (device_id,))
-            device = cursor.fetchone()
-        except Exception as e:
-            print(f"Error retrieving device {device_id}: {e}")
-            continue
-        finally:
-            cursor.close()
-            conn.close()
-        
-        if device and device.get("ip"):
-            ip = device.get("ip")
-            url = f"http://{ip}:8003/stop-capture/{campaign_id}"
-            try:
-                resp = requests.get(url)
-                resp_json = resp.json()
-                # Update status device: set is_running = FALSE
-                conn_update = get_db_connection()
-                try:
-                    cursor_update = conn_update.cursor()
-                    update_query = "UPDATE devices SET is_running = FALSE WHERE id = %s"
-                    cursor_update.execute(update_query, (device_id,))
-                    conn_update.commit()
-                except Exception as ex:
-                    print(f"Error updating is_running for device {device_id}: {ex}")
-                finally:
-                    cursor_update.close()
-                    conn_update.close()
-            except Exception as e:
-                resp_json = {"error": str(e)}
-            responses.append({"device_id": device_id, "ip": ip, "response": resp_json})
-    
-    # Setelah mengirim perintah stop ke setiap device, update campaign status (misalnya, set status = FALSE dan catat time_stop)
-    try:
-        conn_campaign = get_db_connection()
-        cursor_campaign = conn_campaign.cursor()
-        time_stop = datetime.datetime.utcnow()
-        update_query_campaign = "UPDATE campaign SET status = 'stop', time_stop = %s WHERE id = %s"
-        cursor_campaign.execute(update_query_campaign, (time_stop, campaign_id))
-        conn_campaign.commit()
-    except Exception as e:
-        print(f"Error updating campaign status: {e}")
-    finally:
-        cursor_campaign.close()
-        conn_campaign.close()
-    
+    targets = [(row["device_id"], row["ip"]) for row in campaign_devices if row.get("ip")]
+
+    # Kirim request stop-capture ke semua device secara bersamaan
+    results = await device_client.stop_capture(targets, campaign_id)
+    responses = [
+        {"device_id": device_id, "ip": ip, "response": resp_json}
+        for device_id, ip, ok, resp_json in results
+    ]
+    stopped_ids = [device_id for device_id, _, ok, _ in results if ok]
+
+    # Update status device yang merespon (satu statement) dan campaign status + time_stop
+    await asyncio.to_thread(mark_campaign_stopped, campaign_id, stopped_ids)
+    ingestion.unregister_campaign(campaign_id)
+
     await manager.broadcast(campaign_id, "Campaign has been stopped.")
     await manager.close_campaign_connections(campaign_id)
 
@@ -558,55 +483,53 @@ async def stop_capture(
     }
 
 @app.post("/add-devices", status_code=201)
-async def add_device(
+def add_device(
     serial_number: str = Form(...),
     ip: str = Form(...),
     lat: float = Form(None),
     long: float = Form(None)
 ):
-    conn = get_db_connection()
-    try:
-        with conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                query = """
-                INSERT INTO devices (
-                    serial_number, ip, lat, long, is_connected, is_running, created_at
-                )
-                VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (serial_number) DO UPDATE SET
-                    ip = EXCLUDED.ip,
-                    lat = EXCLUDED.lat,
-                    long = EXCLUDED.long,
-                    is_connected = EXCLUDED.is_connected,
-                    is_running = EXCLUDED.is_running;
-                """
-                cur.execute(query, (serial_number, ip, lat, long, True, False))
-        return {"message": "Device added/updated successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    with db_connection() as conn:
+        try:
+            with conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    query = """
+                    INSERT INTO devices (
+                        serial_number, ip, lat, long, is_connected, is_running, created_at
+                    )
+                    VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (serial_number) DO UPDATE SET
+                        ip = EXCLUDED.ip,
+                        lat = EXCLUDED.lat,
+                        long = EXCLUDED.long,
+                        is_connected = EXCLUDED.is_connected,
+                        is_running = EXCLUDED.is_running;
+                    """
+                    cur.execute(query, (serial_number, ip, lat, long, True, False))
+                    notify_device_event(cur, "upserted", serial_number=serial_number)
+            invalidate_fleet_summary()
+            return {"message": "Device added/updated successfully"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/devices", response_model=List[dict], status_code=200)
-async def get_all_devices():
-    conn = get_db_connection()
-    try:
-        with conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                cur.execute("""
-                    SELECT id, serial_number, ip, lat, long, is_connected, is_running, created_at
-                    FROM devices
-                    ORDER BY created_at DESC
-                """)
-                devices = cur.fetchall()
-                return [dict(device) for device in devices]
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+def get_all_devices():
+    with db_connection() as conn:
+        try:
+            with conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    cur.execute("""
+                        SELECT id, serial_number, ip, lat, long, is_connected, is_running, created_at
+                        FROM devices
+                        ORDER BY created_at DESC
+                    """)
+                    devices = cur.fetchall()
+                    return [dict(device) for device in devices]
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/edit-device/{device_id}", status_code=200)
-async def edit_device_by_id(
+def edit_device_by_id(
     device_id: int,
     serial_number: str = Form(None),
     ip: str = Form(None),
@@ -615,85 +538,224 @@ async def edit_device_by_id(
     is_connected: bool = Form(None),
     is_running: bool = Form(None)
 ):
-    conn = get_db_connection()
-    try:
-        with conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                query = "UPDATE devices SET "
-                updates = []
-                params = []
+    with db_connection() as conn:
+        try:
+            with conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    query = "UPDATE devices SET "
+                    updates = []
+                    params = []
                 
-                if serial_number is not None:
-                    updates.append("serial_number = %s")
-                    params.append(serial_number)
-                if ip is not None:
-                    updates.append("ip = %s")
-                    params.append(ip)
-                if lat is not None:
-                    updates.append("lat = %s")
-                    params.append(lat)
-                if long is not None:
-                    updates.append("long = %s")
-                    params.append(long)
-                if is_connected is not None:
-                    updates.append("is_connected = %s")
-                    params.append(is_connected)
-                if is_running is not None:
-                    updates.append("is_running = %s")
-                    params.append(is_running)
+                    if serial_number is not None:
+                        updates.append("serial_number = %s")
+                        params.append(serial_number)
+                    if ip is not None:
+                        updates.append("ip = %s")
+                        params.append(ip)
+                    if lat is not None:
+                        updates.append("lat = %s")
+                        params.append(lat)
+                    if long is not None:
+                        updates.append("long = %s")
+                        params.append(long)
+                    if is_connected is not None:
+                        updates.append("is_connected = %s")
+                        params.append(is_connected)
+                    if is_running is not None:
+                        updates.append("is_running = %s")
+                        params.append(is_running)
                 
-                if not updates:
-                    raise HTTPException(status_code=400, detail="No fields to update")
+                    if not updates:
+                        raise HTTPException(status_code=400, detail="No fields to update")
                 
-                query += ", ".join(updates) + " WHERE id = %s"
-                params.append(device_id)
+                    query += ", ".join(updates) + " WHERE id = %s"
+                    params.append(device_id)
                 
-                cur.execute(query, params)
+                    cur.execute(query, params)
                 
-                if cur.rowcount == 0:
-                    raise HTTPException(status_code=404, detail="Device not found")
+                    if cur.rowcount == 0:
+                        raise HTTPException(status_code=404, detail="Device not found")
+                    notify_device_event(cur, "updated", device_id=device_id)
                 
-        return {"message": "Device updated successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+            invalidate_fleet_summary()
+            return {"message": "Device updated successfully"}
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/devices/{device_id}", status_code=200)
-async def delete_device(device_id: int):
-    conn = get_db_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute("DELETE FROM campaign_devices WHERE device_id = %s", (device_id,))
-                cur.execute("DELETE FROM lte_data WHERE device_id = %s", (device_id,))
-                cur.execute("DELETE FROM gsm_data WHERE device_id = %s", (device_id,))
-                cur.execute("DELETE FROM devices WHERE id = %s", (device_id,))
+def delete_device(device_id: int):
+    with db_connection() as conn:
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    # Campaign tempat device ini terdaftar (index campaign_devices_device_id_idx),
+                    # bukan pemindaian gsm_data/lte_data di semua partisi
+                    cur.execute(
+                        "SELECT campaign_id FROM campaign_devices WHERE device_id = %s", (device_id,)
+                    )
+                    affected_campaigns = [row[0] for row in cur.fetchall()]
+
+                    cur.execute("DELETE FROM campaign_devices WHERE device_id = %s", (device_id,))
+                    # Per campaign yang punya data device ini (hanya partisi campaign itu yang disentuh);
+                    # counter campaign dikurangi dari baris yang terhapus, tanpa hitung ulang
+                    campaign_stats.delete_device_rows(cur, device_id, affected_campaigns)
+                    cur.execute("SAVEPOINT delete_device")
+                    try:
+                        cur.execute("DELETE FROM devices WHERE id = %s", (device_id,))
+                    except psycopg2.errors.ForeignKeyViolation:
+                        # Masih ada data di campaign yang tidak mendaftarkan device ini (mis. device
+                        # dibuat oleh ingest); hanya kasus ini yang mencari campaign lewat tabel data
+                        cur.execute("ROLLBACK TO SAVEPOINT delete_device")
+                        cur.execute("""
+                            SELECT campaign_id FROM gsm_data WHERE device_id = %s
+                            UNION
+                            SELECT campaign_id FROM lte_data WHERE device_id = %s
+                        """, (device_id, device_id))
+                        campaign_stats.delete_device_rows(cur, device_id, [row[0] for row in cur.fetchall()])
+                        cur.execute("DELETE FROM devices WHERE id = %s", (device_id,))
                 
-                if cur.rowcount == 0:
-                    raise HTTPException(status_code=404, detail="Device not found")
+                    if cur.rowcount == 0:
+                        raise HTTPException(status_code=404, detail="Device not found")
+                    deleted_rowcount = cur.rowcount
+                    notify_device_event(cur, "deleted", device_id=device_id)
                 
-        return {
-            "message": "Device deleted successfully",
-            "details": {
-                "campaign_relations_deleted": cur.rowcount,
-                "device_deleted": device_id
+            invalidate_fleet_summary()
+            return {
+                "message": "Device deleted successfully",
+                "details": {
+                    "campaign_relations_deleted": deleted_rowcount,
+                    "device_deleted": device_id
+                }
             }
-        }
     
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "error": "Database operation failed",
-                "message": str(e),
-                "solution": "Ensure no other tables reference this device"
-            }
-        )
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise HTTPException(
+                status_code=500,
+                detail={
+                    "error": "Database operation failed",
+                    "message": str(e),
+                    "solution": "Ensure no other tables reference this device"
+                }
+            )
     
-    finally:
-        conn.close()
+
+@app.get("/campaign-stats/{campaign_id}", status_code=200)
+async def campaign_stats_detail(campaign_id: int):
+    result = await asyncio.to_thread(campaign_stats.get_campaign_stats, campaign_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Campaign not found.")
+    return result
+
+
+@app.get("/campaign/{campaign_id}/signal-series", status_code=200)
+async def campaign_signal_series(campaign_id: int, start: datetime.datetime = None, end: datetime.datetime = None,
+                                 tech: str = None, operator: str = None, mcc: int = None, mnc: int = None,
+                                 area_code: int = None, cell_identity: int = None):
+    # Ukuran bucket dipilih otomatis dari rentang start..end (default: durasi campaign)
+    result = await asyncio.to_thread(
+        signal_rollups.get_signal_series, campaign_id, start, end,
+        tech=tech, operator=operator, mcc=mcc, mnc=mnc, area_code=area_code, cell_identity=cell_identity
+    )
+    if result is None:
+        raise HTTPException(status_code=404, detail="Campaign not found.")
+    return result
+
+
+@app.get("/campaign/{campaign_id}/operator-cells", status_code=200)
+async def campaign_operator_cells(campaign_id: int, start: datetime.datetime = None,
+                                  end: datetime.datetime = None, tech: str = None):
+    result = await asyncio.to_thread(signal_rollups.get_operator_cell_counts, campaign_id, start, end, tech)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Campaign not found.")
+    return result
+
+
+@app.get("/device-information", status_code=200)
+async def device_information_summary():
+    summary = await asyncio.to_thread(device_information)
+    if summary is None:
+        raise HTTPException(status_code=500, detail="Error retrieving status counts")
+    return summary
+
+
+@app.get("/db-pool-stats", status_code=200)
+async def db_pool_stats():
+    return get_pool_stats()
+
+
+@app.get("/query-stats", status_code=200)
+async def query_stats(
+    limit: int = 50,
+    current_user: dict = Depends(require_role(["admin", "superadmin"]))
+):
+    # Agregat statement data_queries per endpoint + query lambat terakhir (berisi SQL dan rencana EXPLAIN)
+    return query_log.query_stats.snapshot(limit)
+
+
+@app.delete("/query-stats", status_code=200)
+async def reset_query_stats(
+    current_user: dict = Depends(require_role(["admin", "superadmin"]))
+):
+    query_log.query_stats.reset()
+    return {"message": "Query stats reset"}
+
+
+@app.get("/ingestion-status", status_code=200)
+async def ingestion_status():
+    return {"mode": INGEST_MODE, **ingestion.status()}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
+def handle_db_event(channel: str, payload: str):
+    if channel == DEVICE_EVENTS_CHANNEL:
+        # Perubahan device (dari proses mana pun) membuat ringkasan dashboard basi
+        invalidate_fleet_summary()
+        return
+    manager.handle_campaign_event(channel, payload)
+
+
+# Listener LISTEN/NOTIFY untuk mendorong update live tanpa menunggu polling
+campaign_listener = PgListener([CAMPAIGN_EVENTS_CHANNEL, DEVICE_EVENTS_CHANNEL], handle_db_event)
+background_tasks = []
+# Supervisor ingest tunggal; hanya membuka koneksi ke device milik campaign active/paused
+ingestion = IngestionService(device_source=fetch_campaign_device_ips)
+
+
+def collect_runtime_metrics():
+    # Dibaca saat scrape /metrics, bukan dicatat di jalur panas
+    families = metrics.websocket_families(manager) + metrics.pool_families(get_pool_stats())
+    if INGEST_MODE == "embedded":
+        families += metrics.ingestion_families(ingestion)
+    return families
+
+
+metrics.register_collector(collect_runtime_metrics)
+
+
+@app.on_event("startup")
+async def startup_event():
+    if DB_AUTO_MIGRATE:
+        await asyncio.to_thread(migrations.apply)
+    background_tasks.append(asyncio.create_task(campaign_listener.run()))
+    if INGEST_MODE == "embedded":
+        await ingestion.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await ingestion.stop()
+    await device_client.aclose()
+    await manager.shutdown()
+    db_pool.closeall()
 
 
 if __name__ == "__main__":
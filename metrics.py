@@ -0,0 +1,213 @@
+import functools
+import time
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Metrik Prometheus untuk GET /metrics.
+#
+# Jalur panas hanya menaikkan counter / mengisi histogram (operasi in-memory dengan lock kecil).
+# Nilai yang sudah ada di objek lain (subscriber WebSocket, status device ingest, antrian)
+# tidak dicatat terus-menerus, tapi dibaca saat scrape oleh collector (register_collector).
+# Label dibatasi ke nilai yang jumlahnya kecil: template route, nama query, operasi device.
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Jumlah request HTTP", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Durasi request HTTP", ["method", "route"]
+)
+
+DB_QUERIES = Counter(
+    "db_queries_total", "Jumlah pemanggilan query data_queries", ["query", "outcome"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Durasi query data_queries (termasuk menunggu koneksi pool)", ["query"]
+)
+
+INGEST_MESSAGES = Counter(
+    "ingest_messages_total", "Pesan device yang diproses ingest", ["outcome"]
+)
+INGEST_CELLS = Counter(
+    "ingest_cells_total", "Baris sel BTS yang di-upsert ingest", ["tech"]
+)
+INGEST_PROCESSED = INGEST_MESSAGES.labels("processed")
+INGEST_FAILED = INGEST_MESSAGES.labels("failed")
+INGEST_DROPPED = INGEST_MESSAGES.labels("dropped")
+INGEST_CELLS_GSM = INGEST_CELLS.labels("gsm")
+INGEST_CELLS_LTE = INGEST_CELLS.labels("lte")
+
+WS_BROADCAST_DURATION = Histogram(
+    "ws_broadcast_duration_seconds", "Durasi mengirim satu frame ke semua subscriber campaign",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+WS_SEND_FAILURES = Counter(
+    "ws_send_failures_total", "Pengiriman frame WebSocket yang gagal / timeout"
+)
+
+DEVICE_API_DURATION = Histogram(
+    "device_api_request_duration_seconds", "Durasi request ke API kontrol device (:8003)",
+    ["operation", "outcome"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+# Scope ASGI request yang sedang berjalan; ikut terbawa ke asyncio.to_thread / threadpool
+_request_scope = ContextVar("request_scope", default=None)
+
+
+def current_endpoint():
+    """Template route request saat ini (mis. "GET /campaign/{campaign_id}"), None di luar request."""
+    scope = _request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    # Koneksi WebSocket tidak punya method HTTP
+    return f"{scope.get('method', 'WS')} {route.path if route is not None else scope.get('path')}"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: jumlah dan durasi request per template route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            token = _request_scope.set(scope)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _request_scope.reset(token)
+            return
+
+        status_code = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        token = _request_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Route diisi router saat request cocok; path mentah tidak dipakai sebagai label
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            HTTP_REQUEST_DURATION.labels(method, path).observe(time.perf_counter() - started)
+            HTTP_REQUESTS.labels(method, path, str(status_code[0])).inc()
+            _request_scope.reset(token)
+
+
+def timed_query(func):
+    """Dekorator untuk fungsi data_queries: jumlah, error dan durasi per nama fungsi."""
+    name = func.__name__
+    duration = DB_QUERY_DURATION.labels(name)
+    ok = DB_QUERIES.labels(name, "ok")
+    error = DB_QUERIES.labels(name, "error")
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            error.inc()
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+        ok.inc()
+        return result
+
+    return wrapper
+
+
+class CallbackCollector:
+    """Collector yang memanggil fungsi saat scrape; fungsi mengembalikan daftar metric family."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def collect(self):
+        try:
+            yield from self.callback()
+        except Exception as e:
+            print(f"Error mengumpulkan metrik: {e}")
+
+    def describe(self):
+        # Tanpa describe(), registry memanggil collect() saat register
+        return []
+
+
+def register_collector(callback):
+    collector = CallbackCollector(callback)
+    REGISTRY.register(collector)
+    return collector
+
+
+def websocket_families(manager):
+    subscribers = GaugeMetricFamily(
+        "ws_subscribers", "Subscriber WebSocket aktif per campaign", labels=["campaign_id"]
+    )
+    for campaign_id, connections in list(manager.active_connections.items()):
+        subscribers.add_metric([str(campaign_id)], len(connections))
+    producers = GaugeMetricFamily("ws_producers", "Producer campaign yang berjalan")
+    producers.add_metric([], len(manager.producers))
+    return [subscribers, producers]
+
+
+def ingestion_families(service, now=None):
+    status = service.status()
+    now = now or time.time()
+    families = []
+    pipeline = status.get("pipeline")
+    if pipeline:
+        depth = GaugeMetricFamily("ingest_queue_depth", "Pesan di antrian ingest")
+        depth.add_metric([], pipeline["queue_depth"])
+        families.append(depth)
+    age = GaugeMetricFamily(
+        "ingest_device_last_message_age_seconds", "Detik sejak pesan terakhir dari device", labels=["ip"]
+    )
+    connected = GaugeMetricFamily(
+        "ingest_device_connected", "1 jika stream /ws device sedang terhubung", labels=["ip"]
+    )
+    for device in status.get("devices", []):
+        connected.add_metric([device["ip"]], 1 if device["state"] == "connected" else 0)
+        if device.get("last_message_at"):
+            age.add_metric([device["ip"]], now - device["last_message_at"])
+    families += [age, connected]
+    observation = status.get("observation_log")
+    if observation:
+        buffered = GaugeMetricFamily("observation_log_buffered_rows", "Baris riwayat di buffer")
+        buffered.add_metric([], observation["buffered"])
+        dropped = CounterMetricFamily(
+            "observation_log_dropped_rows", "Baris riwayat yang dibuang karena buffer penuh"
+        )
+        dropped.add_metric([], observation["dropped"])
+        families += [buffered, dropped]
+    return families
+
+
+def pool_families(pool_stats):
+    families = []
+    for key in ("in_use", "waiting", "max_size"):
+        gauge = GaugeMetricFamily(f"db_pool_{key}", f"Pool koneksi DB: {key}")
+        gauge.add_metric([], pool_stats[key])
+        families.append(gauge)
+    for key in ("checkouts", "timeouts"):
+        counter = CounterMetricFamily(f"db_pool_{key}", f"Pool koneksi DB: {key}")
+        counter.add_metric([], pool_stats[key])
+        families.append(counter)
+    return families
+
+
+def start_metrics_server(port):
+    """Endpoint /metrics terpisah untuk proses tanpa FastAPI (daemon ingest)."""
+    start_http_server(port)
+    print(f"Metrik Prometheus tersedia di :{port}/metrics")
+
+
+def render():
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,27 @@
+import sys
+import migrations
+
+# Penggunaan:
+#   python3 migrate.py            -> jalankan semua migrasi yang belum tercatat
+#   python3 migrate.py up [versi] -> jalankan sampai versi tertentu
+#   python3 migrate.py status     -> tampilkan migrasi yang sudah/belum dijalankan
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else "up"
+    if command == "status":
+        for migration in migrations.status():
+            applied_at = migration["applied_at"] or "belum"
+            print(f"{migration['version']:04d}  {migration['name']:<30}  {applied_at}")
+        return 0
+    if command == "up":
+        target = int(argv[2]) if len(argv) > 2 else None
+        applied = migrations.apply(target)
+        print(f"Migrasi dijalankan: {applied}" if applied else "Skema sudah terbaru")
+        return 0
+    print("Penggunaan: python3 migrate.py [up [versi] | status]")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
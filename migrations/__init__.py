@@ -0,0 +1,171 @@
+"""Migrasi skema database berversi.
+
+Setiap migrasi adalah modul vNNNN_nama.py di package ini dengan atribut:
+    VERSION        nomor urut (int, unik)
+    NAME           deskripsi singkat
+    TRANSACTIONAL  False untuk migrasi yang memakai CREATE INDEX CONCURRENTLY (default True)
+    upgrade(cur)   menjalankan perubahan skema
+
+Migrasi yang sudah dijalankan dicatat di tabel schema_migrations, sehingga apply()
+aman dipanggil berulang kali (startup API, daemon ingest, atau python3 migrate.py).
+"""
+import importlib
+import pkgutil
+import time
+import psycopg2
+from database_config import get_db_connection
+
+# Kunci advisory supaya beberapa proses yang start bersamaan tidak menjalankan migrasi dua kali
+MIGRATIONS_LOCK_ID = 720301
+# Jeda antar percobaan mengambil kunci (detik)
+MIGRATIONS_LOCK_POLL = 1.0
+
+SCHEMA_MIGRATIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms INTEGER
+    )
+"""
+
+
+def discover():
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        if info.name.startswith("v"):
+            migrations.append(importlib.import_module(f"{__name__}.{info.name}"))
+    migrations.sort(key=lambda m: m.VERSION)
+    versions = [m.VERSION for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Nomor versi migrasi ganda: {versions}")
+    return migrations
+
+
+def create_index_concurrently(cur, name, definition, unique=False):
+    """CREATE INDEX CONCURRENTLY yang bisa diulang: index sisa build yang gagal (invalid) dibuang dulu."""
+    cur.execute("""
+        SELECT i.indisvalid
+        FROM pg_class c
+        JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+    """, (name,))
+    row = cur.fetchone()
+    if row is not None:
+        if row[0]:
+            return
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+
+def create_table_index_concurrently(cur, name, table, columns):
+    """Seperti create_index_concurrently, juga untuk tabel yang sudah dipartisi (partitions.py convert).
+
+    Tabel partisi tidak mendukung CONCURRENTLY: index induk dibuat ON ONLY (tanpa build), index
+    setiap partisi dibangun CONCURRENTLY lalu di-ATTACH, dan index induk valid setelah semuanya terpasang.
+    """
+    cur.execute("SELECT relkind FROM pg_class WHERE relname = %s", (table,))
+    if cur.fetchone()[0] != "p":
+        create_index_concurrently(cur, name, f"ON {table} {columns}")
+        return
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {table} {columns}")
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table,))
+    for (partition,) in cur.fetchall():
+        child = f"{partition}_{name.removeprefix(table + '_')}"
+        create_index_concurrently(cur, child, f"ON {partition} {columns}")
+        cur.execute("SELECT 1 FROM pg_inherits WHERE inhrelid = %s::regclass", (child,))
+        if cur.fetchone() is None:
+            cur.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def _connect():
+    conn = get_db_connection()
+    if conn is None:
+        raise psycopg2.OperationalError("Tidak bisa terhubung ke database untuk migrasi")
+    conn.autocommit = True
+    return conn
+
+
+def _acquire_lock(conn):
+    # Bukan pg_advisory_lock yang menunggu: proses yang menunggu di dalam statement memegang
+    # snapshot, dan CREATE INDEX CONCURRENTLY di proses pemegang kunci menunggu snapshot itu
+    # selesai (deadlock). pg_try_advisory_lock langsung kembali, jadi tidak ada snapshot tertahan.
+    waiting = False
+    while True:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATIONS_LOCK_ID,))
+            if cur.fetchone()[0]:
+                return
+        if not waiting:
+            print("Menunggu proses lain selesai menjalankan migrasi...")
+            waiting = True
+        time.sleep(MIGRATIONS_LOCK_POLL)
+
+
+def _applied_versions(cur):
+    cur.execute(SCHEMA_MIGRATIONS_SQL)
+    cur.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cur.fetchall()}
+
+
+def status():
+    conn = _connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_MIGRATIONS_SQL)
+            cur.execute("SELECT version, applied_at FROM schema_migrations")
+            applied = dict(cur.fetchall())
+        return [
+            {"version": m.VERSION, "name": m.NAME, "applied_at": applied.get(m.VERSION)}
+            for m in discover()
+        ]
+    finally:
+        conn.close()
+
+
+def apply(target=None):
+    """Jalankan migrasi yang belum tercatat (sampai versi target jika diberikan)."""
+    migrations = discover()
+    conn = _connect()
+    applied_now = []
+    try:
+        _acquire_lock(conn)
+        try:
+            # Dibaca setelah kunci didapat: proses sebelumnya mungkin sudah menjalankan sebagian
+            with conn.cursor() as cur:
+                applied = _applied_versions(cur)
+            for migration in migrations:
+                if migration.VERSION in applied or (target is not None and migration.VERSION > target):
+                    continue
+                print(f"Menjalankan migrasi {migration.VERSION}: {migration.NAME}")
+                started = time.monotonic()
+                transactional = getattr(migration, "TRANSACTIONAL", True)
+                conn.autocommit = not transactional
+                try:
+                    with conn.cursor() as cur:
+                        migration.upgrade(cur)
+                        cur.execute(
+                            "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+                            (migration.VERSION, migration.NAME, int((time.monotonic() - started) * 1000))
+                        )
+                    if transactional:
+                        conn.commit()
+                except Exception:
+                    if transactional:
+                        conn.rollback()
+                    raise
+                finally:
+                    conn.autocommit = True
+                applied_now.append(migration.VERSION)
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATIONS_LOCK_ID,))
+    finally:
+        conn.close()
+    return applied_now
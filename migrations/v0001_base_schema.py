@@ -0,0 +1,104 @@
+# Tabel inti aplikasi. IF NOT EXISTS: database yang sudah berjalan tidak diubah; kunci unik dan
+# foreign key yang belum ada di database lama ditambahkan oleh v0008.
+# Kolom LTE mcc/mnc/tracking_area_code/frequency_band_indicator bertipe teks seperti
+# pada deployment yang ada; kode ingest dan query menangani kolom INTEGER maupun TEXT.
+VERSION = 1
+NAME = "base schema"
+
+SQL = """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'campaign_status') THEN
+            CREATE TYPE campaign_status AS ENUM ('active', 'paused', 'stop', 'stopped');
+        END IF;
+    END
+    $$;
+
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(255) NOT NULL UNIQUE,
+        name VARCHAR(255),
+        email VARCHAR(255),
+        password TEXT NOT NULL,
+        role VARCHAR(50) NOT NULL DEFAULT 'admin',
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS device_group (
+        id SERIAL PRIMARY KEY,
+        group_name VARCHAR(255) NOT NULL,
+        description TEXT,
+        user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS devices (
+        id SERIAL PRIMARY KEY,
+        serial_number VARCHAR(255) NOT NULL UNIQUE,
+        ip VARCHAR(64),
+        lat DOUBLE PRECISION,
+        long DOUBLE PRECISION,
+        is_connected BOOLEAN NOT NULL DEFAULT FALSE,
+        is_running BOOLEAN NOT NULL DEFAULT FALSE,
+        group_id INTEGER REFERENCES device_group(id) ON DELETE SET NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS campaign (
+        id SERIAL PRIMARY KEY,
+        name VARCHAR(255),
+        status campaign_status NOT NULL DEFAULT 'active',
+        group_id INTEGER REFERENCES device_group(id) ON DELETE SET NULL,
+        user_id INTEGER REFERENCES users(id) ON DELETE SET NULL,
+        time_start TIMESTAMP,
+        time_stop TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS campaign_devices (
+        campaign_id INTEGER NOT NULL REFERENCES campaign(id) ON DELETE CASCADE,
+        device_id INTEGER NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+        PRIMARY KEY (campaign_id, device_id)
+    );
+
+    CREATE TABLE IF NOT EXISTS gsm_data (
+        id SERIAL PRIMARY KEY,
+        campaign_id INTEGER NOT NULL REFERENCES campaign(id) ON DELETE CASCADE,
+        device_id INTEGER NOT NULL REFERENCES devices(id),
+        mcc INTEGER,
+        mnc INTEGER,
+        operator VARCHAR(255),
+        local_area_code INTEGER,
+        arfcn INTEGER,
+        cell_identity INTEGER,
+        rxlev INTEGER,
+        rxlev_access_min DOUBLE PRECISION,
+        status BOOLEAN,
+        rssi DOUBLE PRECISION,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT gsm_data_unique_cell UNIQUE (campaign_id, device_id, mcc, mnc, local_area_code, cell_identity)
+    );
+
+    CREATE TABLE IF NOT EXISTS lte_data (
+        id SERIAL PRIMARY KEY,
+        campaign_id INTEGER NOT NULL REFERENCES campaign(id) ON DELETE CASCADE,
+        device_id INTEGER NOT NULL REFERENCES devices(id),
+        mcc VARCHAR(8),
+        mnc VARCHAR(8),
+        operator VARCHAR(255),
+        arfcn INTEGER,
+        cell_identity INTEGER,
+        tracking_area_code VARCHAR(16),
+        frequency_band_indicator VARCHAR(16),
+        signal_level INTEGER,
+        snr INTEGER,
+        rx_lev_min INTEGER,
+        status BOOLEAN,
+        rssi DOUBLE PRECISION,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        CONSTRAINT lte_data_unique_cell UNIQUE (campaign_id, device_id, mcc, mnc, tracking_area_code, cell_identity)
+    );
+"""
+
+
+def upgrade(cur):
+    cur.execute(SQL)
@@ -0,0 +1,32 @@
+# Index untuk query yang paling sering jalan. CONCURRENTLY supaya tabel BTS yang sudah besar
+# tetap bisa ditulis oleh ingest selama index dibangun.
+from migrations import create_index_concurrently
+
+VERSION = 2
+NAME = "hot query indexes"
+TRANSACTIONAL = False
+
+INDEXES = [
+    # Data per campaign + urutan id (pagination keyset, snapshot WebSocket)
+    ("gsm_data_campaign_id_idx", "ON gsm_data (campaign_id, id)"),
+    ("lte_data_campaign_id_idx", "ON lte_data (campaign_id, id)"),
+    # Hapus device dan FK ke devices
+    ("gsm_data_device_id_idx", "ON gsm_data (device_id)"),
+    ("lte_data_device_id_idx", "ON lte_data (device_id)"),
+    # Hitung threat BTS (status = FALSE) per campaign, dipakai rebuild campaign_stats
+    ("gsm_data_threat_idx", "ON gsm_data (campaign_id) WHERE status = FALSE"),
+    ("lte_data_threat_idx", "ON lte_data (campaign_id) WHERE status = FALSE"),
+    # Primary key campaign_devices diawali campaign_id; arah sebaliknya untuk device
+    ("campaign_devices_device_id_idx", "ON campaign_devices (device_id)"),
+    # Resolusi IP di start-capture
+    ("devices_ip_idx", "ON devices (ip)"),
+    # Cek campaign aktif per group di start-capture
+    ("campaign_active_group_idx", "ON campaign (group_id) WHERE status = 'active'"),
+    # Device source supervisor ingest (campaign active/paused)
+    ("campaign_status_idx", "ON campaign (status)"),
+]
+
+
+def upgrade(cur):
+    for name, definition in INDEXES:
+        create_index_concurrently(cur, name, definition)
@@ -0,0 +1,32 @@
+# Counter BTS per campaign yang dijaga oleh jalur ingest (lihat campaign_stats.py).
+# Setelah migrasi, isi data lama dengan: python3 campaign_stats.py rebuild
+VERSION = 3
+NAME = "campaign stats"
+
+SQL = """
+    CREATE TABLE IF NOT EXISTS campaign_stats (
+        campaign_id INTEGER PRIMARY KEY REFERENCES campaign(id) ON DELETE CASCADE,
+        gsm_total BIGINT NOT NULL DEFAULT 0,
+        lte_total BIGINT NOT NULL DEFAULT 0,
+        gsm_threat_count BIGINT NOT NULL DEFAULT 0,
+        gsm_real_count BIGINT NOT NULL DEFAULT 0,
+        lte_threat_count BIGINT NOT NULL DEFAULT 0,
+        lte_real_count BIGINT NOT NULL DEFAULT 0,
+        last_seen_at TIMESTAMP,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS campaign_operator_stats (
+        campaign_id INTEGER NOT NULL REFERENCES campaign(id) ON DELETE CASCADE,
+        tech VARCHAR(8) NOT NULL,
+        operator TEXT NOT NULL DEFAULT '',
+        total BIGINT NOT NULL DEFAULT 0,
+        threat_count BIGINT NOT NULL DEFAULT 0,
+        real_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (campaign_id, tech, operator)
+    );
+"""
+
+
+def upgrade(cur):
+    cur.execute(SQL)
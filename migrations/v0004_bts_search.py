@@ -0,0 +1,31 @@
+# Pencarian BTS berbasis index (lihat bts_search.py): index trigram pada ekspresi search key
+# dan index btree untuk jalur exact match. Tanpa kolom tersimpan (tidak ada penulisan ulang
+# tabel); semua index dibangun CONCURRENTLY supaya ingest tetap berjalan selama migrasi.
+from bts_search import SEARCH_KEY_SQL
+from migrations import create_table_index_concurrently
+
+VERSION = 4
+NAME = "bts search indexes"
+TRANSACTIONAL = False
+
+EXACT_COLUMNS = {
+    "gsm": ("cell_identity", "local_area_code"),
+    "lte": ("cell_identity", "tracking_area_code"),
+}
+TABLES = {"gsm": "gsm_data", "lte": "lte_data"}
+
+
+def indexes():
+    result = []
+    for tech, table in TABLES.items():
+        result.append((f"{table}_search_trgm_idx", table, f"USING gin (({SEARCH_KEY_SQL[tech]}) gin_trgm_ops)"))
+        for column in EXACT_COLUMNS[tech]:
+            result.append((f"{table}_campaign_{column}_idx", table, f"(campaign_id, {column})"))
+        result.append((f"{table}_campaign_mcc_mnc_idx", table, "(campaign_id, mcc, mnc)"))
+    return result
+
+
+def upgrade(cur):
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, columns in indexes():
+        create_table_index_concurrently(cur, name, table, columns)
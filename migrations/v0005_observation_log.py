@@ -0,0 +1,60 @@
+# Riwayat pengukuran BTS (lihat observation_log.py): tabel append-only dipartisi per hari,
+# plus ringkasan per jam untuk data mentah yang sudah melewati masa retensi.
+# Partisi harian dibuat oleh observation_log saat berjalan, bukan oleh migrasi ini.
+VERSION = 5
+NAME = "observation log"
+
+SQL = """
+    CREATE TABLE IF NOT EXISTS bts_observations (
+        observed_at TIMESTAMPTZ NOT NULL,
+        campaign_id INTEGER NOT NULL,
+        device_id INTEGER NOT NULL,
+        tech VARCHAR(8) NOT NULL,
+        mcc INTEGER,
+        mnc INTEGER,
+        area_code INTEGER,
+        cell_identity BIGINT,
+        operator TEXT,
+        arfcn INTEGER,
+        signal_level INTEGER,
+        snr INTEGER,
+        rssi REAL,
+        status BOOLEAN
+    ) PARTITION BY RANGE (observed_at);
+
+    -- Tanpa FK/unique supaya COPY tetap murah; satu index untuk riwayat per campaign
+    CREATE INDEX IF NOT EXISTS bts_observations_campaign_time_idx
+        ON bts_observations (campaign_id, observed_at);
+
+    CREATE TABLE IF NOT EXISTS bts_observations_hourly (
+        bucket TIMESTAMPTZ NOT NULL,
+        campaign_id INTEGER NOT NULL,
+        device_id INTEGER NOT NULL,
+        tech VARCHAR(8) NOT NULL,
+        mcc INTEGER,
+        mnc INTEGER,
+        area_code INTEGER,
+        cell_identity BIGINT,
+        operator TEXT,
+        samples INTEGER NOT NULL,
+        threat_samples INTEGER NOT NULL,
+        signal_level_min INTEGER,
+        signal_level_max INTEGER,
+        signal_level_avg REAL,
+        snr_min INTEGER,
+        snr_max INTEGER,
+        snr_avg REAL,
+        rssi_min REAL,
+        rssi_max REAL,
+        rssi_avg REAL
+    );
+
+    CREATE INDEX IF NOT EXISTS bts_observations_hourly_campaign_bucket_idx
+        ON bts_observations_hourly (campaign_id, bucket);
+    CREATE INDEX IF NOT EXISTS bts_observations_hourly_bucket_idx
+        ON bts_observations_hourly (bucket);
+"""
+
+
+def upgrade(cur):
+    cur.execute(SQL)
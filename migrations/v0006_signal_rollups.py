@@ -0,0 +1,42 @@
+# Rollup sinyal per bucket waktu (lihat signal_rollups.py): satu tabel per ukuran bucket.
+# Kolom kunci NOT NULL (NULL disimpan sebagai -1 / '') supaya ON CONFLICT bisa dipakai.
+VERSION = 6
+NAME = "signal rollups"
+
+ROLLUP_TABLES = ("signal_rollup_1m", "signal_rollup_1h")
+
+
+def table_sql(table):
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            campaign_id INTEGER NOT NULL,
+            bucket TIMESTAMPTZ NOT NULL,
+            tech VARCHAR(8) NOT NULL,
+            operator TEXT NOT NULL DEFAULT '',
+            mcc INTEGER NOT NULL,
+            mnc INTEGER NOT NULL,
+            area_code INTEGER NOT NULL,
+            cell_identity BIGINT NOT NULL,
+            samples BIGINT NOT NULL DEFAULT 0,
+            threat_samples BIGINT NOT NULL DEFAULT 0,
+            signal_level_min INTEGER,
+            signal_level_max INTEGER,
+            signal_level_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            signal_level_count BIGINT NOT NULL DEFAULT 0,
+            snr_min INTEGER,
+            snr_max INTEGER,
+            snr_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            snr_count BIGINT NOT NULL DEFAULT 0,
+            rssi_min REAL,
+            rssi_max REAL,
+            rssi_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+            rssi_count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (campaign_id, bucket, tech, operator, mcc, mnc, area_code, cell_identity)
+        );
+        CREATE INDEX IF NOT EXISTS {table}_bucket_idx ON {table} (bucket);
+    """
+
+
+def upgrade(cur):
+    for table in ROLLUP_TABLES:
+        cur.execute(table_sql(table))
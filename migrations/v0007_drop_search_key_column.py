@@ -0,0 +1,51 @@
+# Deployment yang menjalankan versi awal v0004 masih punya kolom generated search_key (STORED)
+# beserta index trigramnya. Index ekspresi pengganti dibangun CONCURRENTLY lebih dulu (pencarian
+# tidak pernah tanpa index), lalu kolom dibuang; DROP COLUMN hanya mengubah metadata, tetapi
+# butuh kunci ACCESS EXCLUSIVE sesaat, jadi dicoba berulang dengan lock_timeout.
+# Tanpa efek untuk database yang dibuat dengan v0004 yang sekarang.
+import time
+import psycopg2.errors
+from bts_search import SEARCH_KEY_SQL
+from migrations import create_table_index_concurrently
+
+VERSION = 7
+NAME = "drop stored search_key"
+TRANSACTIONAL = False
+
+TABLES = {"gsm": "gsm_data", "lte": "lte_data"}
+LOCK_TIMEOUT_MS = 2000
+RETRIES = 10
+
+
+def _has_search_key(cur, table):
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'search_key'
+    """, (table,))
+    return cur.fetchone() is not None
+
+
+def _drop_column(cur, table):
+    cur.execute("SET lock_timeout = %s", (LOCK_TIMEOUT_MS,))
+    try:
+        for attempt in range(1, RETRIES + 1):
+            try:
+                cur.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_key")
+                return
+            except psycopg2.errors.LockNotAvailable:
+                if attempt == RETRIES:
+                    raise
+                print(f"{table} sedang dipakai, DROP COLUMN search_key dicoba lagi ({attempt}/{RETRIES})")
+                time.sleep(min(attempt, 10))
+    finally:
+        cur.execute("RESET lock_timeout")
+
+
+def upgrade(cur):
+    for tech, table in TABLES.items():
+        if not _has_search_key(cur, table):
+            continue
+        create_table_index_concurrently(
+            cur, f"{table}_search_trgm_idx", table, f"USING gin (({SEARCH_KEY_SQL[tech]}) gin_trgm_ops)"
+        )
+        _drop_column(cur, table)
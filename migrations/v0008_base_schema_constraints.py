@@ -0,0 +1,138 @@
+# v0001 hanya CREATE TABLE IF NOT EXISTS, jadi database yang sudah ada sebelum migrasi berversi
+# bisa tidak punya kunci unik (dipakai ON CONFLICT ingest/API) atau foreign key dari v0001.
+# Di sini setiap kunci dicek lewat katalog berdasarkan kolomnya (bukan nama constraint) dan
+# hanya yang belum ada yang ditambahkan:
+#   - kunci unik: UNIQUE INDEX CONCURRENTLY lalu ADD CONSTRAINT ... USING INDEX
+#   - foreign key: ADD ... NOT VALID (kunci singkat) lalu VALIDATE (tidak menghalangi tulis)
+# Data yang melanggar (duplikat / baris yatim) membuat migrasi gagal dengan pesan yang jelas,
+# dan migrasi diulang setelah data dibereskan. Foreign key dengan aksi ON DELETE yang berbeda
+# hanya dilaporkan, tidak diganti.
+import psycopg2.errors
+from migrations import create_index_concurrently
+
+VERSION = 8
+NAME = "base schema constraints"
+TRANSACTIONAL = False
+
+# (tabel, nama constraint, kolom); id tabel referensi lebih dulu karena dibutuhkan foreign key
+UNIQUE_KEYS = [
+    ("users", "users_id_key", ("id",)),
+    ("device_group", "device_group_id_key", ("id",)),
+    ("devices", "devices_id_key", ("id",)),
+    ("campaign", "campaign_id_key", ("id",)),
+    ("users", "users_username_key", ("username",)),
+    ("devices", "devices_serial_number_key", ("serial_number",)),
+    ("campaign_devices", "campaign_devices_unique_key", ("campaign_id", "device_id")),
+    ("gsm_data", "gsm_data_unique_cell",
+     ("campaign_id", "device_id", "mcc", "mnc", "local_area_code", "cell_identity")),
+    ("lte_data", "lte_data_unique_cell",
+     ("campaign_id", "device_id", "mcc", "mnc", "tracking_area_code", "cell_identity")),
+]
+
+# (tabel, kolom, tabel referensi, ON DELETE)
+FOREIGN_KEYS = [
+    ("device_group", "user_id", "users", "SET NULL"),
+    ("devices", "group_id", "device_group", "SET NULL"),
+    ("campaign", "group_id", "device_group", "SET NULL"),
+    ("campaign", "user_id", "users", "SET NULL"),
+    ("campaign_devices", "campaign_id", "campaign", "CASCADE"),
+    ("campaign_devices", "device_id", "devices", "CASCADE"),
+    ("gsm_data", "campaign_id", "campaign", "CASCADE"),
+    ("gsm_data", "device_id", "devices", "NO ACTION"),
+    ("lte_data", "campaign_id", "campaign", "CASCADE"),
+    ("lte_data", "device_id", "devices", "NO ACTION"),
+]
+# Kode pg_constraint.confdeltype
+ON_DELETE_CODES = {"NO ACTION": "a", "CASCADE": "c", "SET NULL": "n"}
+
+
+def _is_partitioned(cur, table):
+    cur.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = %s::regclass", (table,))
+    return cur.fetchone()[0]
+
+
+def _has_unique_key(cur, table, columns):
+    # Index unik tanpa predikat/ekspresi pada kolom yang sama sudah cukup untuk ON CONFLICT
+    cur.execute("""
+        SELECT 1
+        FROM pg_index i
+        WHERE i.indrelid = %s::regclass
+          AND i.indisunique AND i.indisvalid
+          AND i.indpred IS NULL AND i.indexprs IS NULL
+          AND (
+              SELECT array_agg(a.attname::text ORDER BY a.attname)
+              FROM pg_attribute a
+              WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+          ) = %s::text[]
+    """, (table, sorted(columns)))
+    return cur.fetchone() is not None
+
+
+def ensure_unique_key(cur, table, name, columns):
+    if _has_unique_key(cur, table, columns):
+        return False
+    if _is_partitioned(cur, table):
+        # partitions.py convert selalu membuat kunci unik induk; jika hilang, perbaiki manual
+        raise RuntimeError(f"{table}: kunci unik ({', '.join(columns)}) tidak ada pada tabel partisi")
+    try:
+        create_index_concurrently(cur, name, f"ON {table} ({', '.join(columns)})", unique=True)
+    except psycopg2.errors.UniqueViolation:
+        raise RuntimeError(
+            f"{table}: ada baris duplikat untuk ({', '.join(columns)}); hapus duplikat lalu jalankan "
+            f"python3 migrate.py lagi"
+        )
+    cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+    return True
+
+
+def _foreign_keys(cur, table, column, referenced):
+    cur.execute("""
+        SELECT c.conname, c.confdeltype, c.convalidated
+        FROM pg_constraint c
+        JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f'
+          AND c.conrelid = %s::regclass
+          AND c.confrelid = %s::regclass
+          AND array_length(c.conkey, 1) = 1
+          AND a.attname = %s
+    """, (table, referenced, column))
+    return cur.fetchall()
+
+
+def _validate(cur, table, name, column, referenced):
+    try:
+        cur.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+    except psycopg2.errors.ForeignKeyViolation:
+        raise RuntimeError(
+            f"{table}.{column}: ada baris yang merujuk {referenced} yang tidak ada; bereskan lalu "
+            f"jalankan python3 migrate.py lagi"
+        )
+
+
+def ensure_foreign_key(cur, table, column, referenced, on_delete):
+    existing = _foreign_keys(cur, table, column, referenced)
+    if existing:
+        for name, delete_code, validated in existing:
+            if delete_code != ON_DELETE_CODES[on_delete]:
+                print(f"Peringatan: {table}.{name} memakai ON DELETE berbeda dari skema (seharusnya {on_delete})")
+            if not validated:
+                _validate(cur, table, name, column, referenced)
+        return False
+    if _is_partitioned(cur, table):
+        raise RuntimeError(f"{table}.{column}: foreign key ke {referenced} tidak ada pada tabel partisi")
+    name = f"{table}_{column}_fkey"
+    cur.execute(f"""
+        ALTER TABLE {table} ADD CONSTRAINT {name}
+        FOREIGN KEY ({column}) REFERENCES {referenced}(id) ON DELETE {on_delete} NOT VALID
+    """)
+    _validate(cur, table, name, column, referenced)
+    return True
+
+
+def upgrade(cur):
+    for table, name, columns in UNIQUE_KEYS:
+        if ensure_unique_key(cur, table, name, columns):
+            print(f"{table}: kunci unik {name} ditambahkan")
+    for table, column, referenced, on_delete in FOREIGN_KEYS:
+        if ensure_foreign_key(cur, table, column, referenced, on_delete):
+            print(f"{table}.{column}: foreign key ke {referenced} ditambahkan")
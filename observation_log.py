@@ -0,0 +1,350 @@
+import csv
+import io
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from database_config import get_db_connection
+import signal_rollups
+from signal_rollups import SIGNAL_ROLLUPS_ENABLED
+
+# Riwayat pengukuran BTS (opsional, OBSERVATION_LOG=1).
+#
+# gsm_data/lte_data tetap menyimpan keadaan terakhir per sel (upsert). Setiap baris yang
+# di-upsert juga dicatat ke bts_observations (append-only, partisi RANGE per hari), sehingga
+# deret waktu rxlev/signal_level/rssi/snr per (campaign, device, sel) tidak hilang.
+#
+# Jalur ingest hanya menaruh baris ke buffer memori setelah commit. Thread flusher menulis
+# buffer dengan COPY per batch lewat koneksinya sendiri; jika DB lambat atau buffer penuh,
+# baris riwayat terlama yang dibuang (dihitung di observation_log_dropped_rows_total), bukan
+# pesan ingest yang ditahan. Rollup sinyal tidak lewat buffer ini: rollup diperbarui di transaksi
+# upsert wsReceivedata, sehingga tidak ikut hilang saat buffer penuh.
+#
+# Pemeliharaan (otomatis di thread flusher, atau: python3 observation_log.py maintain):
+#   - partisi harian dibuat lebih dulu untuk beberapa hari ke depan
+#   - partisi yang lebih tua dari OBSERVATION_RAW_RETENTION_DAYS diringkas per jam ke
+#     bts_observations_hourly lalu di-DROP (tanpa DELETE massal / vacuum)
+#   - ringkasan per jam dihapus setelah OBSERVATION_HOURLY_RETENTION_DAYS
+#   - rollup sinyal yang kedaluwarsa dihapus (signal_rollups.expire, juga saat OBSERVATION_LOG=0)
+# Tabel dibuat oleh migrasi v0005.
+
+OBSERVATION_LOG_ENABLED = os.environ.get("OBSERVATION_LOG", "0") == "1"
+# Jumlah baris per COPY dan jeda maksimum antar flush (detik)
+OBSERVATION_BATCH_SIZE = int(os.environ.get("OBSERVATION_BATCH_SIZE", 5000))
+OBSERVATION_FLUSH_INTERVAL = float(os.environ.get("OBSERVATION_FLUSH_INTERVAL", 2))
+# Batas baris di memori; lebih dari ini baris terlama dibuang
+OBSERVATION_BUFFER_MAX = int(os.environ.get("OBSERVATION_BUFFER_MAX", 200000))
+OBSERVATION_RAW_RETENTION_DAYS = int(os.environ.get("OBSERVATION_RAW_RETENTION_DAYS", 7))
+OBSERVATION_HOURLY_RETENTION_DAYS = int(os.environ.get("OBSERVATION_HOURLY_RETENTION_DAYS", 180))
+OBSERVATION_PREMAKE_DAYS = int(os.environ.get("OBSERVATION_PREMAKE_DAYS", 2))
+OBSERVATION_MAINTENANCE_INTERVAL = float(os.environ.get("OBSERVATION_MAINTENANCE_INTERVAL", 3600))
+
+OBSERVATION_TABLE = "bts_observations"
+OBSERVATION_COLUMNS = (
+    "observed_at", "campaign_id", "device_id", "tech", "mcc", "mnc", "area_code",
+    "cell_identity", "operator", "arfcn", "signal_level", "snr", "rssi", "status",
+)
+COPY_QUERY = f"COPY {OBSERVATION_TABLE} ({', '.join(OBSERVATION_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+
+def gsm_observations(observed_at, rows):
+    # Tuple baris dari wsReceivedata.build_gsm_rows; rxlev dicatat sebagai signal_level
+    return [
+        (observed_at, r[0], r[1], "gsm", r[2], r[3], r[5], r[7], r[4], r[6], r[8], None, r[11], r[10])
+        for r in rows
+    ]
+
+
+def lte_observations(observed_at, rows):
+    # Tuple baris dari wsReceivedata.build_lte_rows
+    return [
+        (observed_at, r[0], r[1], "lte", r[2], r[3], r[7], r[6], r[4], r[5], r[9], r[10], r[13], r[12])
+        for r in rows
+    ]
+
+
+def partition_name(day):
+    return f"{OBSERVATION_TABLE}_p{day:%Y%m%d}"
+
+
+def ensure_partition(cur, day):
+    name = partition_name(day)
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    if cur.fetchone()[0]:
+        return False
+    start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+    end = start + timedelta(days=1)
+    cur.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {OBSERVATION_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return True
+
+
+def list_partitions(cur):
+    cur.execute("""
+        SELECT child.relname
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = %s
+        ORDER BY child.relname
+    """, (OBSERVATION_TABLE,))
+    partitions = []
+    prefix = f"{OBSERVATION_TABLE}_p"
+    for (name,) in cur.fetchall():
+        if name.startswith(prefix):
+            partitions.append((datetime.strptime(name[len(prefix):], "%Y%m%d").date(), name))
+    return partitions
+
+
+def downsample_partition(cur, name):
+    # Ringkasan per jam UTC untuk satu partisi harian, lalu partisinya di-drop
+    cur.execute(f"""
+        INSERT INTO bts_observations_hourly (
+            bucket, campaign_id, device_id, tech, mcc, mnc, area_code, cell_identity, operator,
+            samples, threat_samples, signal_level_min, signal_level_max, signal_level_avg,
+            snr_min, snr_max, snr_avg, rssi_min, rssi_max, rssi_avg
+        )
+        SELECT
+            date_trunc('hour', observed_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC',
+            campaign_id, device_id, tech, mcc, mnc, area_code, cell_identity, MAX(operator),
+            COUNT(*), COUNT(*) FILTER (WHERE status = FALSE),
+            MIN(signal_level), MAX(signal_level), AVG(signal_level),
+            MIN(snr), MAX(snr), AVG(snr),
+            MIN(rssi), MAX(rssi), AVG(rssi)
+        FROM {name}
+        GROUP BY 1, campaign_id, device_id, tech, mcc, mnc, area_code, cell_identity
+    """)
+    summarized = cur.rowcount
+    cur.execute(f"DROP TABLE {name}")
+    return summarized
+
+
+def maintain(conn, now=None, raw=True, rollups=True):
+    """Buat partisi ke depan, ringkas + drop partisi lama, hapus ringkasan/rollup kedaluwarsa."""
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    result = {"created": [], "downsampled": {}, "hourly_deleted": 0, "rollups_deleted": {}}
+    if rollups:
+        with conn:
+            with conn.cursor() as cur:
+                result["rollups_deleted"] = signal_rollups.expire(cur, now)
+    if not raw:
+        return result
+
+    with conn:
+        with conn.cursor() as cur:
+            for offset in range(OBSERVATION_PREMAKE_DAYS + 1):
+                day = today + timedelta(days=offset)
+                if ensure_partition(cur, day):
+                    result["created"].append(partition_name(day))
+
+    cutoff = today - timedelta(days=OBSERVATION_RAW_RETENTION_DAYS)
+    with conn.cursor() as cur:
+        partitions = list_partitions(cur)
+    conn.commit()
+    for day, name in partitions:
+        if day >= cutoff:
+            continue
+        # Satu transaksi per partisi: ringkasan dan DROP berhasil atau gagal bersama
+        with conn:
+            with conn.cursor() as cur:
+                result["downsampled"][name] = downsample_partition(cur, name)
+
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM bts_observations_hourly WHERE bucket < %s",
+                (now - timedelta(days=OBSERVATION_HOURLY_RETENTION_DAYS),)
+            )
+            result["hourly_deleted"] = cur.rowcount
+    return result
+
+
+class ObservationLog:
+    """Buffer baris riwayat + thread flusher yang menulis dengan COPY."""
+
+    def __init__(self, batch_size=OBSERVATION_BATCH_SIZE, flush_interval=OBSERVATION_FLUSH_INTERVAL,
+                 buffer_max=OBSERVATION_BUFFER_MAX, maintenance_interval=OBSERVATION_MAINTENANCE_INTERVAL,
+                 raw=OBSERVATION_LOG_ENABLED, rollups=SIGNAL_ROLLUPS_ENABLED):
+        self.raw = raw
+        # Rollup ditulis jalur ingest; di sini hanya pemeliharaan (expire) berkala
+        self.rollups = rollups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer_max = buffer_max
+        self.maintenance_interval = maintenance_interval
+        self.running = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffer = []
+        self._thread = None
+        self._conn = None
+        self._known_days = set()
+        self._last_maintenance = 0.0
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def enabled(self):
+        return self.raw or self.rollups
+
+    def record(self, gsm_rows, lte_rows):
+        """Dipanggil jalur ingest setelah commit; hanya menaruh baris ke buffer."""
+        if not self.running or not self.raw or not (gsm_rows or lte_rows):
+            return
+        observed_at = datetime.now(timezone.utc)
+        rows = gsm_observations(observed_at, gsm_rows) + lte_observations(observed_at, lte_rows)
+        with self._lock:
+            self._buffer.extend(rows)
+            self.recorded += len(rows)
+            self._trim()
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _trim(self):
+        excess = len(self._buffer) - self.buffer_max
+        if excess > 0:
+            del self._buffer[:excess]
+            self.dropped += excess
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            conn = get_db_connection()
+            if conn is None:
+                raise RuntimeError("Tidak bisa terhubung ke database")
+            self._conn = conn
+            self._known_days.clear()
+        return self._conn
+
+    def _close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
+
+    def _write(self, rows):
+        conn = self._connection()
+        with conn:
+            with conn.cursor() as cur:
+                self._copy(cur, rows)
+        self._known_days.update(row[0].date() for row in rows)
+
+    def _copy(self, cur, rows):
+        data = io.StringIO()
+        writer = csv.writer(data)
+        for row in rows:
+            # Kolom kosong di CSV dibaca COPY sebagai NULL
+            writer.writerow(["" if value is None else value for value in row])
+        data.seek(0)
+        for day in {row[0].date() for row in rows} - self._known_days:
+            ensure_partition(cur, day)
+        cur.copy_expert(COPY_QUERY, data)
+
+    def flush(self):
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        started = time.perf_counter()
+        try:
+            self._write(rows)
+        except Exception as e:
+            self.failed_flushes += 1
+            print(f"Gagal menulis {len(rows)} baris riwayat BTS: {e}")
+            self._close()
+            # Dicoba lagi di flush berikutnya, tetap dalam batas buffer
+            with self._lock:
+                self._buffer[:0] = rows
+                self._trim()
+            return 0
+        self.flushes += 1
+        self.written += len(rows)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        return len(rows)
+
+    def _maintain_if_due(self):
+        if time.monotonic() - self._last_maintenance < self.maintenance_interval:
+            return
+        self._last_maintenance = time.monotonic()
+        try:
+            result = maintain(self._connection(), raw=self.raw, rollups=self.rollups)
+            if result["created"] or result["downsampled"] or result["hourly_deleted"] or any(result["rollups_deleted"].values()):
+                print(f"Pemeliharaan riwayat BTS: {result}")
+        except Exception as e:
+            print(f"Gagal pemeliharaan riwayat BTS: {e}")
+            self._close()
+
+    def _run(self):
+        while self.running:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._maintain_if_due()
+            self.flush()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="observation-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Tulis sisa buffer sebelum berhenti
+        if not self.running:
+            return
+        self.running = False
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._close()
+
+    def stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            "enabled": self.running,
+            "raw": self.raw,
+            "rollups": self.rollups,
+            "buffered": buffered,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+# Instance global yang dipakai jalur ingest
+observation_log = ObservationLog()
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    conn = get_db_connection()
+    if conn is None:
+        return 1
+    try:
+        if command == "maintain":
+            print(maintain(conn))
+        elif command == "list":
+            with conn.cursor() as cur:
+                for day, name in list_partitions(cur):
+                    print(f"{day}  {name}")
+        else:
+            print("Penggunaan: python3 observation_log.py maintain | list")
+            return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
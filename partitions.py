@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+import psycopg2.errors
+from database_config import db_connection
+import campaign_stats
+from bts_search import SEARCH_KEY_SQL
+
+# Partisi LIST per campaign untuk gsm_data dan lte_data.
+#
+# Tabel lama diubah (sekali, saat capture berhenti, setelah python3 migrate.py) dengan:
+#   python3 partitions.py convert
+#   - tabel lama di-rename menjadi <tabel>_legacy dan dipasang sebagai partisi DEFAULT
+#     (metadata saja, tanpa menyalin data)
+#   - partisi DEFAULT diberi CHECK campaign_id <= id terakhir, sehingga membuat partisi
+#     campaign baru tidak perlu memindai data lama
+# Setelah itu start-capture membuat partisi campaign baru (create_campaign_partitions) sebelum
+# baris campaign di-insert, dan
+# query/delete yang memfilter campaign_id hanya menyentuh partisi campaign tersebut.
+#
+# Perintah lain:
+#   python3 partitions.py create <campaign_id ...>   buat partisi lebih dulu
+#   python3 partitions.py detach <campaign_id ...>   lepas partisi (data tetap ada sebagai tabel biasa)
+#   python3 partitions.py drop <campaign_id ...>     hapus data campaign (DETACH lalu DROP TABLE)
+#   python3 partitions.py retention <hari>           drop partisi campaign yang berhenti > N hari lalu
+#   python3 partitions.py list
+
+BTS_TABLES = ("gsm_data", "lte_data")
+UNIQUE_COLUMNS = {
+    "gsm_data": "campaign_id, device_id, mcc, mnc, local_area_code, cell_identity",
+    "lte_data": "campaign_id, device_id, mcc, mnc, tracking_area_code, cell_identity",
+}
+AREA_COLUMN = {"gsm_data": "local_area_code", "lte_data": "tracking_area_code"}
+TECH = {"gsm_data": "gsm", "lte_data": "lte"}
+
+# ATTACH dan DETACH tanpa CONCURRENTLY (induk punya partisi DEFAULT) menunggu kunci paling lama
+# sekian ms per percobaan, supaya tidak mengantre di belakang query panjang sambil menahan query lain
+PARTITION_DETACH_LOCK_TIMEOUT_MS = int(os.environ.get("PARTITION_DETACH_LOCK_TIMEOUT_MS", 2000))
+PARTITION_DETACH_RETRIES = int(os.environ.get("PARTITION_DETACH_RETRIES", 10))
+
+
+def parent_indexes(table):
+    # Sama dengan index migrasi v0002/v0004; index yang cocok di tabel legacy dipasangkan saat
+    # attach (tanpa build ulang), partisi campaign baru mendapatkannya otomatis
+    return [
+        f"CREATE INDEX {table}_p_campaign_id_idx ON {table} (campaign_id, id)",
+        f"CREATE INDEX {table}_p_device_id_idx ON {table} (device_id)",
+        f"CREATE INDEX {table}_p_threat_idx ON {table} (campaign_id) WHERE status = FALSE",
+        f"CREATE INDEX {table}_p_search_trgm_idx ON {table} USING gin (({SEARCH_KEY_SQL[TECH[table]]}) gin_trgm_ops)",
+        f"CREATE INDEX {table}_p_campaign_cell_identity_idx ON {table} (campaign_id, cell_identity)",
+        f"CREATE INDEX {table}_p_campaign_area_idx ON {table} (campaign_id, {AREA_COLUMN[table]})",
+        f"CREATE INDEX {table}_p_campaign_mcc_mnc_idx ON {table} (campaign_id, mcc, mnc)",
+    ]
+
+
+def partition_name(table, campaign_id):
+    return f"{table}_c{int(campaign_id)}"
+
+
+def is_partitioned(cur, table):
+    cur.execute("""
+        SELECT 1 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = %s
+    """, (table,))
+    return cur.fetchone() is not None
+
+
+def _table_exists(cur, name):
+    cur.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return cur.fetchone()[0]
+
+
+def convert_table(cur, table):
+    """Ubah tabel biasa menjadi tabel partisi dengan data lama sebagai partisi DEFAULT."""
+    if is_partitioned(cur, table):
+        return False
+    legacy = f"{table}_legacy"
+    cur.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    cur.execute("SELECT COALESCE(MAX(id), 0) FROM campaign")
+    last_campaign_id = cur.fetchone()[0]
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+    sequence = cur.fetchone()[0]
+
+    cur.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    cur.execute(f"""
+        CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING GENERATED)
+        PARTITION BY LIST (campaign_id)
+    """)
+    if sequence:
+        # Sequence id dipindah ke tabel induk supaya tidak ikut terhapus bersama tabel legacy
+        cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    # Constraint unik wajib memuat kunci partisi; (campaign_id, ...) sudah memenuhinya
+    cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_cell_key UNIQUE ({UNIQUE_COLUMNS[table]})")
+    cur.execute(f"ALTER TABLE {table} ADD FOREIGN KEY (campaign_id) REFERENCES campaign(id) ON DELETE CASCADE")
+    cur.execute(f"ALTER TABLE {table} ADD FOREIGN KEY (device_id) REFERENCES devices(id)")
+
+    for statement in parent_indexes(table):
+        cur.execute(statement)
+
+    cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy} DEFAULT")
+    # NOT VALID: berlaku untuk baris baru seketika, validasi data lama dijalankan terpisah (validate_legacy)
+    cur.execute(f"""
+        ALTER TABLE {legacy} ADD CONSTRAINT {legacy}_campaign_upto
+        CHECK (campaign_id <= {int(last_campaign_id)}) NOT VALID
+    """)
+    return True
+
+
+def validate_legacy(cur, table):
+    # Memindai tabel legacy sekali dengan lock yang tidak menghalangi insert/update
+    legacy = f"{table}_legacy"
+    cur.execute("""
+        SELECT 1 FROM pg_constraint WHERE conname = %s AND NOT convalidated
+    """, (f"{legacy}_campaign_upto",))
+    if cur.fetchone():
+        cur.execute(f"ALTER TABLE {legacy} VALIDATE CONSTRAINT {legacy}_campaign_upto")
+
+
+def ensure_campaign_partitions(cur, campaign_id, tables=BTS_TABLES):
+    """Buat partisi gsm/lte untuk campaign di transaksi pemanggil. Tanpa efek jika belum dipartisi."""
+    created = []
+    for table in tables:
+        if not is_partitioned(cur, table):
+            continue
+        name = partition_name(table, campaign_id)
+        if _table_exists(cur, name):
+            continue
+        # CREATE + ATTACH (bukan PARTITION OF) supaya tabel induk hanya dikunci SHARE UPDATE EXCLUSIVE
+        # dan ingest campaign lain tetap berjalan
+        cur.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING GENERATED)")
+        cur.execute(f"ALTER TABLE {name} ADD CHECK (campaign_id = {int(campaign_id)})")
+        cur.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES IN ({int(campaign_id)})")
+        created.append(name)
+    return created
+
+
+def create_campaign_partitions(conn, campaign_id):
+    """Buat partisi campaign dalam transaksi pendek sendiri, satu per tabel (sebelum campaign di-insert).
+
+    ATTACH mengunci partisi DEFAULT (ACCESS EXCLUSIVE) sampai commit. CHECK pada tabel baru dan
+    CHECK campaign_upto yang sudah divalidasi pada DEFAULT membuat ATTACH tanpa scan, dan kuncinya
+    dilepas segera setelah tabel ini selesai, bukan ditahan sepanjang transaksi pembuatan campaign.
+    """
+    created = []
+    conn.commit()
+    for table in BTS_TABLES:
+        for attempt in range(1, PARTITION_DETACH_RETRIES + 1):
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SET LOCAL lock_timeout = %s", (PARTITION_DETACH_LOCK_TIMEOUT_MS,))
+                    created += ensure_campaign_partitions(cur, campaign_id, tables=(table,))
+                conn.commit()
+                break
+            except psycopg2.errors.LockNotAvailable:
+                conn.rollback()
+                if attempt == PARTITION_DETACH_RETRIES:
+                    raise
+                print(f"{table} sedang dipakai, ATTACH partisi campaign {campaign_id} dicoba lagi ({attempt}/{PARTITION_DETACH_RETRIES})")
+                time.sleep(min(attempt, 10))
+    return created
+
+
+def has_default_partition(cur, table):
+    cur.execute("""
+        SELECT p.partdefid <> 0 FROM pg_partitioned_table p
+        JOIN pg_class c ON c.oid = p.partrelid
+        WHERE c.relname = %s
+    """, (table,))
+    row = cur.fetchone()
+    return bool(row and row[0])
+
+
+def _detach_pending(cur, name):
+    # None jika tabel tidak (lagi) terpasang sebagai partisi
+    cur.execute("""
+        SELECT i.inhdetachpending FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE c.relname = %s
+    """, (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def detach_partition(conn, table, name):
+    """Lepas satu partisi dengan statement autocommit tersendiri (conn harus autocommit).
+
+    DETACH ... CONCURRENTLY hanya mengunci induk SHARE UPDATE EXCLUSIVE, sehingga ingest dan
+    query dashboard tetap berjalan. Postgres tidak mengizinkannya jika induk punya partisi DEFAULT
+    (tabel legacy hasil convert); untuk kasus itu DETACH biasa dicoba berulang dengan lock_timeout.
+    """
+    with conn.cursor() as cur:
+        pending = _detach_pending(cur, name)
+        if pending is None:
+            return False
+        if pending:
+            # DETACH CONCURRENTLY sebelumnya terputus di tengah jalan
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE")
+            return True
+        if not has_default_partition(cur, table):
+            cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY")
+            return True
+        cur.execute("SET lock_timeout = %s", (PARTITION_DETACH_LOCK_TIMEOUT_MS,))
+        try:
+            for attempt in range(1, PARTITION_DETACH_RETRIES + 1):
+                try:
+                    cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                    return True
+                except psycopg2.errors.LockNotAvailable:
+                    if attempt == PARTITION_DETACH_RETRIES:
+                        raise
+                    print(f"{name}: {table} sedang dipakai, DETACH dicoba lagi ({attempt}/{PARTITION_DETACH_RETRIES})")
+                    time.sleep(min(attempt, 10))
+        finally:
+            cur.execute("RESET lock_timeout")
+
+
+def detach_campaign_partitions(conn, campaign_id):
+    detached = []
+    conn.commit()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        for table in BTS_TABLES:
+            name = partition_name(table, campaign_id)
+            if detach_partition(conn, table, name):
+                detached.append(name)
+    finally:
+        conn.autocommit = autocommit
+    return detached
+
+
+def drop_campaign_partitions(conn, campaign_ids):
+    """Hapus data campaign: partisi dilepas lalu di-DROP, counter campaign dinolkan.
+
+    Setiap langkah berjalan sebagai transaksi pendek per partisi / per campaign, jadi retensi
+    banyak campaign tidak menahan kunci tabel induk maupun statistik sepanjang loop.
+    """
+    dropped = []
+    conn.commit()
+    # Koneksi dari pool dikembalikan dengan mode autocommit semula
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        for campaign_id in campaign_ids:
+            with conn.cursor() as cur:
+                for table in BTS_TABLES:
+                    name = partition_name(table, campaign_id)
+                    if _table_exists(cur, name):
+                        detach_partition(conn, table, name)
+                        # Sudah lepas dari induk, jadi DROP hanya mengunci tabel ini
+                        cur.execute(f"DROP TABLE {name}")
+                        dropped.append(name)
+
+                # Data campaign lama (partisi DEFAULT / tabel belum dipartisi) dihapus biasa,
+                # bersama counter campaign dalam satu transaksi
+                cur.execute("BEGIN")
+                try:
+                    for table in BTS_TABLES:
+                        cur.execute(f"DELETE FROM {table} WHERE campaign_id = %s", (campaign_id,))
+                    campaign_stats.clear(cur, campaign_id)
+                    cur.execute("COMMIT")
+                except Exception:
+                    cur.execute("ROLLBACK")
+                    raise
+    finally:
+        conn.autocommit = autocommit
+    return dropped
+
+
+def expired_campaigns(cur, days):
+    cur.execute("""
+        SELECT id FROM campaign
+        WHERE status IN ('stop', 'stopped')
+          AND time_stop < CURRENT_TIMESTAMP - make_interval(days => %s)
+        ORDER BY id
+    """, (int(days),))
+    return [row[0] for row in cur.fetchall()]
+
+
+def list_partitions(cur):
+    cur.execute("""
+        SELECT parent.relname AS parent, child.relname AS partition,
+               pg_get_expr(child.relpartbound, child.oid) AS bound,
+               pg_total_relation_size(child.oid) AS size_bytes
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = ANY(%s)
+        ORDER BY parent.relname, child.relname
+    """, (list(BTS_TABLES),))
+    return cur.fetchall()
+
+
+def main(argv):
+    command = argv[1] if len(argv) > 1 else None
+    args = argv[2:]
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            if command == "convert":
+                for table in BTS_TABLES:
+                    print(f"{table}: {'dipartisi' if convert_table(cur, table) else 'sudah dipartisi'}")
+                conn.commit()
+                for table in BTS_TABLES:
+                    validate_legacy(cur, table)
+                    conn.commit()
+            elif command == "create":
+                for campaign_id in args:
+                    print(create_campaign_partitions(conn, int(campaign_id)))
+            elif command == "detach":
+                for campaign_id in args:
+                    print(detach_campaign_partitions(conn, int(campaign_id)))
+            elif command == "drop":
+                print(drop_campaign_partitions(conn, [int(x) for x in args]))
+            elif command == "retention" and args:
+                campaign_ids = expired_campaigns(cur, int(args[0]))
+                print(f"Campaign kedaluwarsa: {campaign_ids}")
+                print(drop_campaign_partitions(conn, campaign_ids))
+            elif command == "list":
+                for parent, partition, bound, size_bytes in list_partitions(cur):
+                    print(f"{parent:<10} {partition:<24} {bound:<24} {size_bytes / 1024 / 1024:.1f} MB")
+            else:
+                print("Penggunaan: python3 partitions.py convert | create|detach|drop <campaign_id ...> | retention <hari> | list")
+                return 1
+        conn.commit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,198 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+import psycopg2.extensions
+import psycopg2.extras
+from prometheus_client import Counter, Histogram
+import metrics
+
+# Timing per statement untuk data_queries.
+#
+# Cursor TimedCursor / TimedRealDictCursor mencatat setiap execute dengan nama logis:
+#   cursor.execute(sql, params, name="campaigns_data.page")
+# Tanpa name=, nama diambil dari fungsi pemanggil (mis. "devicegroup").
+# Yang dicatat: durasi, jumlah baris (rowcount) dan endpoint pemanggil (metrics.current_endpoint).
+#   - histogram Prometheus per nama statement (db_statement_duration_seconds)
+#   - agregat per (statement, endpoint) untuk GET /query-stats
+#   - statement >= SLOW_QUERY_MS dicetak sebagai query lambat; sebagian (SLOW_QUERY_EXPLAIN_RATE)
+#     disertai rencana EXPLAIN (tanpa ANALYZE, jadi statement tidak dijalankan ulang)
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 200))
+SLOW_QUERY_EXPLAIN_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_RATE", 0.1))
+# Panjang SQL yang dicetak di log query lambat
+SLOW_QUERY_SQL_CHARS = int(os.environ.get("SLOW_QUERY_SQL_CHARS", 500))
+SLOW_QUERY_HISTORY = int(os.environ.get("SLOW_QUERY_HISTORY", 100))
+
+STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds", "Durasi statement SQL per nama logis", ["statement"]
+)
+STATEMENT_ROWS = Counter(
+    "db_statement_rows_total", "Baris yang dikembalikan / diubah statement SQL", ["statement"]
+)
+SLOW_STATEMENTS = Counter(
+    "db_slow_statements_total", "Statement di atas SLOW_QUERY_MS", ["statement"]
+)
+
+# Statement yang aman di-EXPLAIN tanpa ANALYZE
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+# Modul yang dilewati saat mencari nama fungsi pemanggil
+_SKIP_MODULES = (__name__, "psycopg2.extras", "psycopg2._psycopg")
+
+
+class QueryStats:
+    """Agregat per (statement, endpoint) dan daftar query lambat terakhir."""
+
+    def __init__(self, history=SLOW_QUERY_HISTORY):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.slow = deque(maxlen=history)
+
+    def record(self, name, endpoint, duration, rows):
+        with self._lock:
+            entry = self._entries.get((name, endpoint))
+            if entry is None:
+                entry = self._entries[(name, endpoint)] = [0, 0.0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += duration
+            entry[2] = max(entry[2], duration)
+            entry[3] += max(rows, 0)
+
+    def record_slow(self, item):
+        with self._lock:
+            self.slow.append(item)
+
+    def snapshot(self, limit=50):
+        with self._lock:
+            entries = [
+                {
+                    "statement": name,
+                    "endpoint": endpoint,
+                    "calls": calls,
+                    "total_ms": total * 1000,
+                    "avg_ms": total / calls * 1000,
+                    "max_ms": max_duration * 1000,
+                    "rows": rows,
+                }
+                for (name, endpoint), (calls, total, max_duration, rows) in self._entries.items()
+            ]
+            slow = list(self.slow)
+        entries.sort(key=lambda e: e["total_ms"], reverse=True)
+        return {
+            "slow_query_ms": SLOW_QUERY_MS,
+            "explain_rate": SLOW_QUERY_EXPLAIN_RATE,
+            "statements": entries[:limit],
+            "slow": slow,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+            self.slow.clear()
+
+
+query_stats = QueryStats()
+
+
+def _caller_name():
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") in _SKIP_MODULES:
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else "unknown"
+
+
+def _sql_text(cursor, query):
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    if isinstance(query, str):
+        return query
+    # psycopg2.sql.Composed
+    return query.as_string(cursor.connection)
+
+
+def explain(cursor, query, vars):
+    """Rencana EXPLAIN untuk statement yang sama, di savepoint supaya error tidak merusak transaksi."""
+    text = _sql_text(cursor, query)
+    if not text.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    conn = cursor.connection
+    in_transaction = not conn.autocommit and conn.status == psycopg2.extensions.STATUS_IN_TRANSACTION
+    # Cursor biasa terpisah: hasil cursor asli tidak tertimpa dan EXPLAIN tidak ikut tercatat
+    with conn.cursor() as explain_cursor:
+        try:
+            if in_transaction:
+                explain_cursor.execute("SAVEPOINT query_log_explain")
+            explain_cursor.execute("EXPLAIN " + text, vars)
+            plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+            if in_transaction:
+                explain_cursor.execute("RELEASE SAVEPOINT query_log_explain")
+            return plan
+        except psycopg2.Error as e:
+            if in_transaction:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT query_log_explain")
+            return f"EXPLAIN gagal: {e}"
+
+
+def record(cursor, name, query, vars, duration, rows, failed=False):
+    endpoint = metrics.current_endpoint()
+    STATEMENT_DURATION.labels(name).observe(duration)
+    if rows > 0:
+        STATEMENT_ROWS.labels(name).inc(rows)
+    query_stats.record(name, endpoint, duration, rows)
+
+    duration_ms = duration * 1000
+    if duration_ms < SLOW_QUERY_MS:
+        return
+    SLOW_STATEMENTS.labels(name).inc()
+    plan = None
+    # Statement yang gagal tidak di-EXPLAIN: transaksinya sudah batal
+    if not failed and random.random() < SLOW_QUERY_EXPLAIN_RATE:
+        try:
+            plan = explain(cursor, query, vars)
+        except Exception as e:
+            plan = f"EXPLAIN gagal: {e}"
+    sql = " ".join(_sql_text(cursor, query).split())[:SLOW_QUERY_SQL_CHARS]
+    print(f"Query lambat {name} ({duration_ms:.0f} ms, {rows} baris, endpoint {endpoint}): {sql}")
+    if plan:
+        print(f"Rencana {name}:\n{plan}")
+    query_stats.record_slow({
+        "statement": name,
+        "endpoint": endpoint,
+        "duration_ms": duration_ms,
+        "rows": rows,
+        "sql": sql,
+        "plan": plan,
+        "at": time.time(),
+    })
+
+
+class TimedCursorMixin:
+    def execute(self, query, vars=None, name=None):
+        name = name or _caller_name()
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = super().execute(query, vars)
+            failed = False
+            return result
+        finally:
+            record(self, name, query, vars, time.perf_counter() - started, self.rowcount, failed)
+
+    def executemany(self, query, vars_list, name=None):
+        name = name or _caller_name()
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            # executemany tidak di-EXPLAIN (parameter per baris berbeda)
+            record(self, name, query, None, time.perf_counter() - started, self.rowcount, failed=True)
+
+
+class TimedCursor(TimedCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+
+class TimedRealDictCursor(TimedCursorMixin, psycopg2.extras.RealDictCursor):
+    pass
@@ -0,0 +1,256 @@
+import os
+from datetime import datetime, timedelta, timezone
+import psycopg2.extras
+from database_config import db_connection
+
+# Rollup sinyal per bucket waktu untuk grafik campaign.
+#
+# Baris pengukuran yang masuk diagregasi per pesan di Python lalu di-upsert secara aditif ke
+# signal_rollup_1m dan signal_rollup_1h, di transaksi yang sama dengan upsert gsm_data/lte_data
+# (wsReceivedata IngestWriter), per
+# (campaign, bucket, tech, operator, sel): jumlah sampel, min/max, serta sum+count untuk rata-rata.
+# Grafik membaca tabel rollup, tidak pernah memindai baris mentah; ukuran bucket tampilan
+# dipilih otomatis dari rentang waktu (lihat choose_bucket).
+# Tabel dibuat oleh migrasi v0006.
+
+SIGNAL_ROLLUPS_ENABLED = os.environ.get("SIGNAL_ROLLUPS", "1") == "1"
+SIGNAL_ROLLUP_1M_RETENTION_DAYS = int(os.environ.get("SIGNAL_ROLLUP_1M_RETENTION_DAYS", 14))
+SIGNAL_ROLLUP_1H_RETENTION_DAYS = int(os.environ.get("SIGNAL_ROLLUP_1H_RETENTION_DAYS", 365))
+# Jumlah titik maksimum per seri yang dikembalikan endpoint
+SIGNAL_SERIES_MAX_POINTS = int(os.environ.get("SIGNAL_SERIES_MAX_POINTS", 500))
+
+# Tabel rollup: (nama tabel, ukuran bucket detik, retensi hari)
+ROLLUP_TABLES = (
+    ("signal_rollup_1m", 60, SIGNAL_ROLLUP_1M_RETENTION_DAYS),
+    ("signal_rollup_1h", 3600, SIGNAL_ROLLUP_1H_RETENTION_DAYS),
+)
+# Ukuran bucket tampilan yang boleh dipilih (detik)
+BUCKET_STEPS = (60, 300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400)
+
+KEY_COLUMNS = ("campaign_id", "bucket", "tech", "operator", "mcc", "mnc", "area_code", "cell_identity")
+METRICS = ("signal_level", "snr", "rssi")
+# Posisi metrik di tuple baris observation_log
+METRIC_INDEXES = {"signal_level": 10, "snr": 11, "rssi": 12}
+# NULL di kolom kunci disimpan sebagai sentinel supaya ON CONFLICT bekerja
+NULL_NUMBER = -1
+NULL_OPERATOR = ""
+
+
+def _upsert_query(table):
+    columns = list(KEY_COLUMNS) + ["samples", "threat_samples"]
+    updates = [
+        f"samples = {table}.samples + EXCLUDED.samples",
+        f"threat_samples = {table}.threat_samples + EXCLUDED.threat_samples",
+    ]
+    for metric in METRICS:
+        columns += [f"{metric}_min", f"{metric}_max", f"{metric}_sum", f"{metric}_count"]
+        updates += [
+            f"{metric}_min = LEAST({table}.{metric}_min, EXCLUDED.{metric}_min)",
+            f"{metric}_max = GREATEST({table}.{metric}_max, EXCLUDED.{metric}_max)",
+            f"{metric}_sum = {table}.{metric}_sum + EXCLUDED.{metric}_sum",
+            f"{metric}_count = {table}.{metric}_count + EXCLUDED.{metric}_count",
+        ]
+    return f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT ({", ".join(KEY_COLUMNS)}) DO UPDATE SET
+            {", ".join(updates)}
+    """
+
+
+UPSERT_QUERIES = {table: _upsert_query(table) for table, _, _ in ROLLUP_TABLES}
+
+
+def _bucket(observed_at, size):
+    ts = observed_at.timestamp()
+    return datetime.fromtimestamp(ts - ts % size, tz=timezone.utc)
+
+
+def _null(value, sentinel=NULL_NUMBER):
+    return sentinel if value is None else value
+
+
+def aggregate(rows, size):
+    """Agregasi baris observation_log ke bucket berukuran size detik: {kunci: counter}."""
+    result = {}
+    for row in rows:
+        key = (
+            row[1], _bucket(row[0], size), row[3], _null(row[8], NULL_OPERATOR),
+            _null(row[4]), _null(row[5]), _null(row[6]), _null(row[7]),
+        )
+        agg = result.get(key)
+        if agg is None:
+            # samples, threat_samples, lalu [min, max, sum, count] per metrik
+            agg = result[key] = [0, 0] + [None, None, 0.0, 0] * len(METRICS)
+        agg[0] += 1
+        if row[13] is False:
+            agg[1] += 1
+        for i, metric in enumerate(METRICS):
+            value = row[METRIC_INDEXES[metric]]
+            if value is None:
+                continue
+            base = 2 + i * 4
+            agg[base] = value if agg[base] is None else min(agg[base], value)
+            agg[base + 1] = value if agg[base + 1] is None else max(agg[base + 1], value)
+            agg[base + 2] += value
+            agg[base + 3] += 1
+    return result
+
+
+def apply(cur, rows):
+    """Upsert rollup untuk satu batch baris (dipanggil di transaksi flush observation_log)."""
+    for table, size, _ in ROLLUP_TABLES:
+        aggregated = aggregate(rows, size)
+        if not aggregated:
+            continue
+        # Urutan kunci tetap supaya dua transaksi tidak saling deadlock
+        values = [key + tuple(agg) for key, agg in sorted(aggregated.items(), key=lambda item: item[0])]
+        psycopg2.extras.execute_values(cur, UPSERT_QUERIES[table], values, page_size=1000)
+
+
+def expire(cur, now=None):
+    now = now or datetime.now(timezone.utc)
+    deleted = {}
+    for table, _, retention_days in ROLLUP_TABLES:
+        cur.execute(f"DELETE FROM {table} WHERE bucket < %s", (now - timedelta(days=retention_days),))
+        deleted[table] = cur.rowcount
+    return deleted
+
+
+def choose_bucket(start, end, now=None, max_points=SIGNAL_SERIES_MAX_POINTS):
+    """Pilih (tabel sumber, ukuran bucket detik) untuk rentang waktu, maksimal max_points titik."""
+    now = now or datetime.now(timezone.utc)
+    span = max((end - start).total_seconds(), 1)
+    step = next((s for s in BUCKET_STEPS if span / s <= max_points), BUCKET_STEPS[-1])
+    table_1m, size_1m, retention_1m = ROLLUP_TABLES[0]
+    table_1h, size_1h, _ = ROLLUP_TABLES[1]
+    # Rollup 1 menit hanya dipakai untuk bucket < 1 jam dan selama datanya belum kedaluwarsa
+    if step < size_1h and start >= now - timedelta(days=retention_1m):
+        return table_1m, max(step, size_1m)
+    return table_1h, max(step, size_1h)
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    # Waktu tanpa zona dianggap UTC, sama dengan kolom time_start/time_stop campaign
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _resolve_range(cursor, campaign_id, start, end):
+    cursor.execute("SELECT time_start, time_stop FROM campaign WHERE id = %s", (campaign_id,))
+    campaign = cursor.fetchone()
+    if not campaign:
+        return None
+    now = datetime.now(timezone.utc)
+    end = _as_utc(end) or _as_utc(campaign["time_stop"]) or now
+    start = _as_utc(start) or _as_utc(campaign["time_start"]) or end - timedelta(days=1)
+    return start, end
+
+
+def _filters(tech=None, operator=None, mcc=None, mnc=None, area_code=None, cell_identity=None):
+    clauses = []
+    params = {}
+    for column, value in (("tech", tech), ("operator", operator), ("mcc", mcc), ("mnc", mnc),
+                          ("area_code", area_code), ("cell_identity", cell_identity)):
+        if value is not None:
+            clauses.append(f" AND {column} = %({column})s")
+            params[column] = value
+    return "".join(clauses), params
+
+
+def _restore_nulls(row):
+    for column in ("mcc", "mnc", "area_code", "cell_identity"):
+        if column in row and row[column] == NULL_NUMBER:
+            row[column] = None
+    if "operator" in row and row["operator"] == NULL_OPERATOR:
+        row["operator"] = None
+    return row
+
+
+def get_signal_series(campaign_id: int, start=None, end=None, **filters):
+    """Seri min/max/avg signal_level, snr, rssi per sel per bucket."""
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            time_range = _resolve_range(cursor, campaign_id, start, end)
+            if time_range is None:
+                return None
+            start, end = time_range
+            table, step = choose_bucket(start, end)
+            where, params = _filters(**filters)
+            metric_columns = ",\n".join(
+                f"MIN({m}_min) AS {m}_min, MAX({m}_max) AS {m}_max, "
+                f"SUM({m}_sum) / NULLIF(SUM({m}_count), 0) AS {m}_avg"
+                for m in METRICS
+            )
+            cursor.execute(f"""
+                SELECT to_timestamp(floor(extract(epoch FROM bucket) / %(step)s) * %(step)s) AS bucket,
+                       tech, operator, mcc, mnc, area_code, cell_identity,
+                       SUM(samples) AS samples, SUM(threat_samples) AS threat_samples,
+                       {metric_columns}
+                FROM {table}
+                WHERE campaign_id = %(campaign_id)s
+                  AND bucket >= %(start)s AND bucket < %(end)s
+                  {where}
+                GROUP BY 1, tech, operator, mcc, mnc, area_code, cell_identity
+                ORDER BY tech, operator, mcc, mnc, area_code, cell_identity, 1
+            """, {"campaign_id": campaign_id, "start": start, "end": end, "step": step, **params})
+            series = [_restore_nulls(row) for row in cursor.fetchall()]
+            cursor.close()
+
+        return {
+            "status": "success",
+            "campaign_id": campaign_id,
+            "start": start,
+            "end": end,
+            "bucket_seconds": step,
+            "source": table,
+            "series": series,
+        }
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+
+def get_operator_cell_counts(campaign_id: int, start=None, end=None, tech=None):
+    """Jumlah sel berbeda dan sampel per operator per bucket."""
+    try:
+        with db_connection() as connection:
+            cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            time_range = _resolve_range(cursor, campaign_id, start, end)
+            if time_range is None:
+                return None
+            start, end = time_range
+            table, step = choose_bucket(start, end)
+            where, params = _filters(tech=tech)
+            cursor.execute(f"""
+                SELECT to_timestamp(floor(extract(epoch FROM bucket) / %(step)s) * %(step)s) AS bucket,
+                       tech, operator,
+                       COUNT(DISTINCT (mcc, mnc, area_code, cell_identity)) AS cells,
+                       SUM(samples) AS samples,
+                       SUM(threat_samples) AS threat_samples
+                FROM {table}
+                WHERE campaign_id = %(campaign_id)s
+                  AND bucket >= %(start)s AND bucket < %(end)s
+                  {where}
+                GROUP BY 1, tech, operator
+                ORDER BY 1, tech, operator
+            """, {"campaign_id": campaign_id, "start": start, "end": end, "step": step, **params})
+            buckets = [_restore_nulls(row) for row in cursor.fetchall()]
+            cursor.close()
+
+        return {
+            "status": "success",
+            "campaign_id": campaign_id,
+            "start": start,
+            "end": end,
+            "bucket_seconds": step,
+            "source": table,
+            "buckets": buckets,
+        }
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
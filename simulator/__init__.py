@@ -0,0 +1,8 @@
+"""Simulator device capture: API kontrol (:8003) dan stream /ws untuk uji beban tanpa hardware.
+
+    python3 -m simulator --devices 200 --rate 2 --gsm 30 --lte 20 --register
+"""
+from simulator.device import FaultConfig, VirtualDevice
+from simulator.server import Simulator, register_devices, unregister_devices
+
+__all__ = ["FaultConfig", "Simulator", "VirtualDevice", "register_devices", "unregister_devices"]
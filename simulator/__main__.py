@@ -0,0 +1,65 @@
+import argparse
+import asyncio
+import json
+import sys
+from simulator.server import DEFAULT_BASE_IP, DEFAULT_PORT, Simulator, register_devices
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Jalankan device capture virtual")
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--base-ip", default=DEFAULT_BASE_IP)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--port-mode", action="store_true",
+                        help="semua device di 127.0.0.1 dengan port berurutan mulai --port")
+    parser.add_argument("--rate", type=float, default=1.0, help="pesan scan per detik per client /ws")
+    parser.add_argument("--gsm", type=int, default=20, help="entri gsm_data per pesan")
+    parser.add_argument("--lte", type=int, default=20, help="entri lte_data per pesan")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0)
+    parser.add_argument("--empty-mcc-rate", type=float, default=0.0)
+    parser.add_argument("--always-stream", action="store_true", help="kirim pesan tanpa menunggu start-capture")
+    parser.add_argument("--serial-prefix", default="SIM")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-delay", type=float, default=2.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=30.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--register", action="store_true", help="daftarkan device ke tabel devices")
+    parser.add_argument("--group-id", type=int)
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    return parser.parse_args(argv)
+
+
+async def run(args):
+    simulator = Simulator(
+        count=args.devices, base_ip=args.base_ip, port=args.port, port_mode=args.port_mode,
+        rate=args.rate, gsm=args.gsm, lte=args.lte, duplicate_rate=args.duplicate_rate,
+        empty_mcc_rate=args.empty_mcc_rate, always_stream=args.always_stream,
+        serial_prefix=args.serial_prefix, seed=args.seed,
+        faults={
+            "slow_rate": args.slow_rate, "slow_delay": args.slow_delay,
+            "drop_rate": args.drop_rate, "hang_seconds": args.hang_seconds,
+            "malformed_rate": args.malformed_rate, "error_rate": args.error_rate,
+        },
+    )
+    if args.register:
+        ids = await asyncio.to_thread(register_devices, simulator, args.group_id)
+        print(f"{len(ids)} device didaftarkan ke tabel devices")
+    async with simulator:
+        while True:
+            await asyncio.sleep(args.stats_interval)
+            print(f"Statistik simulator: {json.dumps(simulator.stats())}")
+
+
+def main(argv=None):
+    try:
+        asyncio.run(run(parse_args(argv)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from fastapi import FastAPI, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+
+
+# Satu aplikasi melayani semua device virtual; device dipilih dari alamat lokal socket
+# yang menerima koneksi (scope["server"]), jadi 127.0.1.1:8003 dan 127.0.1.2:8003 adalah
+# dua device berbeda walau dilayani proses yang sama.
+
+
+def create_app(simulator):
+    app = FastAPI(title="Device simulator")
+
+    def current_device(scope):
+        server = scope.get("server")
+        return simulator.device_at(*server) if server else None
+
+    def require_device(request: Request):
+        device = current_device(request.scope)
+        if device is None:
+            raise HTTPException(status_code=404, detail="Unknown device address")
+        return device
+
+    async def inject_api_faults(device):
+        faults = device.faults
+        if faults.roll(faults.drop_rate):
+            # Tidak menjawab sampai client menyerah (timeout di sisi API)
+            device.api_faults += 1
+            await asyncio.sleep(faults.hang_seconds)
+        if faults.roll(faults.slow_rate):
+            device.api_faults += 1
+            await asyncio.sleep(faults.slow_delay)
+        if faults.roll(faults.error_rate):
+            device.api_faults += 1
+            raise HTTPException(status_code=500, detail="Simulated device error")
+
+    @app.post("/start-capture")
+    async def start_capture(request: Request, campaign_name: str = Form(...), campaign_id: int = Form(...)):
+        device = require_device(request)
+        await inject_api_faults(device)
+        return device.start_capture(campaign_id, campaign_name)
+
+    @app.get("/stop-capture/{campaign_id}")
+    async def stop_capture(request: Request, campaign_id: int):
+        device = require_device(request)
+        await inject_api_faults(device)
+        return device.stop_capture(campaign_id)
+
+    @app.get("/sim/status")
+    async def device_status(request: Request):
+        return require_device(request).status()
+
+    @app.websocket("/ws")
+    async def stream(websocket: WebSocket):
+        device = current_device(websocket.scope)
+        if device is None:
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        device.clients += 1
+        next_at = time.monotonic()
+        try:
+            while True:
+                if device.streaming:
+                    if device.faults.roll(device.faults.drop_rate):
+                        device.ws_drops += 1
+                        await websocket.close(code=1011)
+                        return
+                    await websocket.send_text(device.next_message())
+                # Jadwal tetap supaya laju tidak bergeser oleh waktu kirim
+                next_at += 1 / device.rate if device.rate > 0 else 1
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            # Client menutup koneksi di tengah send (jenis error tergantung implementasi ws uvicorn)
+            print(f"Stream {device.ws_url} berhenti: {e}")
+        finally:
+            device.clients -= 1
+
+    return app
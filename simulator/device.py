@@ -0,0 +1,133 @@
+import json
+import random
+import time
+from benchmarks.messages import MessageFactory
+
+
+class FaultConfig:
+    """Peluang gangguan yang disuntikkan ke API kontrol dan stream /ws (0.0 - 1.0)."""
+
+    def __init__(self, slow_rate=0.0, slow_delay=2.0, drop_rate=0.0, hang_seconds=30.0,
+                 malformed_rate=0.0, error_rate=0.0, seed=None):
+        # slow: respons API ditunda slow_delay detik
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        # drop: request API tidak dijawab selama hang_seconds (client timeout),
+        # koneksi /ws ditutup di tengah stream
+        self.drop_rate = drop_rate
+        self.hang_seconds = hang_seconds
+        # malformed: pesan /ws bukan JSON yang valid
+        self.malformed_rate = malformed_rate
+        # error: API menjawab HTTP 500
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+    def roll(self, rate):
+        return rate > 0 and self.random.random() < rate
+
+    def update(self, **values):
+        for key, value in values.items():
+            if not hasattr(self, key) or key == "random":
+                raise ValueError(f"Fault tidak dikenal: {key}")
+            setattr(self, key, value)
+
+    def as_dict(self):
+        return {
+            "slow_rate": self.slow_rate,
+            "slow_delay": self.slow_delay,
+            "drop_rate": self.drop_rate,
+            "hang_seconds": self.hang_seconds,
+            "malformed_rate": self.malformed_rate,
+            "error_rate": self.error_rate,
+        }
+
+
+class VirtualDevice:
+    """Satu device capture virtual: status capture, pembuat pesan scan, dan counter."""
+
+    def __init__(self, index, ip, port, factory: MessageFactory, rate=1.0, faults=None,
+                 always_stream=False):
+        self.index = index
+        self.ip = ip
+        self.port = port
+        self.factory = factory
+        # Pesan scan per detik untuk setiap client /ws
+        self.rate = rate
+        self.faults = faults or FaultConfig()
+        # Kirim pesan walau belum ada start-capture (berguna untuk benchmark ingest saja)
+        self.always_stream = always_stream
+        self.campaign_id = None
+        self.campaign_name = None
+        self.capturing = False
+        self.clients = 0
+        self.messages_sent = 0
+        self.malformed_sent = 0
+        self.ws_drops = 0
+        self.start_requests = 0
+        self.stop_requests = 0
+        self.api_faults = 0
+        self.started_at = None
+
+    @property
+    def serial_number(self):
+        return self.factory.serial_number(self.index)
+
+    @property
+    def url(self):
+        return f"http://{self.ip}:{self.port}"
+
+    @property
+    def ws_url(self):
+        return f"ws://{self.ip}:{self.port}/ws"
+
+    def start_capture(self, campaign_id, campaign_name):
+        self.start_requests += 1
+        self.campaign_id = int(campaign_id)
+        self.campaign_name = campaign_name
+        self.capturing = True
+        self.started_at = time.time()
+        return {"status": "success", "message": f"Capture started for campaign {campaign_id}",
+                "serial_number": self.serial_number}
+
+    def stop_capture(self, campaign_id):
+        self.stop_requests += 1
+        if not self.capturing or self.campaign_id != int(campaign_id):
+            return {"status": "error", "message": f"Campaign {campaign_id} is not running on this device"}
+        self.capturing = False
+        return {"status": "success", "message": f"Capture stopped for campaign {campaign_id}",
+                "serial_number": self.serial_number}
+
+    @property
+    def streaming(self):
+        return self.capturing or self.always_stream
+
+    def next_message(self):
+        """Pesan scan berikutnya (JSON), atau potongan JSON rusak jika fault malformed terpilih."""
+        message = self.factory.message(self.index)
+        message["device"]["ip"] = self.ip
+        if self.campaign_id is not None:
+            message["campaign"] = {"id": self.campaign_id, "name": self.campaign_name}
+        encoded = json.dumps(message)
+        self.messages_sent += 1
+        if self.faults.roll(self.faults.malformed_rate):
+            self.malformed_sent += 1
+            return encoded[: len(encoded) // 2]
+        return encoded
+
+    def status(self):
+        return {
+            "index": self.index,
+            "serial_number": self.serial_number,
+            "ip": self.ip,
+            "port": self.port,
+            "capturing": self.capturing,
+            "campaign_id": self.campaign_id,
+            "clients": self.clients,
+            "messages_sent": self.messages_sent,
+            "malformed_sent": self.malformed_sent,
+            "ws_drops": self.ws_drops,
+            "start_requests": self.start_requests,
+            "stop_requests": self.stop_requests,
+            "api_faults": self.api_faults,
+            "faults": self.faults.as_dict(),
+        }
@@ -0,0 +1,160 @@
+import asyncio
+import ipaddress
+import socket
+import uvicorn
+from benchmarks.messages import MessageFactory
+from simulator.app import create_app
+from simulator.device import FaultConfig, VirtualDevice
+
+# Port API kontrol dan /ws device asli (lihat DEVICE_API_PORT / DEVICE_WS_PORT)
+DEFAULT_PORT = 8003
+# Alamat loopback device pertama; device berikutnya memakai alamat sesudahnya.
+# Di Linux seluruh 127.0.0.0/8 bisa langsung di-bind; di macOS alias perlu dibuat dulu
+# (sudo ifconfig lo0 alias 127.0.1.2 up, dst.)
+DEFAULT_BASE_IP = "127.0.1.1"
+
+
+class Simulator:
+    """Sekumpulan device virtual dalam satu server uvicorn.
+
+    Mode loopback (default): device ke-i di <base_ip + i>:8003, sama seperti device asli,
+    sehingga API (device_client) dan ingest (DeviceSupervisor) bisa dipakai tanpa perubahan
+    setelah device didaftarkan ke tabel devices (register_devices).
+    Mode port (port_mode=True): semua device di 127.0.0.1 dengan port berurutan mulai dari port,
+    untuk skrip yang memakai device.url / device.ws_url langsung.
+
+        async with Simulator(count=200, rate=2, gsm=30, lte=20) as sim:
+            sim.set_faults(malformed_rate=0.01)
+            ...
+    """
+
+    def __init__(self, count=10, base_ip=DEFAULT_BASE_IP, port=DEFAULT_PORT, port_mode=False,
+                 rate=1.0, gsm=20, lte=20, duplicate_rate=0.0, empty_mcc_rate=0.0,
+                 faults=None, always_stream=False, serial_prefix="SIM", seed=1):
+        self.port_mode = port_mode
+        faults = faults or {}
+        self.devices = []
+        self._by_address = {}
+        first_ip = ipaddress.ip_address(base_ip)
+        for index in range(count):
+            ip = "127.0.0.1" if port_mode else str(first_ip + index)
+            device_port = port + index if port_mode else port
+            factory = MessageFactory(
+                devices=count, gsm_cells=gsm, lte_cells=lte, duplicate_rate=duplicate_rate,
+                empty_mcc_rate=empty_mcc_rate, seed=seed + index, serial_prefix=serial_prefix,
+            )
+            device = VirtualDevice(
+                index, ip, device_port, factory, rate=rate,
+                faults=FaultConfig(seed=seed + index, **faults), always_stream=always_stream,
+            )
+            self.devices.append(device)
+            self._by_address[(ip, device_port)] = device
+        self.server = None
+        self.task = None
+
+    def device_at(self, host, port):
+        return self._by_address.get((host, port))
+
+    def _bind(self):
+        sockets = []
+        try:
+            for ip, port in self._by_address:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                sock.bind((ip, port))
+                sock.listen(128)
+                sock.setblocking(False)
+                sockets.append(sock)
+        except OSError:
+            for sock in sockets:
+                sock.close()
+            raise
+        return sockets
+
+    async def start(self):
+        config = uvicorn.Config(create_app(self), log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.task = asyncio.create_task(self.server.serve(sockets=self._bind()))
+        while not self.server.started:
+            if self.task.done():
+                # Gagal start (mis. alamat sudah dipakai): tampilkan errornya
+                await self.task
+                raise RuntimeError("Simulator berhenti saat start")
+            await asyncio.sleep(0.05)
+        print(f"Simulator: {len(self.devices)} device aktif "
+              f"({self.devices[0].url} .. {self.devices[-1].url})")
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.should_exit = True
+            await self.task
+            self.server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def set_faults(self, indexes=None, **values):
+        """Ubah fault saat berjalan, untuk semua device atau device tertentu (indeks)."""
+        targets = self.devices if indexes is None else [self.devices[i] for i in indexes]
+        for device in targets:
+            device.faults.update(**values)
+
+    def set_rate(self, rate, indexes=None):
+        targets = self.devices if indexes is None else [self.devices[i] for i in indexes]
+        for device in targets:
+            device.rate = rate
+
+    def stats(self):
+        statuses = [device.status() for device in self.devices]
+        return {
+            "devices": len(statuses),
+            "capturing": sum(1 for s in statuses if s["capturing"]),
+            "clients": sum(s["clients"] for s in statuses),
+            "messages_sent": sum(s["messages_sent"] for s in statuses),
+            "malformed_sent": sum(s["malformed_sent"] for s in statuses),
+            "ws_drops": sum(s["ws_drops"] for s in statuses),
+            "start_requests": sum(s["start_requests"] for s in statuses),
+            "stop_requests": sum(s["stop_requests"] for s in statuses),
+            "api_faults": sum(s["api_faults"] for s in statuses),
+        }
+
+
+def register_devices(simulator, group_id=None):
+    """Daftarkan device virtual ke tabel devices (serial_number unik), mengembalikan id-nya."""
+    from database_config import db_connection
+
+    ids = []
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            for device in simulator.devices:
+                cur.execute("""
+                    INSERT INTO devices (serial_number, ip, is_connected, group_id, created_at)
+                    VALUES (%s, %s, TRUE, %s, CURRENT_TIMESTAMP)
+                    ON CONFLICT (serial_number) DO UPDATE SET
+                        ip = EXCLUDED.ip,
+                        is_connected = TRUE,
+                        group_id = COALESCE(EXCLUDED.group_id, devices.group_id)
+                    RETURNING id
+                """, (device.serial_number, device.ip, group_id))
+                ids.append(cur.fetchone()[0])
+        conn.commit()
+    return ids
+
+
+def unregister_devices(simulator):
+    # Data gsm/lte device ini harus sudah terhapus (hapus campaign uji lebih dulu)
+    from database_config import db_connection
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM devices WHERE serial_number = ANY(%s)",
+                ([device.serial_number for device in simulator.devices],)
+            )
+            deleted = cur.rowcount
+        conn.commit()
+    return deleted
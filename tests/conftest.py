@@ -0,0 +1,9 @@
+import os
+import sys
+from cryptography.fernet import Fernet
+
+# Modul aplikasi ada di root repo (tanpa package)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# auth.py membaca KEY saat import; test tidak pernah membuka koneksi database
+os.environ.setdefault("KEY", Fernet.generate_key().decode())
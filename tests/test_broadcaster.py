@@ -0,0 +1,47 @@
+from broadcaster import CampaignFeed
+
+
+def snapshot(gsm=(), lte=(), devices=(), status="active", total=0):
+    return {
+        "campaign": {"id": 1, "status": status},
+        "gsm_data": [dict(row) for row in gsm],
+        "lte_data": [dict(row) for row in lte],
+        "devices": [dict(row) for row in devices],
+        "total_count": total,
+    }
+
+
+def test_first_snapshot_sets_seq_without_delta():
+    feed = CampaignFeed(1)
+    assert feed.apply(snapshot(gsm=[{"id": 1, "rssi": -70}], total=1)) is None
+    assert feed.seq == 1
+    frame = feed.snapshot_frame()
+    assert frame["message"] == "snapshot"
+    assert frame["seq"] == 1
+    assert frame["data"]["total_count"] == 1
+
+
+def test_unchanged_snapshot_keeps_seq():
+    feed = CampaignFeed(1)
+    feed.apply(snapshot(gsm=[{"id": 1, "rssi": -70}]))
+    assert feed.apply(snapshot(gsm=[{"id": 1, "rssi": -70}])) is None
+    assert feed.seq == 1
+
+
+def test_delta_chains_base_seq_to_previous_seq():
+    feed = CampaignFeed(1)
+    feed.apply(snapshot(gsm=[{"id": 1, "rssi": -70}, {"id": 2, "rssi": -80}], total=2))
+
+    delta = feed.apply(snapshot(gsm=[{"id": 1, "rssi": -65}], lte=[{"id": 9}], total=2))
+    assert (delta["base_seq"], delta["seq"]) == (1, 2)
+    assert delta["gsm_data"] == {"upserted": [{"id": 1, "rssi": -65}], "removed": [2]}
+    assert delta["lte_data"] == {"upserted": [{"id": 9}], "removed": []}
+    assert "devices" not in delta
+    # Campaign tidak berubah, tidak dikirim ulang
+    assert "campaign" not in delta
+    assert delta["total_count"] == 2
+
+    delta = feed.apply(snapshot(gsm=[{"id": 1, "rssi": -65}], lte=[{"id": 9}], status="stopped", total=2))
+    assert (delta["base_seq"], delta["seq"]) == (2, 3)
+    assert delta["campaign"]["status"] == "stopped"
+    assert "gsm_data" not in delta
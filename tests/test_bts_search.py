@@ -0,0 +1,52 @@
+import pytest
+import bts_search
+
+
+def test_mcc_mnc_pair_is_exact_only():
+    mode, groups, params = bts_search.build_filters(" 510-01 ")
+    assert mode == bts_search.MODE_MCC_MNC
+    assert len(groups) == 1
+    assert params == {"search_mcc": "510", "search_mnc": "1"}
+
+
+@pytest.mark.parametrize("query", ["510", "10", "0023"])
+def test_number_ranks_exact_hits_before_substring(query):
+    mode, groups, params = bts_search.build_filters(query)
+    assert mode == bts_search.MODE_EXACT
+    exact, rest = groups
+    assert params["search_number"] == str(int(query))
+    assert params["search_pattern"] == f"%{query}%"
+    for tech, columns in bts_search.EXACT_COLUMNS.items():
+        assert "mcc" in columns and "mnc" in columns
+        for column in columns:
+            assert f"{column} = %(search_number)s" in exact[tech]
+        # Substring tetap dicari; hit exact tidak diulang, NULL tidak menyingkirkan baris
+        assert rest[tech].startswith(f"{bts_search.SEARCH_KEY_SQL[tech]} LIKE %(search_pattern)s")
+        assert f"NOT COALESCE({exact[tech]}, FALSE)" in rest[tech]
+
+
+def test_number_above_int_range_is_text_search():
+    mode, groups, params = bts_search.build_filters(str(bts_search.MAX_INT + 1))
+    assert mode == bts_search.MODE_TEXT
+    assert "search_number" not in params
+
+
+def test_text_escapes_like_wildcards():
+    mode, groups, params = bts_search.build_filters("Tel_kom%")
+    assert mode == bts_search.MODE_TEXT
+    assert params == {"search_pattern": "%tel\\_kom\\%%"}
+
+
+def test_combined_ors_every_group():
+    _, groups, _ = bts_search.build_filters("510")
+    where = bts_search.combined(groups)
+    assert where["gsm"] == f"({groups[0]['gsm']}) OR ({groups[1]['gsm']})"
+
+
+def test_text_search_uses_indexed_expression():
+    mode, groups, _ = bts_search.build_filters("telkomsel")
+    assert mode == bts_search.MODE_TEXT
+    for tech, condition in groups[0].items():
+        assert condition == f"{bts_search.SEARCH_KEY_SQL[tech]} LIKE %(search_pattern)s"
+        # Satu baris: planner mencocokkan ekspresi index, bukan kolom search_key
+        assert "\n" not in condition and "search_key" not in condition
@@ -0,0 +1,97 @@
+import threading
+import psycopg2.extensions
+import pytest
+import database_config
+from database_config import ConnectionPool
+
+
+class FakeInfo:
+    def __init__(self):
+        self.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = FakeInfo()
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(**params):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(database_config.psycopg2, "connect", connect)
+    return opened
+
+
+def test_second_checkout_reuses_connection(connections):
+    pool = ConnectionPool(minconn=1, maxconn=5)
+    first = pool.getconn()
+    pool.putconn(first)
+    second = pool.getconn()
+    pool.putconn(second)
+    assert second is first
+    assert len(connections) == 1
+
+
+def test_idle_connections_kept_above_minconn(connections):
+    pool = ConnectionPool(minconn=1, maxconn=4)
+    held = [pool.getconn() for _ in range(4)]
+    for conn in held:
+        pool.putconn(conn)
+    # Semua dikembalikan ke idle, tidak ada yang ditutup
+    assert not any(conn.closed for conn in held)
+    assert pool.stats()["idle"] == 4
+
+    again = [pool.getconn() for _ in range(4)]
+    assert {id(conn) for conn in again} == {id(conn) for conn in held}
+    assert len(connections) == 4
+
+
+def test_open_transaction_rolled_back_on_return(connections):
+    pool = ConnectionPool(minconn=1, maxconn=2)
+    conn = pool.getconn()
+    conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+    assert pool.getconn() is conn
+
+
+def test_closed_connection_replaced(connections):
+    pool = ConnectionPool(minconn=1, maxconn=2)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    conn.closed = 1
+    replacement = pool.getconn()
+    assert replacement is not conn
+    assert pool.stats()["discarded"] == 1
+
+
+def test_checkout_times_out_when_exhausted(connections):
+    pool = ConnectionPool(minconn=1, maxconn=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(psycopg2.OperationalError):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+
+    # Slot yang dikembalikan langsung bisa dipakai thread lain
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    pool.timeout = 5
+    waiter.start()
+    pool.putconn(conn)
+    waiter.join(5)
+    assert got == [conn]
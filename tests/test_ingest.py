@@ -0,0 +1,88 @@
+import random
+import psycopg2.errors
+import pytest
+import wsReceivedata
+from wsReceivedata import IngestWriter, backoff_delay, dedupe_rows
+
+
+def test_dedupe_keeps_last_row_per_key_in_first_seen_order():
+    rows = [
+        ("510", "10", 1, "a"),
+        ("510", "10", 2, "b"),
+        ("510", "10", 1, "c"),
+    ]
+    assert dedupe_rows(rows, (0, 1, 2)) == [("510", "10", 1, "c"), ("510", "10", 2, "b")]
+
+
+def test_dedupe_never_merges_rows_with_null_key():
+    rows = [(None, "10", 1, "a"), (None, "10", 1, "b")]
+    assert dedupe_rows(rows, (0, 1, 2)) == rows
+
+
+@pytest.mark.parametrize("attempt", range(10))
+def test_backoff_stays_within_equal_jitter_bounds(attempt):
+    random.seed(attempt)
+    delay = min(60, 1 * 2 ** attempt)
+    for _ in range(50):
+        value = backoff_delay(attempt, base=1, cap=60)
+        assert delay / 2 <= value <= delay
+
+
+def test_backoff_is_capped():
+    assert all(backoff_delay(30, base=1, cap=60) <= 60 for _ in range(50))
+    assert all(backoff_delay(30, base=1, cap=60) >= 30 for _ in range(50))
+
+
+class RecordingCache:
+    def __init__(self):
+        self.invalidated = []
+
+    def invalidate(self, serial):
+        self.invalidated.append(serial)
+
+
+def writer_failing_with(monkeypatch, error, campaign_exists):
+    writer = IngestWriter(cache=RecordingCache())
+    calls = []
+
+    def write_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise error()
+
+    monkeypatch.setattr(writer, "_write_once", write_once)
+    monkeypatch.setattr(writer, "_campaign_exists", lambda campaign_id: campaign_exists)
+    return writer, calls
+
+
+@pytest.mark.parametrize("error", [psycopg2.errors.ForeignKeyViolation, psycopg2.errors.CheckViolation])
+def test_unknown_campaign_is_dropped_without_retry(monkeypatch, error):
+    writer, calls = writer_failing_with(monkeypatch, error, campaign_exists=False)
+    assert writer.write(99, {"serial_number": "SN1"}, [{}], []) is False
+    assert len(calls) == 1
+    assert writer.cache.invalidated == []
+    assert writer.missing_campaigns == {99}
+
+
+def test_stale_device_is_resolved_again(monkeypatch):
+    writer, calls = writer_failing_with(monkeypatch, psycopg2.errors.ForeignKeyViolation, campaign_exists=True)
+    assert writer.write(1, {"serial_number": "SN1"}, [{}], []) is True
+    assert len(calls) == 2
+    assert writer.cache.invalidated == ["SN1"]
+
+
+def test_upsert_counts_rows_of_every_page(monkeypatch):
+    pages = []
+
+    class Cursor:
+        rowcount = -1
+
+    def execute_values(cur, query, page, template=None, page_size=None):
+        pages.append(len(page))
+        cur.rowcount = len(page)
+
+    monkeypatch.setattr(wsReceivedata, "UPSERT_PAGE_SIZE", 2)
+    monkeypatch.setattr(wsReceivedata.psycopg2.extras, "execute_values", execute_values)
+    assert wsReceivedata.upsert_gsm_rows(Cursor(), [()] * 5) == 5
+    assert pages == [2, 2, 1]
+    assert wsReceivedata.upsert_lte_rows(Cursor(), []) == 0
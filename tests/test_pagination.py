@@ -0,0 +1,164 @@
+import re
+import pytest
+from fastapi import HTTPException
+import bts_search
+from data_queries import decode_page_cursor, encode_page_cursor, fetch_unified_page, unified_segments
+
+BRANCH_PATTERN = re.compile(r"SELECT (\d+) AS type_rank, id FROM (\w+) WHERE (.*)")
+
+
+class FakeCursor:
+    """Menjalankan query fetch_unified_page terhadap data in-memory {tabel: [id, ...]}.
+
+    Kondisi filter tambahan diabaikan kecuali dipetakan lewat matches[(tabel, kondisi)] -> set id.
+    """
+
+    def __init__(self, tables, matches=None):
+        self.tables = tables
+        self.matches = matches or {}
+        self.statements = []
+        self._result = []
+
+    def execute(self, query, vars=None, name=None):
+        self.statements.append((name, query, vars))
+        if name == "unified_page.keys":
+            self._result = self._keys(query, vars)
+        else:
+            table = re.search(r"FROM (\w+)", query).group(1)
+            campaign_id, ids = vars
+            assert campaign_id == 7
+            self._result = [{"id": i, "table": table} for i in ids if i in self.tables[table]]
+
+    def _keys(self, query, params):
+        descending = "DESC" in query
+        keys = []
+        for line in query.split("\n"):
+            match = BRANCH_PATTERN.match(line)
+            if not match:
+                continue
+            rank, table, condition = int(match.group(1)), match.group(2), match.group(3)
+            for row_id in self.tables[table]:
+                if "id > %(anchor_id)s" in condition and not row_id > params["anchor_id"]:
+                    continue
+                if "id < %(anchor_id)s" in condition and not row_id < params["anchor_id"]:
+                    continue
+                extra = re.search(r"AND \((.*)\)", condition.replace(" AND id > %(anchor_id)s", "").replace(" AND id < %(anchor_id)s", ""))
+                if extra and row_id not in self.matches.get((table, extra.group(1)), set()):
+                    continue
+                keys.append((rank, row_id))
+        keys.sort(reverse=descending)
+        offset = params["offset"] if "OFFSET" in query else 0
+        return [{"type_rank": r, "id": i} for r, i in keys[offset:offset + params["limit"]]]
+
+    def fetchall(self):
+        return self._result
+
+
+def page_ids(gsm_rows, lte_rows):
+    return [("gsm", row["id"]) for row in gsm_rows] + [("lte", row["id"]) for row in lte_rows]
+
+
+def walk(cursor, limit, **kwargs):
+    pages = []
+    gsm, lte, next_cursor, prev_cursor = fetch_unified_page(cursor, 7, 1, limit, **kwargs)
+    pages.append((page_ids(gsm, lte), next_cursor, prev_cursor))
+    while next_cursor:
+        gsm, lte, next_cursor, prev_cursor = fetch_unified_page(
+            cursor, 7, 1, limit, decode_page_cursor(next_cursor), **kwargs
+        )
+        pages.append((page_ids(gsm, lte), next_cursor, prev_cursor))
+    return pages
+
+
+def test_cursor_round_trip():
+    token = encode_page_cursor(1, 42, "prev")
+    assert "=" not in token
+    assert decode_page_cursor(token) == (1, 42, "prev")
+
+
+@pytest.mark.parametrize("token", ["not-base64!", "e30", encode_page_cursor(0, 1, "sideways")])
+def test_invalid_cursor_rejected(token):
+    with pytest.raises(HTTPException) as exc:
+        decode_page_cursor(token)
+    assert exc.value.status_code == 400
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_page_cursor(None) is None
+    assert decode_page_cursor("") is None
+
+
+def test_next_pages_cover_gsm_then_lte_once():
+    cursor = FakeCursor({"gsm_data": [1, 2, 3], "lte_data": [10, 11]})
+    pages = walk(cursor, 2)
+    assert [ids for ids, _, _ in pages] == [
+        [("gsm", 1), ("gsm", 2)],
+        [("gsm", 3), ("lte", 10)],
+        [("lte", 11)],
+    ]
+    # Halaman pertama tanpa prev, halaman terakhir tanpa next
+    assert pages[0][2] is None
+    assert pages[-1][1] is None
+
+
+def test_prev_cursor_returns_previous_page_in_ascending_order():
+    cursor = FakeCursor({"gsm_data": [1, 2, 3], "lte_data": [10, 11]})
+    _, _, _, prev_cursor = fetch_unified_page(cursor, 7, 1, 2, decode_page_cursor(encode_page_cursor(1, 10, "next")))
+    # Halaman setelah lte 10 adalah [lte 11]; prev dari sana kembali ke [gsm 3, lte 10]
+    assert decode_page_cursor(prev_cursor) == (1, 11, "prev")
+
+    gsm, lte, next_cursor, prev_cursor = fetch_unified_page(cursor, 7, 1, 2, decode_page_cursor(prev_cursor))
+    assert page_ids(gsm, lte) == [("gsm", 3), ("lte", 10)]
+    # Masih ada data sebelum gsm 3, dan next kembali ke lte 11
+    assert decode_page_cursor(prev_cursor) == (0, 3, "prev")
+    assert decode_page_cursor(next_cursor) == (1, 10, "next")
+
+    gsm, lte, _, prev_cursor = fetch_unified_page(cursor, 7, 1, 2, decode_page_cursor(prev_cursor))
+    assert page_ids(gsm, lte) == [("gsm", 1), ("gsm", 2)]
+    assert prev_cursor is None
+
+
+def test_offset_page_has_prev_cursor():
+    cursor = FakeCursor({"gsm_data": [1, 2, 3], "lte_data": []})
+    gsm, lte, next_cursor, prev_cursor = fetch_unified_page(cursor, 7, 2, 2)
+    assert page_ids(gsm, lte) == [("gsm", 3)]
+    assert next_cursor is None
+    assert decode_page_cursor(prev_cursor) == (0, 3, "prev")
+
+
+def test_row_fetch_is_scoped_to_campaign():
+    cursor = FakeCursor({"gsm_data": [1], "lte_data": [5]})
+    fetch_unified_page(cursor, 7, 1, 10)
+    row_queries = [query for name, query, _ in cursor.statements if name != "unified_page.keys"]
+    assert row_queries
+    assert all("campaign_id = %s AND id = ANY(%s)" in query for query in row_queries)
+
+
+def test_segments_follow_filter_groups():
+    assert [s[:3] for s in unified_segments()] == [(0, "gsm", "gsm_data"), (1, "lte", "lte_data")]
+    groups = [{"gsm": "a", "lte": "b"}, {"gsm": "c", "lte": "d"}]
+    assert unified_segments(groups) == [
+        (0, "gsm", "gsm_data", "a"), (1, "lte", "lte_data", "b"),
+        (2, "gsm", "gsm_data", "c"), (3, "lte", "lte_data", "d"),
+    ]
+
+
+def test_exact_search_hits_come_first_across_pages():
+    mode, groups, params = bts_search.build_filters("510")
+    assert mode == bts_search.MODE_EXACT
+    exact, rest = groups
+    cursor = FakeCursor(
+        {"gsm_data": [1, 2, 3, 4], "lte_data": [10, 11]},
+        matches={
+            ("gsm_data", exact["gsm"]): {3},
+            ("lte_data", exact["lte"]): {11},
+            ("gsm_data", rest["gsm"]): {1, 4},
+            ("lte_data", rest["lte"]): {10},
+        },
+    )
+    pages = walk(cursor, 2, filters=groups, params=params)
+    assert [ids for ids, _, _ in pages] == [
+        [("gsm", 3), ("lte", 11)],
+        [("gsm", 1), ("gsm", 4)],
+        [("lte", 10)],
+    ]
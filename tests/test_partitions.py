@@ -0,0 +1,80 @@
+import psycopg2.errors
+import pytest
+import partitions
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, vars=None):
+        self.conn.statements.append(query.strip())
+        if "pg_partitioned_table" in query:
+            self._result = (1,)
+        elif "to_regclass" in query:
+            self._result = (vars[0] in self.conn.tables,)
+        elif query.startswith("ALTER TABLE") and "ATTACH PARTITION" in query and self.conn.lock_failures:
+            self.conn.lock_failures -= 1
+            raise psycopg2.errors.LockNotAvailable()
+
+    def fetchone(self):
+        return self._result
+
+
+class FakeConnection:
+    def __init__(self, autocommit=False, lock_failures=0, tables=()):
+        self.autocommit = autocommit
+        self.lock_failures = lock_failures
+        self.tables = set(tables)
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(partitions.time, "sleep", lambda seconds: None)
+
+
+def test_campaign_partitions_commit_per_table():
+    conn = FakeConnection()
+    created = partitions.create_campaign_partitions(conn, 12)
+    assert created == ["gsm_data_c12", "lte_data_c12"]
+    # Satu commit awal + satu per tabel: kunci ATTACH tidak tertahan sampai campaign di-insert
+    assert conn.commits == 1 + len(partitions.BTS_TABLES)
+    attaches = [s for s in conn.statements if "ATTACH PARTITION" in s]
+    assert attaches == [
+        "ALTER TABLE gsm_data ATTACH PARTITION gsm_data_c12 FOR VALUES IN (12)",
+        "ALTER TABLE lte_data ATTACH PARTITION lte_data_c12 FOR VALUES IN (12)",
+    ]
+
+
+def test_campaign_partitions_retry_on_lock_timeout():
+    conn = FakeConnection(lock_failures=2)
+    assert partitions.create_campaign_partitions(conn, 3) == ["gsm_data_c3", "lte_data_c3"]
+    assert conn.rollbacks == 2
+    assert sum("lock_timeout" in s for s in conn.statements) == 4
+
+
+@pytest.mark.parametrize("autocommit", [True, False])
+def test_drop_restores_autocommit(autocommit):
+    conn = FakeConnection(autocommit=autocommit)
+    assert partitions.drop_campaign_partitions(conn, [5]) == []
+    assert conn.autocommit is autocommit
+    assert conn.statements.count("BEGIN") == 1 and conn.statements.count("COMMIT") == 1
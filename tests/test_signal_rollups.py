@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from signal_rollups import BUCKET_STEPS, ROLLUP_TABLES, choose_bucket
+
+NOW = datetime(2026, 1, 10, tzinfo=timezone.utc)
+TABLE_1M = ROLLUP_TABLES[0][0]
+TABLE_1H = ROLLUP_TABLES[1][0]
+RETENTION_1M = ROLLUP_TABLES[0][2]
+
+
+@pytest.mark.parametrize("span, expected", [
+    (timedelta(minutes=30), (TABLE_1M, 60)),
+    (timedelta(hours=8, minutes=20), (TABLE_1M, 60)),
+    (timedelta(hours=8, minutes=21), (TABLE_1M, 300)),
+    (timedelta(hours=41, minutes=40), (TABLE_1M, 300)),
+    (timedelta(hours=125), (TABLE_1M, 900)),
+    # Bucket 1 jam ke atas dilayani rollup 1 jam
+    (timedelta(hours=251), (TABLE_1H, 3600)),
+    (timedelta(days=365), (TABLE_1H, 86400)),
+])
+def test_bucket_switches_at_max_points(span, expected):
+    assert choose_bucket(NOW - span, NOW, now=NOW, max_points=500) == expected
+
+
+def test_points_never_exceed_max_until_largest_step():
+    for hours in (1, 10, 100, 1000, 10000):
+        start = NOW - timedelta(hours=hours)
+        _, bucket = choose_bucket(start, NOW, now=NOW, max_points=500)
+        assert hours * 3600 / bucket <= 500 or bucket == BUCKET_STEPS[-1]
+
+
+def test_expired_minute_rollups_fall_back_to_hourly():
+    start = NOW - timedelta(days=RETENTION_1M + 1)
+    assert choose_bucket(start, start + timedelta(hours=1), now=NOW) == (TABLE_1H, 3600)
+
+
+def test_empty_range_uses_smallest_bucket():
+    assert choose_bucket(NOW, NOW, now=NOW) == (TABLE_1M, 60)
@@ -1,9 +1,22 @@
 import asyncio
 import websockets
 import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
+import psycopg2.errors
 import psycopg2.extras
-from database_config import get_db_connection
+from database_config import db_connection, get_db_connection
+from campaign_events import DEVICE_EVENTS_CHANNEL, PgListener, notify_campaign_event
+import campaign_stats
+import migrations
+import signal_rollups
+from observation_log import gsm_observations, lte_observations, observation_log
+import metrics
 
 
 def to_int(val):
@@ -18,41 +31,142 @@ def to_float(val):
     except (TypeError, ValueError):
         return None
     
-# Fungsi untuk upsert device berdasarkan serial_number
+# Fungsi untuk upsert device berdasarkan serial_number, mengembalikan id device
 def upsert_device(cur, device):
     query = """
     INSERT INTO devices (serial_number, ip, is_connected, created_at)
     VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
     ON CONFLICT (serial_number) DO UPDATE SET
       ip = EXCLUDED.ip,
-      is_connected = EXCLUDED.is_connected;
+      is_connected = EXCLUDED.is_connected
+    RETURNING id;
     """
     cur.execute(query, (
         device["serial_number"],
         device["ip"],
         bool(device["is_connected"])
     ))
+    row = cur.fetchone()
+    return row["id"] if isinstance(row, dict) else row[0]
+
+
+# Lama cache serial_number -> device id dianggap valid (detik)
+DEVICE_CACHE_TTL = float(os.environ.get("DEVICE_CACHE_TTL", 300))
+
+
+class DeviceCache:
+    """Cache serial_number -> id device, dipakai bersama oleh semua worker.
+
+    Entry hanya dipakai selama ip dan is_connected di pesan sama dengan yang terakhir
+    di-upsert; jika berubah, device di-upsert ulang dan entry diperbarui.
+    """
+
+    def __init__(self, ttl=DEVICE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, device):
+        serial_number = device.get("serial_number")
+        with self._lock:
+            entry = self._entries.get(serial_number)
+            if (
+                entry is not None
+                and entry["ip"] == device.get("ip")
+                and entry["is_connected"] == bool(device.get("is_connected"))
+                and time.monotonic() - entry["cached_at"] < self.ttl
+            ):
+                self.hits += 1
+                return entry["id"]
+            self.misses += 1
+            return None
+
+    def put(self, device, device_id):
+        with self._lock:
+            self._entries[device.get("serial_number")] = {
+                "id": device_id,
+                "ip": device.get("ip"),
+                "is_connected": bool(device.get("is_connected")),
+                "cached_at": time.monotonic(),
+            }
+
+    def invalidate(self, serial_number=None):
+        with self._lock:
+            if serial_number is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(serial_number, None)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+device_cache = DeviceCache()
+
+
+# Kapasitas antrian pesan antara task penerima WebSocket dan worker DB
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 1000))
+# Jumlah worker (thread) yang menulis ke DB
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 4))
+# Berapa lama penerima menunggu slot antrian sebelum pesan dibuang (detik)
+INGEST_ENQUEUE_TIMEOUT = float(os.environ.get("INGEST_ENQUEUE_TIMEOUT", 5))
+INGEST_STATS_INTERVAL = float(os.environ.get("INGEST_STATS_INTERVAL", 30))
+
+# Port API/WebSocket di device
+DEVICE_WS_PORT = int(os.environ.get("DEVICE_WS_PORT", 8003))
+# Interval sinkronisasi daftar koneksi dengan tabel devices (detik)
+DEVICE_RECONCILE_INTERVAL = float(os.environ.get("DEVICE_RECONCILE_INTERVAL", 30))
+# Backoff eksponensial (dengan jitter) saat koneksi ke device gagal/putus (detik)
+DEVICE_BACKOFF_MIN = float(os.environ.get("DEVICE_BACKOFF_MIN", 1))
+DEVICE_BACKOFF_MAX = float(os.environ.get("DEVICE_BACKOFF_MAX", 60))
+DEVICE_CONNECT_TIMEOUT = float(os.environ.get("DEVICE_CONNECT_TIMEOUT", 10))
+# Port /metrics untuk daemon ingest terpisah (0 = nonaktif); mode embedded memakai /metrics API
+INGEST_METRICS_PORT = int(os.environ.get("INGEST_METRICS_PORT", 0))
+
+# Jumlah baris per statement INSERT multi-row
+UPSERT_PAGE_SIZE = int(os.environ.get("UPSERT_PAGE_SIZE", 1000))
+
+
+def dedupe_rows(rows, key_indexes):
+    # Satu statement ON CONFLICT tidak boleh mengupdate baris yang sama dua kali,
+    # jadi duplikat dalam satu laporan digabung (data terakhir yang dipakai, sama
+    # seperti upsert satu per satu). Key yang mengandung NULL tidak pernah konflik.
+    unique = {}
+    for i, row in enumerate(rows):
+        key = tuple(row[k] for k in key_indexes)
+        if any(part is None for part in key):
+            key = ("__null__", i)
+        unique[key] = row
+    return list(unique.values())
 
 
 # Fungsi untuk memasukkan data GSM
-def insert_gsm_data(cur, campaign_id, device_id, gsm_list):
-    query = """
-        INSERT INTO gsm_data (
-            campaign_id, device_id, mcc, mnc, operator, local_area_code, 
-            arfcn, cell_identity, rxlev, rxlev_access_min, status, rssi, created_at
-        )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
-        ON CONFLICT (campaign_id, device_id, mcc, mnc, local_area_code, cell_identity)
-        DO UPDATE SET
-            operator = EXCLUDED.operator,
-            arfcn = EXCLUDED.arfcn,
-            rxlev = EXCLUDED.rxlev,
-            rxlev_access_min = EXCLUDED.rxlev_access_min,
-            status = EXCLUDED.status,
-            rssi = EXCLUDED.rssi,
-            created_at = CURRENT_TIMESTAMP;
-
-        """
+GSM_UPSERT_QUERY = """
+    INSERT INTO gsm_data (
+        campaign_id, device_id, mcc, mnc, operator, local_area_code, 
+        arfcn, cell_identity, rxlev, rxlev_access_min, status, rssi, created_at
+    )
+    VALUES %s
+    ON CONFLICT (campaign_id, device_id, mcc, mnc, local_area_code, cell_identity)
+    DO UPDATE SET
+        operator = EXCLUDED.operator,
+        arfcn = EXCLUDED.arfcn,
+        rxlev = EXCLUDED.rxlev,
+        rxlev_access_min = EXCLUDED.rxlev_access_min,
+        status = EXCLUDED.status,
+        rssi = EXCLUDED.rssi,
+        created_at = CURRENT_TIMESTAMP;
+"""
+GSM_ROW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)"
+# Posisi mcc, mnc, local_area_code, cell_identity di dalam tuple baris
+GSM_KEY_INDEXES = (2, 3, 5, 7)
+
+
+def build_gsm_rows(campaign_id, device_id, gsm_list):
+    rows = []
     for gsm in gsm_list:
         raw_mcc = gsm.get("mcc")
         raw_mnc = gsm.get("mnc")
@@ -62,7 +176,7 @@ def insert_gsm_data(cur, campaign_id, device_id, gsm_list):
             continue
         
         status_value = True if gsm.get("status") is None else bool(gsm["status"])
-        cur.execute(query, (
+        rows.append((
             campaign_id,
             device_id,
             to_int(gsm.get("mcc")),
@@ -76,15 +190,36 @@ def insert_gsm_data(cur, campaign_id, device_id, gsm_list):
             status_value,
             to_float(gsm.get("rssi")) 
         ))
+    return dedupe_rows(rows, GSM_KEY_INDEXES)
+
+
+def upsert_rows(cur, query, rows, template):
+    """execute_values per halaman; mengembalikan jumlah baris yang di-insert/di-update."""
+    # rowcount execute_values hanya milik halaman terakhir, jadi halaman dijalankan di sini
+    affected = 0
+    for start in range(0, len(rows), UPSERT_PAGE_SIZE):
+        page = rows[start:start + UPSERT_PAGE_SIZE]
+        psycopg2.extras.execute_values(cur, query, page, template=template, page_size=len(page))
+        affected += max(cur.rowcount, 0)
+    return affected
+
+
+def upsert_gsm_rows(cur, rows):
+    return upsert_rows(cur, GSM_UPSERT_QUERY, rows, GSM_ROW_TEMPLATE)
+
+
+def insert_gsm_data(cur, campaign_id, device_id, gsm_list):
+    rows = build_gsm_rows(campaign_id, device_id, gsm_list)
+    upsert_gsm_rows(cur, rows)
+    return rows
 
 # Fungsi untuk memasukkan data LTE
-def insert_lte_data(cur, campaign_id, device_id, lte_list):
-    query = """
+LTE_UPSERT_QUERY = """
     INSERT INTO lte_data (
         campaign_id, device_id, mcc, mnc, operator, arfcn, cell_identity, 
         tracking_area_code, frequency_band_indicator, signal_level, snr, rx_lev_min, status, rssi, created_at
     )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+    VALUES %s
     ON CONFLICT (campaign_id, device_id, mcc, mnc, tracking_area_code, cell_identity)
     DO UPDATE SET
         operator = EXCLUDED.operator,
@@ -96,7 +231,14 @@ def insert_lte_data(cur, campaign_id, device_id, lte_list):
         status = EXCLUDED.status,
         rssi = EXCLUDED.rssi,
         created_at = CURRENT_TIMESTAMP;
-    """
+"""
+LTE_ROW_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)"
+# Posisi mcc, mnc, tracking_area_code, cell_identity di dalam tuple baris
+LTE_KEY_INDEXES = (2, 3, 7, 6)
+
+
+def build_lte_rows(campaign_id, device_id, lte_list):
+    rows = []
     for lte in lte_list:
         raw_mcc = lte.get("mcc")
         raw_mnc = lte.get("mnc")
@@ -106,7 +248,7 @@ def insert_lte_data(cur, campaign_id, device_id, lte_list):
             continue
 
         status_value = True if lte.get("status") is None else bool(lte["status"])
-        cur.execute(query, (
+        rows.append((
             campaign_id,
             device_id,
             to_int(lte.get("mcc")),
@@ -122,15 +264,151 @@ def insert_lte_data(cur, campaign_id, device_id, lte_list):
             status_value,
             to_float(lte.get("rssi"))
         ))
+    return dedupe_rows(rows, LTE_KEY_INDEXES)
+
+
+def upsert_lte_rows(cur, rows):
+    return upsert_rows(cur, LTE_UPSERT_QUERY, rows, LTE_ROW_TEMPLATE)
+
+
+def insert_lte_data(cur, campaign_id, device_id, lte_list):
+    rows = build_lte_rows(campaign_id, device_id, lte_list)
+    upsert_lte_rows(cur, rows)
+    return rows
+
+
+class IngestWriter:
+    """Koneksi writer yang hidup lama, satu per thread worker."""
+
+    def __init__(self, cache=device_cache, cursor_factory=None, rollups=signal_rollups.SIGNAL_ROLLUPS_ENABLED):
+        self.cache = cache
+        self.cursor_factory = cursor_factory
+        self.rollups = rollups
+        self.conn = None
+        # Campaign tidak dikenal yang sudah diperingatkan (sekali per campaign)
+        self.missing_campaigns = set()
+
+    def _connection(self):
+        if self.conn is None or self.conn.closed:
+            conn = get_db_connection()
+            if conn is None:
+                raise psycopg2.OperationalError("Tidak bisa terhubung ke database")
+            # search_path cukup di-set sekali per koneksi
+            with conn.cursor() as cur:
+                cur.execute("SET search_path TO public;")
+            conn.commit()
+            self.conn = conn
+        return self.conn
+
+    def close(self):
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
+        self.conn = None
+
+    def _write_once(self, campaign_id, device_data, gsm_list, lte_list):
+        conn = self._connection()
+        device_db_id = self.cache.get(device_data)
+        fresh = device_db_id is None
+        with conn:
+            with conn.cursor(cursor_factory=self.cursor_factory) as cur:
+                if fresh:
+                    # Upsert device hanya saat belum ada di cache atau ip/status berubah
+                    device_db_id = upsert_device(cur, device_data)
+
+                gsm_rows = build_gsm_rows(campaign_id, device_db_id, gsm_list)
+                lte_rows = build_lte_rows(campaign_id, device_db_id, lte_list)
+
+                written = 0
+                if gsm_rows or lte_rows:
+                    # Status/operator lama dibaca sebelum upsert untuk menghitung delta campaign_stats
+                    delta = campaign_stats.StatsDelta(campaign_id, device_db_id)
+                    delta.lock(cur)
+                    delta.snapshot(cur, "gsm", gsm_rows)
+                    delta.snapshot(cur, "lte", lte_rows)
+
+                    # Insert data GSM dan LTE menggunakan campaign_id dan device_db_id
+                    written = upsert_gsm_rows(cur, gsm_rows) + upsert_lte_rows(cur, lte_rows)
+
+                    delta.count("gsm", gsm_rows)
+                    delta.count("lte", lte_rows)
+                    delta.apply(cur)
+
+                    # Rollup sinyal ikut transaksi upsert: commit/rollback bersama data sel
+                    if self.rollups:
+                        observed_at = datetime.now(timezone.utc)
+                        signal_rollups.apply(
+                            cur, gsm_observations(observed_at, gsm_rows) + lte_observations(observed_at, lte_rows)
+                        )
+
+                # Beri tahu API (LISTEN campaign_events) hanya jika ada baris yang tertulis, terkirim saat commit
+                if written > 0:
+                    notify_campaign_event(cur, campaign_id, "bts", device_id=device_db_id)
+        # Simpan ke cache setelah commit, supaya id dari transaksi yang gagal tidak ikut tersimpan
+        if fresh:
+            self.cache.put(device_data, device_db_id)
+        metrics.INGEST_CELLS_GSM.inc(len(gsm_rows))
+        metrics.INGEST_CELLS_LTE.inc(len(lte_rows))
+        # Riwayat pengukuran hanya untuk data yang sudah commit (tanpa efek jika tidak aktif)
+        observation_log.record(gsm_rows, lte_rows)
+
+    def _campaign_exists(self, campaign_id):
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT 1 FROM campaign WHERE id = %s", (campaign_id,))
+                return cur.fetchone() is not None
+
+    def write(self, campaign_id, device_data, gsm_list, lte_list):
+        """Tulis satu pesan; False jika pesan dibuang karena campaign-nya tidak ada."""
+        try:
+            self._write_once(campaign_id, device_data, gsm_list, lte_list)
+        except (psycopg2.errors.ForeignKeyViolation, psycopg2.errors.CheckViolation) as e:
+            # Campaign tidak ada (FK campaign, atau CHECK partisi DEFAULT): dibuang tanpa retry,
+            # cache device tetap valid
+            if not self._campaign_exists(campaign_id):
+                if campaign_id not in self.missing_campaigns:
+                    self.missing_campaigns.add(campaign_id)
+                    print(f"Peringatan: campaign {campaign_id} tidak ada, pesan untuk campaign ini dibuang")
+                return False
+            if not isinstance(e, psycopg2.errors.ForeignKeyViolation):
+                raise
+            # Device di cache sudah dihapus/diganti lewat API, resolve ulang lalu coba sekali lagi
+            self.cache.invalidate(device_data.get("serial_number"))
+            self._write_once(campaign_id, device_data, gsm_list, lte_list)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            # Koneksi putus (restart DB, dll): buka koneksi baru lalu coba sekali lagi
+            self.close()
+            self._write_once(campaign_id, device_data, gsm_list, lte_list)
+        return True
+
+
+_writers = threading.local()
+_all_writers = []
+_all_writers_lock = threading.Lock()
 
 
-def process_message(message):
+def get_writer():
+    writer = getattr(_writers, "writer", None)
+    if writer is None:
+        writer = IngestWriter()
+        _writers.writer = writer
+        with _all_writers_lock:
+            _all_writers.append(writer)
+    return writer
+
+
+def close_writers():
+    with _all_writers_lock:
+        for writer in _all_writers:
+            writer.close()
+        _all_writers.clear()
+
+
+def process_message(message, writer=None):
     try:
         data = json.loads(message)
-        print(f"############################ini message nya yaa {message}")
     except Exception as e:
         print("Gagal memparsing JSON:", e)
-        return
+        return False
 
     campaign_data = data.get("campaign")
     device_data = data.get("device")
@@ -139,80 +417,350 @@ def process_message(message):
     
     if campaign_data is None:
         print("Error processing message: campaign data is missing")
-        return
+        return False
     if device_data is None:
         print("Error processing message: device data is missing")
-        return
+        return False
 
-    conn = get_db_connection()
     try:
-        with conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-
-                cur.execute("SET search_path TO public;")
-                # Upsert device berdasarkan serial_number
-                upsert_device(cur, device_data)
-                
-                # Ambil device id dari database berdasarkan serial_number
-                serial_number = device_data.get("serial_number")
-                cur.execute("SELECT id FROM devices WHERE serial_number = %s", (serial_number,))
-                db_device = cur.fetchone()
-                if db_device is None:
-                    print("Error: device tidak ditemukan di database setelah upsert")
-                    return
-                device_db_id = db_device["id"]
-
-                
-                # Insert data GSM dan LTE menggunakan campaign_id dan device_db_id
-                insert_gsm_data(cur, campaign_data["id"], device_db_id, gsm_list)
-                insert_lte_data(cur, campaign_data["id"], device_db_id, lte_list)
+        return (writer or get_writer()).write(campaign_data["id"], device_data, gsm_list, lte_list)
     except Exception as e:
         print("Error processing messagenya:", e)
-    finally:
-        conn.close()
+        return False
 
-# Fungsi asynchronous untuk mendengarkan WebSocket dari satu device
-async def listen_ws(uri: str):
-    print(f"Membuka koneksi ke {uri}")
-    try:
-        async with websockets.connect(uri) as websocket:
+
+class IngestPipeline:
+    """Antrian terbatas antara penerima WebSocket dan worker DB.
+
+    Penerima hanya memasukkan pesan ke antrian, parsing JSON dan upsert dijalankan
+    di thread worker sehingga event loop tetap bebas melayani device lain dan ping/pong.
+    """
+
+    def __init__(self, queue_size=INGEST_QUEUE_SIZE, workers=INGEST_WORKERS,
+                 enqueue_timeout=INGEST_ENQUEUE_TIMEOUT, handler=process_message):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self.handler = handler
+        self.queue = None
+        self.executor = None
+        self.tasks = []
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.queue_wait_total = 0.0
+
+    async def start(self):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest-writer")
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, message, source=None) -> bool:
+        # Backpressure: tunggu slot kosong, buang pesan jika antrian tetap penuh
+        self.received += 1
+        try:
+            await asyncio.wait_for(self.queue.put((time.monotonic(), message)), timeout=self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            metrics.INGEST_DROPPED.inc()
+            print(f"Antrian ingest penuh ({self.queue_size}), pesan dari {source} dibuang. Total dibuang: {self.dropped}")
+            return False
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            enqueued_at, message = await self.queue.get()
+            self.queue_wait_total += time.monotonic() - enqueued_at
+            try:
+                ok = await loop.run_in_executor(self.executor, self.handler, message)
+                if ok:
+                    self.processed += 1
+                    metrics.INGEST_PROCESSED.inc()
+                else:
+                    self.failed += 1
+                    metrics.INGEST_FAILED.inc()
+            except Exception as e:
+                self.failed += 1
+                metrics.INGEST_FAILED.inc()
+                print(f"Error pada worker ingest: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        handled = self.processed + self.failed
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "received": self.received,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "queue_wait_avg_ms": (self.queue_wait_total / handled * 1000) if handled else 0.0,
+            "device_cache": device_cache.stats(),
+        }
+
+    async def report_stats(self, interval=INGEST_STATS_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            print(f"Statistik ingest: {self.stats()}")
+
+    async def stop(self, drain_timeout=10):
+        # Selesaikan pesan yang masih di antrian sebelum berhenti
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            print(f"Antrian ingest tidak habis, {self.queue.qsize()} pesan ditinggalkan")
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=True)
+        close_writers()
+
+def backoff_delay(attempt, base=DEVICE_BACKOFF_MIN, cap=DEVICE_BACKOFF_MAX):
+    # Equal jitter: setengah tetap, setengah acak, supaya device yang reboot bersamaan
+    # tidak di-reconnect serentak
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class DeviceConnection:
+    """Koneksi WebSocket ke satu device beserta statusnya."""
+
+    def __init__(self, ip, pipeline):
+        self.ip = ip
+        self.uri = f"ws://{ip}:{DEVICE_WS_PORT}/ws"
+        self.pipeline = pipeline
+        self.state = "idle"
+        self.attempt = 0
+        self.reconnects = 0
+        self.messages = 0
+        self.last_error = None
+        self.connected_since = None
+        self.last_message_at = None
+        self.next_retry_at = None
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self.state = "stopped"
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    async def _listen(self):
+        self.state = "connecting"
+        async with websockets.connect(self.uri, open_timeout=DEVICE_CONNECT_TIMEOUT) as websocket:
+            print(f"Terhubung ke {self.uri}")
+            self.state = "connected"
+            self.connected_since = time.time()
+            self.attempt = 0
+            self.last_error = None
             while True:
                 message = await websocket.recv()
-                # print(f"Pesan diterima dari {uri}: {message}")
-                print(f"Pesan diterima dari {uri}")
-                process_message(message)
-    except Exception as e:
-        print(f"Error pada koneksi {uri}: {e}")
+                self.messages += 1
+                self.last_message_at = time.time()
+                await self.pipeline.submit(message, self.uri)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error pada koneksi {self.uri}: {e}")
+            self.connected_since = None
+            delay = backoff_delay(self.attempt)
+            self.attempt += 1
+            self.reconnects += 1
+            self.state = "backoff"
+            self.next_retry_at = time.time() + delay
+            await asyncio.sleep(delay)
+
+    def status(self):
+        return {
+            "ip": self.ip,
+            "uri": self.uri,
+            "state": self.state,
+            "attempt": self.attempt,
+            "reconnects": self.reconnects,
+            "messages": self.messages,
+            "last_error": self.last_error,
+            "connected_since": self.connected_since,
+            "last_message_at": self.last_message_at,
+            "next_retry_at": self.next_retry_at if self.state == "backoff" else None,
+        }
+
+
+def fetch_device_ips():
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT DISTINCT ip FROM devices WHERE ip IS NOT NULL AND ip <> ''")
+            return {row[0] for row in cursor.fetchall()}
+
+
+def fetch_campaign_device_ips():
+    # Hanya device yang tergabung di campaign yang sedang berjalan (active/paused)
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT d.ip
+                FROM campaign c
+                JOIN campaign_devices cd ON cd.campaign_id = c.id
+                JOIN devices d ON d.id = cd.device_id
+                WHERE c.status IN ('active', 'paused')
+                  AND d.ip IS NOT NULL AND d.ip <> ''
+            """)
+            return {row[0] for row in cursor.fetchall()}
 
-# Fungsi utama untuk mengambil IP device dari DB dan membuat task WebSocket untuk masing-masing
+
+class DeviceSupervisor:
+    """Menyamakan koneksi WebSocket dengan isi tabel devices dan menjaga setiap koneksi tetap hidup."""
+
+    def __init__(self, pipeline, reconcile_interval=DEVICE_RECONCILE_INTERVAL, device_source=fetch_device_ips):
+        self.pipeline = pipeline
+        self.reconcile_interval = reconcile_interval
+        self.device_source = device_source
+        self.connections = {}
+        self._wakeup = asyncio.Event()
+        self._listener = PgListener([DEVICE_EVENTS_CHANNEL], self.handle_device_event)
+
+    def handle_device_event(self, channel, payload):
+        # Device ditambah/diubah/dihapus lewat API: cache id tidak lagi bisa dipercaya
+        device_cache.invalidate()
+        self.request_reconcile()
+
+    def request_reconcile(self):
+        self._wakeup.set()
+
+    async def reconcile(self):
+        try:
+            desired = await asyncio.to_thread(self.device_source)
+        except Exception as e:
+            print(f"Error retrieving devices: {e}")
+            return
+
+        for ip in desired - self.connections.keys():
+            print(f"Device baru {ip}, membuka koneksi")
+            connection = DeviceConnection(ip, self.pipeline)
+            self.connections[ip] = connection
+            connection.start()
+
+        for ip in self.connections.keys() - desired:
+            print(f"Device {ip} tidak ada lagi, menutup koneksi")
+            await self.connections.pop(ip).stop()
+
+    def status(self):
+        return [connection.status() for connection in self.connections.values()]
+
+    async def report_status(self, interval=INGEST_STATS_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            states = {}
+            for connection in self.connections.values():
+                states[connection.state] = states.get(connection.state, 0) + 1
+            print(f"Status koneksi device: {states}")
+            for status in self.status():
+                if status["state"] != "connected":
+                    print(f"  {status['uri']}: {status['state']} (percobaan {status['attempt']}, error: {status['last_error']})")
+
+    async def run(self):
+        listener_task = asyncio.create_task(self._listener.run())
+        try:
+            while True:
+                await self.reconcile()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.reconcile_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+        finally:
+            listener_task.cancel()
+            await asyncio.gather(listener_task, return_exceptions=True)
+
+    async def stop(self):
+        await asyncio.gather(*(connection.stop() for connection in self.connections.values()))
+        self.connections.clear()
+
+
+class IngestionService:
+    """Pipeline ingest + supervisor device dalam satu proses.
+
+    Dipakai sebagai daemon (python3 wsReceivedata.py) atau ditanam di proses API.
+    Setiap stream device hanya dibaca satu kali, berapapun campaign yang didaftarkan.
+    """
+
+    def __init__(self, device_source=fetch_device_ips):
+        self.device_source = device_source
+        self.pipeline = None
+        self.supervisor = None
+        self.tasks = []
+        self.campaigns = set()
+
+    async def start(self):
+        if observation_log.enabled:
+            observation_log.start()
+        self.pipeline = IngestPipeline()
+        await self.pipeline.start()
+        self.supervisor = DeviceSupervisor(self.pipeline, device_source=self.device_source)
+        self.tasks = [
+            asyncio.create_task(self.supervisor.run()),
+            asyncio.create_task(self.pipeline.report_stats()),
+            asyncio.create_task(self.supervisor.report_status()),
+        ]
+
+    def register_campaign(self, campaign_id):
+        self.campaigns.add(campaign_id)
+        if self.supervisor is not None:
+            self.supervisor.request_reconcile()
+
+    def unregister_campaign(self, campaign_id):
+        self.campaigns.discard(campaign_id)
+        if self.supervisor is not None:
+            self.supervisor.request_reconcile()
+
+    def status(self):
+        return {
+            "campaigns": sorted(self.campaigns),
+            "pipeline": self.pipeline.stats() if self.pipeline else None,
+            "devices": self.supervisor.status() if self.supervisor else [],
+            "observation_log": observation_log.stats(),
+        }
+
+    async def wait(self):
+        await asyncio.gather(*self.tasks)
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.supervisor is not None:
+            await self.supervisor.stop()
+        if self.pipeline is not None:
+            await self.pipeline.stop()
+        # Setelah pipeline berhenti tidak ada baris baru, sisa buffer riwayat ditulis
+        await asyncio.to_thread(observation_log.stop)
+
+
+# Fungsi utama: jalankan ingest sebagai daemon terpisah untuk semua device di tabel devices
 async def main():
-    conn = get_db_connection()
-    
+    if os.environ.get("DB_AUTO_MIGRATE", "1") == "1":
+        migrations.apply()
+    service = IngestionService()
+    if INGEST_METRICS_PORT:
+        metrics.register_collector(lambda: metrics.ingestion_families(service))
+        metrics.start_metrics_server(INGEST_METRICS_PORT)
+    await service.start()
     try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        cursor.execute("SELECT ip FROM devices")
-        devices = cursor.fetchall()
-    except Exception as e:
-        print("Error retrieving devices:", e)
-        return
+        await service.wait()
     finally:
-        cursor.close()
-        conn.close()
-
-    tasks = []
-    for device in devices:
-        ip = device.get("ip")
-        if not ip:
-            continue
-        ws_uri = f"ws://{ip}:8003/ws"
-        tasks.append(asyncio.create_task(listen_ws(ws_uri)))
-    
-    if tasks:
-        await asyncio.gather(*tasks)
-    else:
-        print("Tidak ada device yang ditemukan.")
+        await service.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
-
-
@@ -1,11 +1,42 @@
+import argparse
 import asyncio
-import websockets
 import json
+import os
+import statistics
+import sys
+import time
+import websockets
+
+# Klien WebSocket dashboard (/ws/{campaign_id}) untuk debugging dan uji beban fan-out.
+#
+#   python3 ws_listener.py                          satu klien, campaign ditanya, frame dicetak
+#   python3 ws_listener.py --print 12               satu klien untuk campaign 12
+#   python3 ws_listener.py --campaigns 12,13 --subscribers 2000 --duration 120 \
+#       --url ws://127.0.0.1:8004/ws/{campaign_id} --server-pid $(pgrep -f main.py) --output ws.json
+#
+# Uji beban membuka banyak subscriber (dibagi rata ke campaign yang dipilih) dan mengukur:
+#   - waktu connect dan jumlah connect gagal / terputus
+#   - jarak antar frame per subscriber (rata-rata dan jitter = simpangan baku)
+#   - ukuran payload
+#   - jeda kirim: waktu terima dikurangi "sent_at" dari server (jam server dan klien harus
+#     sinkron, paling akurat jika dijalankan di host yang sama)
+#   - CPU dan RSS proses server dari /proc/<pid> (--server-pid, hanya jika satu host)
+# Ribuan koneksi butuh batas file descriptor yang cukup (ulimit -n).
+
+WS_LISTENER_URL = os.environ.get("WS_LISTENER_URL", "ws://172.15.1.223:8004/ws/{campaign_id}")
+
 
-async def listen_ws(campaign_id):
-    """Terhubung ke WebSocket dan menerima semua data campaign setiap 5 detik."""
-    uri = f"ws://172.15.1.223:8004/ws/{campaign_id}"  
-    async with websockets.connect(uri) as websocket:
+def campaign_url(url_template, campaign_id, mode=None):
+    url = url_template.format(campaign_id=campaign_id)
+    if mode:
+        url += ("&" if "?" in url else "?") + f"mode={mode}"
+    return url
+
+
+async def listen_ws(campaign_id, url_template=WS_LISTENER_URL):
+    """Terhubung ke WebSocket dan mencetak setiap frame data campaign."""
+    uri = campaign_url(url_template, campaign_id)
+    async with websockets.connect(uri, max_size=None) as websocket:
         print(f"Terhubung ke WebSocket Server untuk campaign {campaign_id}...")
 
         try:
@@ -21,6 +52,241 @@ async def listen_ws(campaign_id):
         except websockets.ConnectionClosed:
             print(f" Koneksi WebSocket ke campaign {campaign_id} ditutup.")
 
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(values, scale=1.0):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "avg": statistics.fmean(values) * scale,
+        "p50": percentile(values, 50) * scale,
+        "p99": percentile(values, 99) * scale,
+        "max": max(values) * scale,
+    }
+
+
+class LoadStats:
+    """Hasil pengukuran gabungan semua subscriber."""
+
+    def __init__(self):
+        self.connect_times = []
+        self.connect_failures = 0
+        self.disconnects = 0
+        self.connected = 0
+        self.frames = 0
+        self.bytes = 0
+        self.payload_sizes = []
+        self.lags = []
+        self.intervals = []
+        self.jitters = []
+        self.decode_errors = 0
+        self.errors = {}
+
+    def error(self, e):
+        key = e.__class__.__name__
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+
+class ServerSampler:
+    """Sampel CPU (%) dan RSS (MB) proses server dari /proc secara berkala."""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.cpu = []
+        self.rss_mb = []
+
+    def _cpu_seconds(self):
+        with open(f"/proc/{self.pid}/stat") as f:
+            # Nama proses bisa mengandung spasi, jadi field dihitung setelah ")"
+            fields = f.read().rsplit(")", 1)[1].split()
+        # utime dan stime (field ke-14 dan ke-15 di stat)
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def _rss_mb(self):
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return None
+
+    async def run(self):
+        last_cpu = self._cpu_seconds()
+        last_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                cpu = self._cpu_seconds()
+                rss = self._rss_mb()
+            except OSError:
+                print(f"Proses server {self.pid} tidak ditemukan, sampling dihentikan")
+                return
+            now = time.monotonic()
+            self.cpu.append((cpu - last_cpu) / (now - last_at) * 100)
+            if rss is not None:
+                self.rss_mb.append(rss)
+            last_cpu, last_at = cpu, now
+
+    def summary(self):
+        if not self.cpu:
+            return None
+        return {
+            "pid": self.pid,
+            "cpu_percent": {"avg": statistics.fmean(self.cpu), "max": max(self.cpu)},
+            "rss_mb": {
+                "start": self.rss_mb[0] if self.rss_mb else None,
+                "end": self.rss_mb[-1] if self.rss_mb else None,
+                "max": max(self.rss_mb) if self.rss_mb else None,
+            },
+        }
+
+
+async def subscriber(uri, stats, deadline, open_timeout):
+    started = time.perf_counter()
+    try:
+        websocket = await websockets.connect(uri, max_size=None, open_timeout=open_timeout)
+    except Exception as e:
+        stats.connect_failures += 1
+        stats.error(e)
+        return
+    stats.connect_times.append(time.perf_counter() - started)
+    stats.connected += 1
+    intervals = []
+    last_at = None
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            received_at = time.time()
+            now = time.monotonic()
+            if last_at is not None:
+                intervals.append(now - last_at)
+            last_at = now
+            size = len(message)
+            stats.frames += 1
+            stats.bytes += size
+            stats.payload_sizes.append(size)
+            try:
+                sent_at = json.loads(message).get("sent_at")
+            except (ValueError, AttributeError):
+                stats.decode_errors += 1
+                continue
+            if sent_at is not None:
+                stats.lags.append(received_at - sent_at)
+    except websockets.ConnectionClosed as e:
+        stats.disconnects += 1
+        stats.error(e)
+    finally:
+        stats.connected -= 1
+        await websocket.close()
+        stats.intervals.extend(intervals)
+        if len(intervals) > 1:
+            stats.jitters.append(statistics.pstdev(intervals))
+
+
+async def report_progress(stats, interval, started):
+    while True:
+        await asyncio.sleep(interval)
+        elapsed = time.monotonic() - started
+        print(f"[{elapsed:6.0f}s] terhubung={stats.connected} gagal={stats.connect_failures} "
+              f"terputus={stats.disconnects} frame={stats.frames} ({stats.frames / elapsed:.1f}/s)")
+
+
+async def load_test(args):
+    campaigns = [int(c) for c in args.campaigns.split(",") if c.strip()]
+    stats = LoadStats()
+    sampler = ServerSampler(args.server_pid) if args.server_pid else None
+    started = time.monotonic()
+    # Durasi dihitung setelah ramp-up selesai
+    deadline = started + args.ramp + args.duration
+    background = [asyncio.create_task(report_progress(stats, args.progress_interval, started))]
+    if sampler is not None:
+        background.append(asyncio.create_task(sampler.run()))
+
+    tasks = []
+    delay = args.ramp / args.subscribers if args.subscribers else 0
+    for i in range(args.subscribers):
+        uri = campaign_url(args.url, campaigns[i % len(campaigns)], args.mode)
+        tasks.append(asyncio.create_task(subscriber(uri, stats, deadline, args.open_timeout)))
+        if delay:
+            await asyncio.sleep(delay)
+    await asyncio.gather(*tasks)
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+
+    elapsed = time.monotonic() - started
+    return {
+        "params": {
+            "url": args.url, "campaigns": campaigns, "subscribers": args.subscribers,
+            "mode": args.mode, "duration_s": args.duration, "ramp_s": args.ramp,
+        },
+        "connect": {
+            "succeeded": len(stats.connect_times),
+            "failed": stats.connect_failures,
+            "disconnected": stats.disconnects,
+            "time_ms": summarize(stats.connect_times, 1000),
+        },
+        "frames": {
+            "total": stats.frames,
+            "per_s": stats.frames / elapsed if elapsed else 0.0,
+            "bytes_per_s": stats.bytes / elapsed if elapsed else 0.0,
+            "decode_errors": stats.decode_errors,
+        },
+        "payload_bytes": summarize(stats.payload_sizes),
+        "inter_arrival_ms": summarize(stats.intervals, 1000),
+        "jitter_ms": summarize(stats.jitters, 1000),
+        "lag_ms": summarize(stats.lags, 1000),
+        "server": sampler.summary() if sampler else None,
+        "errors": stats.errors,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Klien / uji beban WebSocket campaign")
+    parser.add_argument("--url", default=WS_LISTENER_URL, help="template URL, {campaign_id} diganti")
+    parser.add_argument("--print", dest="print_campaign", type=int,
+                        help="satu klien untuk campaign ini, cetak setiap frame")
+    parser.add_argument("--campaigns", help="daftar campaign_id dipisah koma (mode uji beban)")
+    parser.add_argument("--subscribers", type=int, default=100)
+    parser.add_argument("--mode", choices=("full", "delta"), help="mode protokol broadcaster")
+    parser.add_argument("--duration", type=float, default=60, help="detik setelah ramp-up")
+    parser.add_argument("--ramp", type=float, default=10, help="detik untuk membuka semua subscriber")
+    parser.add_argument("--open-timeout", type=float, default=10)
+    parser.add_argument("--server-pid", type=int, help="pid proses API untuk sampling CPU/RSS")
+    parser.add_argument("--progress-interval", type=float, default=5)
+    parser.add_argument("--output", help="simpan hasil sebagai JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.campaigns:
+        result = asyncio.run(load_test(args))
+        print(json.dumps(result, indent=2))
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        return 0
+    campaign_id = args.print_campaign
+    if campaign_id is None:
+        campaign_id = input("Masukkan Campaign ID: ")
+    asyncio.run(listen_ws(campaign_id, args.url))
+    return 0
+
+
 if __name__ == "__main__":
-    campaign_id = input("Masukkan Campaign ID: ")
-    asyncio.run(listen_ws(campaign_id))
+    sys.exit(main())